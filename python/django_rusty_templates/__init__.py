@@ -27,6 +27,17 @@ class RustyTemplates(BaseEngine):
     def get_template(self, template_name):
         return self.engine.get_template(template_name)
 
+    async def aget_template(self, template_name):
+        return await self.engine.aget_template(template_name)
+
+    def warm(self, names=None):
+        """
+        Load templates into the template cache ahead of their first use,
+        for example in a preforking server's master process. Load every
+        template in DIRS and the app directories if names isn't given.
+        """
+        return self.engine.warm(names)
+
     def get_templatetag_libraries(self, custom_libraries):
         """
         Return a collation of template tag libraries from installed
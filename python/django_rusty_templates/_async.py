@@ -0,0 +1,53 @@
+import asyncio
+import inspect
+
+from asgiref.sync import sync_to_async
+
+
+def _needs_resolving(value):
+    # Values that can also be iterated synchronously, such as QuerySets,
+    # are left for the render to evaluate, and only if the template uses
+    # them. Methods like `count` and `exists` then still work on them.
+    return inspect.isawaitable(value) or (
+        hasattr(value, "__aiter__") and not hasattr(value, "__iter__")
+    )
+
+
+async def _resolve(value):
+    if inspect.isawaitable(value):
+        return await value
+    return [item async for item in value]
+
+
+async def arender(template, context=None, request=None):
+    """
+    Render template without blocking the running event loop.
+
+    Awaitable context values are awaited and async-only iterables are
+    collected into lists first, all concurrently, since the template can't
+    await them itself. The render itself runs on a worker thread, where
+    anything it looks up lazily, such as a QuerySet, may use the database.
+    """
+    if context is not None:
+        pending = [key for key, value in context.items() if _needs_resolving(value)]
+        if pending:
+            resolved = await asyncio.gather(
+                *(_resolve(context[key]) for key in pending)
+            )
+            context = {**context, **dict(zip(pending, resolved))}
+    # The render keeps no state tied to a thread, so concurrent renders
+    # don't need to queue for Django's single sync thread.
+    render = sync_to_async(template.render, thread_sensitive=False)
+    return await render(context, request)
+
+
+async def aget_template(engine, template_name, template=None):
+    """
+    Return template if the engine found it in its cache. Otherwise load it
+    on a worker thread so reading and parsing it doesn't block the event
+    loop.
+    """
+    if template is not None:
+        return template
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, engine.get_template, template_name)
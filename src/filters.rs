@@ -1,8 +1,10 @@
 use std::sync::Arc;
 
+use pyo3::exceptions::PyAttributeError;
 use pyo3::prelude::*;
 
 use crate::types::Argument;
+use crate::utils::PyResultMethods;
 
 #[derive(Clone, Debug, PartialEq)]
 pub enum FilterType {
@@ -10,12 +12,24 @@ pub enum FilterType {
     AddSlashes(AddSlashesFilter),
     Capfirst(CapfirstFilter),
     Default(DefaultFilter),
+    DefaultIfNone(DefaultIfNoneFilter),
     Escape(EscapeFilter),
     External(ExternalFilter),
+    First(FirstFilter),
+    Join(JoinFilter),
+    Last(LastFilter),
+    Length(LengthFilter),
+    Linebreaksbr(LinebreaksbrFilter),
     Lower(LowerFilter),
     Safe(SafeFilter),
     Slugify(SlugifyFilter),
+    Striptags(StriptagsFilter),
+    Title(TitleFilter),
+    Truncatechars(TruncatecharsFilter),
+    Truncatewords(TruncatewordsFilter),
     Upper(UpperFilter),
+    Urlencode(UrlencodeFilter),
+    Yesno(YesnoFilter),
 }
 
 #[derive(Clone, Debug, PartialEq)]
@@ -46,20 +60,63 @@ impl DefaultFilter {
     }
 }
 
+#[derive(Clone, Debug, PartialEq)]
+pub struct DefaultIfNoneFilter {
+    pub argument: Argument,
+}
+
+impl DefaultIfNoneFilter {
+    pub fn new(argument: Argument) -> Self {
+        Self { argument }
+    }
+}
+
 #[derive(Clone, Debug, PartialEq)]
 pub struct EscapeFilter;
 
+/// The flags Django's `Library.filter` sets on a filter function.
+#[derive(Clone, Copy, Debug, Default, PartialEq)]
+pub struct FilterFlags {
+    pub is_safe: bool,
+    pub needs_autoescape: bool,
+    pub expects_localtime: bool,
+}
+
+/// Whether `obj` has a truthy attribute `name`, like Django's
+/// `getattr(obj, name, False)`.
+pub fn read_flag(obj: &Bound<'_, PyAny>, name: &str) -> PyResult<bool> {
+    match obj
+        .getattr(name)
+        .ok_or_isinstance_of::<PyAttributeError>(obj.py())?
+    {
+        Ok(flag) => flag.is_truthy(),
+        Err(_) => Ok(false),
+    }
+}
+
+impl FilterFlags {
+    pub fn new(filter: &Bound<'_, PyAny>) -> PyResult<Self> {
+        Ok(Self {
+            is_safe: read_flag(filter, "is_safe")?,
+            needs_autoescape: read_flag(filter, "needs_autoescape")?,
+            expects_localtime: read_flag(filter, "expects_localtime")?,
+        })
+    }
+}
+
 #[derive(Clone, Debug)]
 pub struct ExternalFilter {
     pub filter: Arc<Py<PyAny>>,
     pub argument: Option<Argument>,
+    pub flags: FilterFlags,
 }
 
 impl ExternalFilter {
-    pub fn new(filter: Py<PyAny>, argument: Option<Argument>) -> Self {
+    pub fn new(filter: Py<PyAny>, argument: Option<Argument>, flags: FilterFlags) -> Self {
         Self {
             filter: Arc::new(filter),
             argument,
+            flags,
         }
     }
 }
@@ -70,10 +127,35 @@ impl PartialEq for ExternalFilter {
         // equality comparison between two `Py` smart pointers.
         //
         // We only use `eq` in tests, so this concession is acceptable here.
-        self.argument.eq(&other.argument) && Arc::ptr_eq(&self.filter, &other.filter)
+        self.argument.eq(&other.argument)
+            && self.flags.eq(&other.flags)
+            && Arc::ptr_eq(&self.filter, &other.filter)
+    }
+}
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct FirstFilter;
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct JoinFilter {
+    pub argument: Argument,
+}
+
+impl JoinFilter {
+    pub fn new(argument: Argument) -> Self {
+        Self { argument }
     }
 }
 
+#[derive(Clone, Debug, PartialEq)]
+pub struct LastFilter;
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct LengthFilter;
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct LinebreaksbrFilter;
+
 #[derive(Clone, Debug, PartialEq)]
 pub struct LowerFilter;
 
@@ -83,5 +165,55 @@ pub struct SafeFilter;
 #[derive(Clone, Debug, PartialEq)]
 pub struct SlugifyFilter;
 
+#[derive(Clone, Debug, PartialEq)]
+pub struct StriptagsFilter;
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct TitleFilter;
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct TruncatecharsFilter {
+    pub argument: Argument,
+}
+
+impl TruncatecharsFilter {
+    pub fn new(argument: Argument) -> Self {
+        Self { argument }
+    }
+}
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct TruncatewordsFilter {
+    pub argument: Argument,
+}
+
+impl TruncatewordsFilter {
+    pub fn new(argument: Argument) -> Self {
+        Self { argument }
+    }
+}
+
 #[derive(Clone, Debug, PartialEq)]
 pub struct UpperFilter;
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct UrlencodeFilter {
+    pub argument: Option<Argument>,
+}
+
+impl UrlencodeFilter {
+    pub fn new(argument: Option<Argument>) -> Self {
+        Self { argument }
+    }
+}
+
+#[derive(Clone, Debug, PartialEq)]
+pub struct YesnoFilter {
+    pub argument: Option<Argument>,
+}
+
+impl YesnoFilter {
+    pub fn new(argument: Option<Argument>) -> Self {
+        Self { argument }
+    }
+}
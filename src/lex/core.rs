@@ -83,15 +83,23 @@ impl<'t> Lexer<'t> {
         }
     }
 
+    /// Find the start of the next tag, variable or comment in a single
+    /// scan of the rest of the template.
+    fn next_tag_start(&self) -> Option<usize> {
+        let bytes = self.rest.as_bytes();
+        let mut start = 0;
+        while let Some(offset) = self.rest[start..].find('{') {
+            let n = start + offset;
+            if let Some(b'{' | b'%' | b'#') = bytes.get(n + 1) {
+                return Some(n);
+            }
+            start = n + 1;
+        }
+        None
+    }
+
     fn lex_text(&mut self) -> Token {
-        let next_tag = self.rest.find("{%");
-        let next_variable = self.rest.find("{{");
-        let next_comment = self.rest.find("{#");
-        let next = [next_tag, next_variable, next_comment]
-            .iter()
-            .filter_map(|n| *n)
-            .min();
-        let len = match next {
+        let len = match self.next_tag_start() {
             None => {
                 let len = self.rest.len();
                 self.rest = "";
@@ -131,7 +139,7 @@ impl<'t> Lexer<'t> {
             }
             Some(n) => {
                 // This can be removed if https://code.djangoproject.com/ticket/35899 lands
-                match self.rest.find("\n") {
+                match self.rest[..n].find('\n') {
                     Some(newline) if newline < n => {
                         let at = (self.byte, newline + 1);
                         self.byte += newline + 1;
@@ -484,6 +492,37 @@ mod tests {
         assert_eq!(contents(template, tokens), vec![" verbatim ", "Don't {% "]);
     }
 
+    #[test]
+    fn test_lex_text_single_brace() {
+        let template = "{a} { {{ b }}{c";
+        let lexer = Lexer::new(template.into());
+        let tokens: Vec<_> = lexer.collect();
+        assert_eq!(
+            tokens,
+            vec![
+                Token::text((0, 6)),
+                Token::variable((6, 7)),
+                Token::text((13, 2))
+            ]
+        );
+        assert_eq!(contents(template, tokens), vec!["{a} { ", "b", "{c"]);
+    }
+
+    #[test]
+    fn test_lex_large_template() {
+        // Each token only scans forward from where the last one ended, so
+        // lexing many megabytes with one kind of tag stays linear.
+        let line = "<p>Lorem ipsum dolor sit amet</p>{# comment #}\n";
+        let template = line.repeat(100_000) + "{{ end }}";
+        let lexer = Lexer::new(template.as_str().into());
+        let tokens: Vec<_> = lexer.collect();
+        assert_eq!(tokens.len(), 200_002);
+        assert_eq!(
+            tokens.last(),
+            Some(&Token::variable((line.len() * 100_000, 9)))
+        );
+    }
+
     #[test]
     fn test_verbatim_no_tag() {
         let template = "{% verbatim %}Don't end verbatim";
@@ -0,0 +1,161 @@
+use miette::{Diagnostic, SourceSpan};
+use thiserror::Error;
+
+use crate::lex::tag::TagParts;
+use crate::types::TemplateString;
+
+#[derive(Debug, PartialEq)]
+pub struct ForTokens {
+    pub variables: Vec<(usize, usize)>,
+    pub iterable: (usize, usize),
+    pub reversed: bool,
+}
+
+#[derive(Error, Debug, Diagnostic, PartialEq, Eq)]
+pub enum ForLexerError {
+    #[error("'for' tag received an invalid argument")]
+    InvalidVariable {
+        #[label("here")]
+        at: SourceSpan,
+    },
+    #[error("'for' statements should use the format 'for x in y'")]
+    MissingIn {
+        #[label("here")]
+        at: SourceSpan,
+    },
+    #[error("'for' statements should have at least four words")]
+    TooFewWords {
+        #[label("here")]
+        at: SourceSpan,
+    },
+}
+
+/// Split `content` on whitespace outside of quotes, like Django's
+/// `Token.split_contents`.
+fn split_contents(content: &str, start: usize) -> Vec<(usize, usize)> {
+    let mut bits = Vec::new();
+    let mut bit_start = None;
+    let mut quote = None;
+    for (index, c) in content.char_indices() {
+        match quote {
+            Some(q) if c == q => quote = None,
+            Some(_) => {}
+            None if c.is_whitespace() => {
+                if let Some(bit_start) = bit_start.take() {
+                    bits.push((start + bit_start, index - bit_start));
+                }
+                continue;
+            }
+            None if c == '"' || c == '\'' => quote = Some(c),
+            None => {}
+        }
+        bit_start.get_or_insert(index);
+    }
+    if let Some(bit_start) = bit_start {
+        bits.push((start + bit_start, content.len() - bit_start));
+    }
+    bits
+}
+
+pub fn lex_for(template: TemplateString<'_>, parts: TagParts) -> Result<ForTokens, ForLexerError> {
+    let bits = split_contents(template.content(parts.at), parts.at.0);
+    if bits.len() < 3 {
+        return Err(ForLexerError::TooFewWords {
+            at: parts.at.into(),
+        });
+    }
+    let reversed = template.content(bits[bits.len() - 1]) == "reversed";
+    let in_index = match reversed {
+        true => bits.len() - 3,
+        false => bits.len() - 2,
+    };
+    if template.content(bits[in_index]) != "in" {
+        return Err(ForLexerError::MissingIn {
+            at: bits[in_index].into(),
+        });
+    }
+    if in_index == 0 {
+        return Err(ForLexerError::InvalidVariable { at: bits[0].into() });
+    }
+
+    // Django joins the words before `in` and splits them on commas, so
+    // `k,v`, `k, v` and `k , v` all name the same two variables.
+    let (start, _) = bits[0];
+    let (last_start, last_len) = bits[in_index - 1];
+    let names = template.content((start, last_start + last_len - start));
+    let mut variables = Vec::new();
+    let mut offset = start;
+    for name in names.split(',') {
+        let trimmed = name.trim();
+        let at = (offset + name.len() - name.trim_start().len(), trimmed.len());
+        if trimmed.is_empty()
+            || trimmed.contains(|c: char| c.is_whitespace() || c == '"' || c == '\'' || c == '|')
+        {
+            return Err(ForLexerError::InvalidVariable {
+                at: (offset, name.len()).into(),
+            });
+        }
+        variables.push(at);
+        offset += name.len() + 1;
+    }
+    Ok(ForTokens {
+        variables,
+        iterable: bits[in_index + 1],
+        reversed,
+    })
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_lex_for() {
+        let template = "{% for x in items %}";
+        let parts = TagParts { at: (7, 10) };
+        let tokens = lex_for(template.into(), parts).unwrap();
+        let expected = ForTokens {
+            variables: vec![(7, 1)],
+            iterable: (12, 5),
+            reversed: false,
+        };
+        assert_eq!(tokens, expected);
+    }
+
+    #[test]
+    fn test_lex_for_unpack_reversed() {
+        let template = "{% for k , v in items|join:', ' reversed %}";
+        let parts = TagParts { at: (7, 33) };
+        let tokens = lex_for(template.into(), parts).unwrap();
+        let expected = ForTokens {
+            variables: vec![(7, 1), (11, 1)],
+            iterable: (16, 15),
+            reversed: true,
+        };
+        assert_eq!(tokens, expected);
+    }
+
+    #[test]
+    fn test_lex_for_too_few_words() {
+        let template = "{% for x in %}";
+        let parts = TagParts { at: (7, 4) };
+        let error = lex_for(template.into(), parts).unwrap_err();
+        assert_eq!(error, ForLexerError::TooFewWords { at: (7, 4).into() });
+    }
+
+    #[test]
+    fn test_lex_for_missing_in() {
+        let template = "{% for x of items %}";
+        let parts = TagParts { at: (7, 10) };
+        let error = lex_for(template.into(), parts).unwrap_err();
+        assert_eq!(error, ForLexerError::MissingIn { at: (9, 2).into() });
+    }
+
+    #[test]
+    fn test_lex_for_invalid_variable() {
+        let template = "{% for x, in items %}";
+        let parts = TagParts { at: (7, 11) };
+        let error = lex_for(template.into(), parts).unwrap_err();
+        assert_eq!(error, ForLexerError::InvalidVariable { at: (9, 0).into() });
+    }
+}
@@ -2,6 +2,7 @@ mod error;
 mod filters;
 mod lex;
 mod loaders;
+mod optimize;
 mod parse;
 mod render;
 mod template;
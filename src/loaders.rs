@@ -1,8 +1,16 @@
-use std::collections::HashMap;
+use std::collections::{BTreeMap, HashMap, HashSet};
+use std::fs::File;
+use std::io::{Error as IoError, ErrorKind};
+use std::num::NonZeroUsize;
+use std::ops::Range;
 use std::path::{Path, PathBuf};
+use std::sync::{Arc, Condvar, Mutex, MutexGuard, OnceLock, PoisonError, RwLock};
+use std::thread::ThreadId;
+use std::time::{Duration, Instant, SystemTime};
 
 use cached::proc_macro::cached;
 use encoding_rs::Encoding;
+use memmap2::Mmap;
 use pyo3::exceptions::PyUnicodeError;
 use pyo3::prelude::*;
 use sugar_path::SugarPath;
@@ -48,7 +56,7 @@ fn get_app_template_dir(path: Bound<'_, PyAny>, dirname: &str) -> Result<Option<
     key = "String",      // Use owned String as key
     convert = r##"{ dirname.to_string() }"## // Convert &str to String
 )]
-fn get_app_template_dirs(py: Python<'_>, dirname: &str) -> Result<Vec<PathBuf>, PyErr> {
+pub fn get_app_template_dirs(py: Python<'_>, dirname: &str) -> Result<Vec<PathBuf>, PyErr> {
     let apps_module = PyModule::import(py, "django.apps")?;
     let apps = apps_module.getattr("apps")?;
     let app_configs = apps.call_method0("get_app_configs")?;
@@ -64,18 +72,43 @@ fn get_app_template_dirs(py: Python<'_>, dirname: &str) -> Result<Vec<PathBuf>,
     Ok(template_dirs)
 }
 
+/// Whether `template_name` is spelled the way `find_templates` names
+/// files, so that the directory index can answer for it.
+fn is_indexable(template_name: &str) -> bool {
+    template_name
+        .split('/')
+        .all(|part| !matches!(part, "" | "." | "..") && !part.contains('\\'))
+}
+
 pub struct FileSystemLoader {
     dirs: Vec<PathBuf>,
     encoding: &'static Encoding,
+    use_index: bool,
+    // Template names mapped to the first file matching them, built on the
+    // first lookup and dropped by `reset`.
+    index: RwLock<Option<Arc<HashMap<String, PathBuf>>>>,
 }
 
 impl FileSystemLoader {
     pub fn new(dirs: Vec<PathBuf>, encoding: &'static Encoding) -> Self {
-        Self { dirs, encoding }
+        Self {
+            dirs,
+            encoding,
+            use_index: false,
+            index: RwLock::new(None),
+        }
     }
 
     pub fn from_pathbuf(dirs: Vec<PathBuf>, encoding: &'static Encoding) -> Self {
-        Self { dirs, encoding }
+        Self::new(dirs, encoding)
+    }
+
+    /// Resolve template names with an index of the template directories
+    /// instead of trying each directory in turn. Files added after the
+    /// index is built are not found until the loader is reset.
+    pub fn with_index(mut self, use_index: bool) -> Self {
+        self.use_index = use_index;
+        self
     }
 
     fn get_template(
@@ -84,42 +117,140 @@ impl FileSystemLoader {
         template_name: &str,
         engine: &EngineData,
     ) -> Result<PyResult<Template>, LoaderError> {
+        if self.use_index && is_indexable(template_name) {
+            let index = self.index();
+            let Some(path) = index.get(template_name) else {
+                return Err(LoaderError {
+                    tried: self.tried(template_name),
+                });
+            };
+            match read_template(path, self.encoding) {
+                Ok(contents) => return Ok(Template::new(py, &contents, path.clone(), engine)),
+                Err(ReadError::Malformed(encoding)) => {
+                    return Ok(Err(encoding_error(path, encoding)));
+                }
+                // The file was removed after indexing, so search for it.
+                Err(ReadError::Missing) => {}
+            }
+        }
+
         let mut tried = Vec::new();
         for template_dir in &self.dirs {
             let path = match safe_join(template_dir, template_name) {
                 Some(path) => path,
                 None => continue,
             };
-            let bytes = match std::fs::read(&path) {
-                Ok(bytes) => bytes,
-                Err(_) => {
-                    tried.push((
-                        path.display().to_string(),
-                        "Source does not exist".to_string(),
-                    ));
-                    continue;
+            match read_template(&path, self.encoding) {
+                Ok(contents) => return Ok(Template::new(py, &contents, path, engine)),
+                Err(ReadError::Missing) => tried.push((
+                    path.display().to_string(),
+                    "Source does not exist".to_string(),
+                )),
+                Err(ReadError::Malformed(encoding)) => {
+                    return Ok(Err(encoding_error(&path, encoding)));
                 }
-            };
-            let (contents, encoding, malformed) = self.encoding.decode(&bytes);
-            if malformed {
-                return Ok(Err(PyUnicodeError::new_err(format!(
-                    "Could not open {path:?} with {} encoding.",
-                    encoding.name()
-                ))));
             }
-            return Ok(Template::new(py, &contents, path, engine));
         }
         Err(LoaderError { tried })
     }
+
+    fn index(&self) -> Arc<HashMap<String, PathBuf>> {
+        if let Some(index) = &*self.index.read().unwrap_or_else(PoisonError::into_inner) {
+            return index.clone();
+        }
+        // Scan without holding the lock, so lookups on other threads aren't
+        // held up. If two threads race to build the index the first wins.
+        let index = Arc::new(find_templates(&self.dirs).into_iter().collect());
+        self.index
+            .write()
+            .unwrap_or_else(PoisonError::into_inner)
+            .get_or_insert(index)
+            .clone()
+    }
+
+    fn tried(&self, template_name: &str) -> Vec<(String, String)> {
+        self.dirs
+            .iter()
+            .filter_map(|template_dir| safe_join(template_dir, template_name))
+            .map(|path| {
+                (
+                    path.display().to_string(),
+                    "Source does not exist".to_string(),
+                )
+            })
+            .collect()
+    }
+
+    fn reset(&self) {
+        *self.index.write().unwrap_or_else(PoisonError::into_inner) = None;
+    }
+}
+
+pub enum ReadError {
+    Missing,
+    Malformed(&'static Encoding),
+}
+
+fn read_template(path: &Path, encoding: &'static Encoding) -> Result<String, ReadError> {
+    let bytes = std::fs::read(path).map_err(|_| ReadError::Missing)?;
+    let (contents, encoding, malformed) = encoding.decode(&bytes);
+    if malformed {
+        return Err(ReadError::Malformed(encoding));
+    }
+    Ok(contents.into_owned())
+}
+
+fn encoding_error(path: &Path, encoding: &'static Encoding) -> PyErr {
+    PyUnicodeError::new_err(format!(
+        "Could not open {path:?} with {} encoding.",
+        encoding.name()
+    ))
+}
+
+/// Read and decode template files on a pool of scoped threads.
+pub fn read_templates(
+    paths: &[&Path],
+    encoding: &'static Encoding,
+) -> Vec<Result<String, ReadError>> {
+    let workers = std::thread::available_parallelism().map_or(1, NonZeroUsize::get);
+    let chunk_size = paths.len().div_ceil(workers).max(1);
+    std::thread::scope(|scope| {
+        let handles: Vec<_> = paths
+            .chunks(chunk_size)
+            .map(|chunk| {
+                scope.spawn(move || {
+                    chunk
+                        .iter()
+                        .map(|path| read_template(path, encoding))
+                        .collect::<Vec<_>>()
+                })
+            })
+            .collect();
+        handles
+            .into_iter()
+            .flat_map(|handle| handle.join().expect("Reading a template should not panic"))
+            .collect()
+    })
 }
 
 pub struct AppDirsLoader {
     encoding: &'static Encoding,
+    use_index: bool,
+    filesystem_loader: OnceLock<FileSystemLoader>,
 }
 
 impl AppDirsLoader {
     pub fn new(encoding: &'static Encoding) -> Self {
-        Self { encoding }
+        Self {
+            encoding,
+            use_index: false,
+            filesystem_loader: OnceLock::new(),
+        }
+    }
+
+    pub fn with_index(mut self, use_index: bool) -> Self {
+        self.use_index = use_index;
+        self
     }
 
     fn get_template(
@@ -128,17 +259,169 @@ impl AppDirsLoader {
         template_name: &str,
         engine: &EngineData,
     ) -> Result<PyResult<Template>, LoaderError> {
+        if let Some(filesystem_loader) = self.filesystem_loader.get() {
+            return filesystem_loader.get_template(py, template_name, engine);
+        }
         let dirs = match get_app_template_dirs(py, "templates") {
             Ok(dirs) => dirs,
             Err(e) => return Ok(Err(e)),
         };
-        let filesystem_loader = FileSystemLoader::from_pathbuf(dirs, self.encoding);
+        let filesystem_loader = self.filesystem_loader.get_or_init(|| {
+            FileSystemLoader::from_pathbuf(dirs, self.encoding).with_index(self.use_index)
+        });
         filesystem_loader.get_template(py, template_name, engine)
     }
+
+    fn reset(&self) {
+        if let Some(filesystem_loader) = self.filesystem_loader.get() {
+            filesystem_loader.reset();
+        }
+    }
+}
+
+/// The state of a template's source file when it was compiled.
+#[derive(Clone, Debug, PartialEq, Eq)]
+struct SourceStamp {
+    path: PathBuf,
+    modified: Option<SystemTime>,
+    len: u64,
+}
+
+impl SourceStamp {
+    fn new(path: &Path) -> Option<Self> {
+        let metadata = std::fs::metadata(path).ok()?;
+        Some(Self {
+            path: path.to_path_buf(),
+            modified: metadata.modified().ok(),
+            len: metadata.len(),
+        })
+    }
+
+    fn is_current(&self) -> bool {
+        Self::new(&self.path).as_ref() == Some(self)
+    }
+}
+
+/// Limits on the size of a `CachedLoader`'s cache.
+///
+/// Loaded templates are evicted least recently used first once there are
+/// more than `max_entries` of them or their sources add up to more than
+/// `max_bytes`. Missing templates have their own limits, so looking up many
+/// missing names cannot push real templates out of the cache.
+#[derive(Clone, Copy, Debug, Default, PartialEq, Eq)]
+pub struct CacheLimits {
+    pub max_entries: Option<usize>,
+    pub max_bytes: Option<usize>,
+    pub max_missing: Option<usize>,
+    pub missing_ttl: Option<Duration>,
+}
+
+#[derive(Clone, Debug, Default, PartialEq, Eq, IntoPyObject)]
+pub struct CacheInfo {
+    pub hits: u64,
+    pub misses: u64,
+    pub evictions: u64,
+    pub entries: usize,
+    pub missing: usize,
+    pub bytes: usize,
+}
+
+struct CacheEntry {
+    result: Result<Template, LoaderError>,
+    source: Option<SourceStamp>,
+    created: Instant,
+    checked: Instant,
+    used: u64,
+}
+
+impl CacheEntry {
+    fn new(result: Result<Template, LoaderError>, check_interval: Option<Duration>) -> Self {
+        let source = match (&result, check_interval) {
+            (Ok(template), Some(_)) => template.filename.as_deref().and_then(SourceStamp::new),
+            _ => None,
+        };
+        let now = Instant::now();
+        Self {
+            result,
+            source,
+            created: now,
+            checked: now,
+            used: 0,
+        }
+    }
+
+    fn size(&self) -> usize {
+        match &self.result {
+            Ok(template) => template.template.len(),
+            Err(_) => 0,
+        }
+    }
+
+    /// Check whether this entry should be loaded again.
+    ///
+    /// Missing templates expire after `missing_ttl`. Otherwise entries are
+    /// only checked against the filesystem once every `check_interval`.
+    /// Missing templates are looked up again, and a template loaded from a
+    /// file returns its stamp so the caller can check the file without
+    /// holding the cache lock.
+    fn staleness(
+        &self,
+        check_interval: Option<Duration>,
+        missing_ttl: Option<Duration>,
+    ) -> Staleness {
+        if let (Err(_), Some(missing_ttl)) = (&self.result, missing_ttl) {
+            if self.created.elapsed() >= missing_ttl {
+                return Staleness::Stale;
+            }
+        }
+        let check_interval = match check_interval {
+            Some(check_interval) => check_interval,
+            None => return Staleness::Fresh,
+        };
+        if self.checked.elapsed() < check_interval {
+            return Staleness::Fresh;
+        }
+        match (&self.result, &self.source) {
+            (Err(_), _) => Staleness::Stale,
+            (Ok(_), Some(source)) => Staleness::Unchecked(source.clone()),
+            (Ok(_), None) => Staleness::Fresh,
+        }
+    }
+}
+
+enum Staleness {
+    Fresh,
+    Stale,
+    // The template's source file is due to be checked for changes.
+    Unchecked(SourceStamp),
+}
+
+#[derive(Default)]
+struct CacheState {
+    cache: HashMap<String, CacheEntry>,
+    // Template names keyed by when they were last used, oldest first.
+    recently_used: BTreeMap<u64, String>,
+    recently_missing: BTreeMap<u64, String>,
+    // Names of templates being loaded, with the thread loading each one.
+    loading: HashMap<String, ThreadId>,
+    // Bumped by `reset`, so loads started before it don't cache results.
+    generation: u64,
+    clock: u64,
+    bytes: usize,
+    hits: u64,
+    misses: u64,
+    evictions: u64,
 }
 
 pub struct CachedLoader {
-    cache: HashMap<String, Result<Template, LoaderError>>,
+    // Only locked to read or update the cache, never while a template is
+    // loaded, because loading can run Python code which may wait on
+    // another thread.
+    state: Mutex<CacheState>,
+    // Signalled whenever a template finishes loading.
+    loaded: Condvar,
+    check_interval: Option<Duration>,
+    limits: CacheLimits,
     pub loaders: Vec<Loader>,
 }
 
@@ -146,37 +429,342 @@ impl CachedLoader {
     pub fn new(loaders: Vec<Loader>) -> Self {
         Self {
             loaders,
-            cache: HashMap::new(),
+            state: Mutex::new(CacheState::default()),
+            loaded: Condvar::new(),
+            check_interval: None,
+            limits: CacheLimits::default(),
         }
     }
 
+    /// Revalidate cached templates against their source files at most
+    /// once every `check_interval`.
+    pub fn with_check_interval(mut self, check_interval: Option<Duration>) -> Self {
+        self.check_interval = check_interval;
+        self
+    }
+
+    pub fn with_limits(mut self, limits: CacheLimits) -> Self {
+        self.limits = limits;
+        self
+    }
+
+    fn state(&self) -> MutexGuard<'_, CacheState> {
+        self.state.lock().unwrap_or_else(PoisonError::into_inner)
+    }
+
     fn get_template(
-        &mut self,
+        &self,
         py: Python<'_>,
         template_name: &str,
         engine: &EngineData,
     ) -> Result<PyResult<Template>, LoaderError> {
-        match self.cache.get(template_name) {
-            Some(Ok(template)) => Ok(Ok((*template).clone())),
-            Some(Err(e)) => Err(e.clone()),
-            None => {
-                let mut tried = Vec::new();
-                for loader in &mut self.loaders {
-                    match loader.get_template(py, template_name, engine) {
-                        Ok(Ok(template)) => {
-                            self.cache
-                                .insert(template_name.to_string(), Ok(template.clone()));
-                            return Ok(Ok(template));
+        self.get_or_load(py, template_name, || self.load(py, template_name, engine))
+    }
+
+    /// Lock the cache and check whether it holds a fresh entry for
+    /// `template_name`. A source file that is due to be checked is checked
+    /// with the lock released, so a slow filesystem doesn't hold up every
+    /// other lookup.
+    fn lookup(&self, template_name: &str) -> (MutexGuard<'_, CacheState>, bool) {
+        loop {
+            let mut state = self.state();
+            let fresh = match state.cache.get_mut(template_name) {
+                None => false,
+                Some(entry) => {
+                    match entry.staleness(self.check_interval, self.limits.missing_ttl) {
+                        Staleness::Fresh => true,
+                        Staleness::Stale => false,
+                        Staleness::Unchecked(source) => {
+                            // Other threads use the entry as it is meanwhile.
+                            entry.checked = Instant::now();
+                            let created = entry.created;
+                            drop(state);
+                            let current = source.is_current();
+                            state = self.state();
+                            match state.cache.get(template_name) {
+                                Some(entry) if entry.created == created => current,
+                                // The entry was replaced or evicted while the
+                                // file was checked, so look again.
+                                _ => continue,
+                            }
                         }
-                        Ok(Err(e)) => return Ok(Err(e)),
-                        Err(mut e) => tried.append(&mut e.tried),
                     }
                 }
-                let error = LoaderError { tried };
-                self.cache
-                    .insert(template_name.to_string(), Err(error.clone()));
-                Err(error)
+            };
+            return (state, fresh);
+        }
+    }
+
+    /// Return `template_name` from the cache, or load it with `load` and
+    /// cache the result. Only one thread loads a template at a time.
+    fn get_or_load(
+        &self,
+        py: Python<'_>,
+        template_name: &str,
+        load: impl FnOnce() -> Result<PyResult<Template>, LoaderError>,
+    ) -> Result<PyResult<Template>, LoaderError> {
+        let check_interval = self.check_interval;
+        let generation = loop {
+            let (mut state, fresh) = self.lookup(template_name);
+            if fresh {
+                let result = match &state.cache[template_name].result {
+                    Ok(template) => Ok(Ok(template.clone())),
+                    Err(e) => Err(e.clone()),
+                };
+                state.hits += 1;
+                state.touch(template_name);
+                return result;
+            }
+            let current = std::thread::current().id();
+            match state.loading.get(template_name).copied() {
+                None => {
+                    state.loading.insert(template_name.to_string(), current);
+                    state.misses += 1;
+                    break state.generation;
+                }
+                // This thread is already loading the template further up
+                // the stack, such as a template that includes itself, so
+                // waiting would never end. Load it again without caching.
+                Some(thread) if thread == current => {
+                    state.misses += 1;
+                    drop(state);
+                    return load();
+                }
+                Some(_) => {}
+            }
+            // Another thread is loading this template, so wait for it and
+            // then look in the cache again.
+            drop(state);
+            py.allow_threads(|| {
+                let state = self.state();
+                let _state = self
+                    .loaded
+                    .wait_while(state, |state| state.loading.contains_key(template_name))
+                    .unwrap_or_else(PoisonError::into_inner);
+            });
+        };
+        let _loading = Loading {
+            loader: self,
+            template_name,
+        };
+        let result = load();
+        let entry = match &result {
+            Ok(Ok(template)) => CacheEntry::new(Ok(template.clone()), check_interval),
+            Ok(Err(_)) => return result,
+            Err(error) => CacheEntry::new(Err(error.clone()), check_interval),
+        };
+        self.store(template_name, entry, generation);
+        result
+    }
+
+    /// Load `template_name` from the first loader that has it, skipping
+    /// the cache.
+    fn load(
+        &self,
+        py: Python<'_>,
+        template_name: &str,
+        engine: &EngineData,
+    ) -> Result<PyResult<Template>, LoaderError> {
+        let mut tried = Vec::new();
+        for loader in &self.loaders {
+            match loader.get_template(py, template_name, engine) {
+                Err(mut e) => tried.append(&mut e.tried),
+                result => return result,
+            }
+        }
+        Err(LoaderError { tried })
+    }
+
+    /// Cache `entry` unless the cache was reset since `generation`, in
+    /// which case it may be out of date.
+    fn store(&self, template_name: &str, entry: CacheEntry, generation: u64) {
+        let mut state = self.state();
+        if state.generation == generation {
+            state.insert(template_name, entry, self.limits);
+        }
+    }
+
+    /// Return `template_name` if it is already cached, without loading it.
+    pub fn cached(&self, template_name: &str) -> Option<Template> {
+        let (mut state, fresh) = self.lookup(template_name);
+        if !fresh {
+            return None;
+        }
+        let template = state.cache[template_name].result.as_ref().ok()?.clone();
+        state.hits += 1;
+        state.touch(template_name);
+        Some(template)
+    }
+
+    /// Load `template_names` into the cache ahead of their first use.
+    ///
+    /// Templates found in `paths` are read and decoded on several threads
+    /// with the GIL released, then parsed. Anything else, including
+    /// templates the bundle provides, is loaded the usual way. Either way
+    /// they are cached like `get_template` does, so a thread asking for
+    /// one of them meanwhile waits instead of loading it again.
+    pub fn warm(
+        &self,
+        py: Python<'_>,
+        template_names: &[String],
+        paths: &BTreeMap<String, PathBuf>,
+        encoding: &'static Encoding,
+        engine: &EngineData,
+    ) -> Vec<(String, Result<PyResult<Template>, LoaderError>)> {
+        let mut results = Vec::with_capacity(template_names.len());
+        let mut to_read = Vec::new();
+        for template_name in template_names {
+            if let Some(template) = self.cached(template_name) {
+                results.push((template_name.clone(), Ok(Ok(template))));
+                continue;
+            }
+            match paths.get(template_name) {
+                Some(path) if !self.is_bundled(template_name) => {
+                    to_read.push((template_name, path.as_path()))
+                }
+                _ => {
+                    let result = self.get_template(py, template_name, engine);
+                    results.push((template_name.clone(), result));
+                }
+            }
+        }
+
+        let sources = py.allow_threads(|| {
+            let paths: Vec<_> = to_read.iter().map(|(_, path)| *path).collect();
+            read_templates(&paths, encoding)
+        });
+        for ((template_name, path), source) in to_read.into_iter().zip(sources) {
+            let result = self.get_or_load(py, template_name, || match source {
+                Ok(contents) => Ok(Template::new(py, &contents, path.to_path_buf(), engine)),
+                Err(ReadError::Malformed(encoding)) => Ok(Err(encoding_error(path, encoding))),
+                // The file went away after we found it.
+                Err(ReadError::Missing) => self.load(py, template_name, engine),
+            });
+            results.push((template_name.clone(), result));
+        }
+        results
+    }
+
+    fn is_bundled(&self, template_name: &str) -> bool {
+        self.loaders.iter().any(
+            |loader| matches!(loader, Loader::Bundle(bundle) if bundle.contains(template_name)),
+        )
+    }
+
+    fn cache_info(&self) -> CacheInfo {
+        let state = self.state();
+        CacheInfo {
+            hits: state.hits,
+            misses: state.misses,
+            evictions: state.evictions,
+            entries: state.recently_used.len(),
+            missing: state.recently_missing.len(),
+            bytes: state.bytes,
+        }
+    }
+
+    /// Empty the cache, like Django's `cached.Loader.reset`.
+    fn reset(&self) {
+        {
+            let mut state = self.state();
+            state.cache.clear();
+            state.recently_used.clear();
+            state.recently_missing.clear();
+            state.bytes = 0;
+            state.generation += 1;
+        }
+        for loader in &self.loaders {
+            loader.reset();
+        }
+    }
+}
+
+/// Marks a template as being loaded by this thread until dropped, so
+/// other threads wait for its result instead of loading it as well.
+struct Loading<'a> {
+    loader: &'a CachedLoader,
+    template_name: &'a str,
+}
+
+impl Drop for Loading<'_> {
+    fn drop(&mut self) {
+        self.loader.state().loading.remove(self.template_name);
+        self.loader.loaded.notify_all();
+    }
+}
+
+impl CacheState {
+    fn touch(&mut self, template_name: &str) {
+        self.clock += 1;
+        let entry = self
+            .cache
+            .get_mut(template_name)
+            .expect("Only cached templates can be touched");
+        let used = std::mem::replace(&mut entry.used, self.clock);
+        let recent = match entry.result {
+            Ok(_) => &mut self.recently_used,
+            Err(_) => &mut self.recently_missing,
+        };
+        if let Some(name) = recent.remove(&used) {
+            recent.insert(self.clock, name);
+        }
+    }
+
+    fn insert(&mut self, template_name: &str, mut entry: CacheEntry, limits: CacheLimits) {
+        self.remove(template_name);
+        self.clock += 1;
+        entry.used = self.clock;
+        match entry.result {
+            Ok(_) => {
+                self.bytes += entry.size();
+                self.recently_used
+                    .insert(self.clock, template_name.to_string());
+            }
+            Err(_) => {
+                self.recently_missing
+                    .insert(self.clock, template_name.to_string());
+            }
+        }
+        self.cache.insert(template_name.to_string(), entry);
+        self.evict(limits);
+    }
+
+    fn remove(&mut self, template_name: &str) {
+        if let Some(entry) = self.cache.remove(template_name) {
+            match entry.result {
+                Ok(_) => {
+                    self.bytes -= entry.size();
+                    self.recently_used.remove(&entry.used);
+                }
+                Err(_) => {
+                    self.recently_missing.remove(&entry.used);
+                }
+            }
+        }
+    }
+
+    fn evict(&mut self, limits: CacheLimits) {
+        let max_entries = limits.max_entries.unwrap_or(usize::MAX);
+        let max_bytes = limits.max_bytes.unwrap_or(usize::MAX);
+        while self.recently_used.len() > max_entries || self.bytes > max_bytes {
+            let (_, template_name) = self
+                .recently_used
+                .pop_first()
+                .expect("The cache is over its limits, so it is not empty");
+            if let Some(entry) = self.cache.remove(&template_name) {
+                self.bytes -= entry.size();
             }
+            self.evictions += 1;
+        }
+
+        let max_missing = limits.max_missing.unwrap_or(usize::MAX);
+        while self.recently_missing.len() > max_missing {
+            let (_, template_name) = self
+                .recently_missing
+                .pop_first()
+                .expect("The cache is over its limits, so it is not empty");
+            self.cache.remove(&template_name);
+            self.evictions += 1;
         }
     }
 }
@@ -214,6 +802,220 @@ impl LocMemLoader {
     }
 }
 
+/// Find every file under `dirs`, keyed by the name a `FileSystemLoader`
+/// would load it by. Earlier directories shadow later ones.
+pub fn find_templates(dirs: &[PathBuf]) -> BTreeMap<String, PathBuf> {
+    let mut templates = BTreeMap::new();
+    for dir in dirs {
+        find_templates_in(dir, dir, &mut templates, &mut HashSet::new());
+    }
+    templates
+}
+
+fn find_templates_in(
+    root: &Path,
+    dir: &Path,
+    templates: &mut BTreeMap<String, PathBuf>,
+    ancestors: &mut HashSet<PathBuf>,
+) {
+    // Follow symlinks like opening a template does. Only a directory that
+    // contains itself is skipped, to end symlink loops, so a directory
+    // linked from two places is found under both names.
+    let Ok(canonical) = dir.canonicalize() else {
+        return;
+    };
+    if !ancestors.insert(canonical.clone()) {
+        return;
+    }
+    if let Ok(entries) = std::fs::read_dir(dir) {
+        for entry in entries.flatten() {
+            let path = entry.path();
+            if path.is_dir() {
+                find_templates_in(root, &path, templates, ancestors);
+                continue;
+            }
+            if !path.is_file() {
+                continue;
+            }
+            let Ok(relative) = path.strip_prefix(root) else {
+                continue;
+            };
+            let Some(parts) = relative
+                .components()
+                .map(|component| component.as_os_str().to_str())
+                .collect::<Option<Vec<_>>>()
+            else {
+                continue;
+            };
+            let name = parts.join("/");
+            if templates.contains_key(&name) {
+                continue;
+            }
+            if let Some(path) = safe_join(root, &name) {
+                templates.insert(name, path);
+            }
+        }
+    }
+    ancestors.remove(&canonical);
+}
+
+const BUNDLE_MAGIC: &[u8; 4] = b"DRTB";
+const BUNDLE_VERSION: u32 = 1;
+
+fn invalid_bundle(message: &str) -> IoError {
+    IoError::new(ErrorKind::InvalidData, message.to_string())
+}
+
+/// Write the source of each template into a single bundle file.
+///
+/// The layout is the magic bytes, a version and a count, followed by a
+/// length-prefixed name, path and source per template. All integers are
+/// little-endian `u32`s. Files that can't be decoded with `encoding` are
+/// left out so that loading them reports the same error as before.
+///
+/// The bundle is written to a temporary file which is renamed over `path`,
+/// so a process that has the old bundle mapped keeps reading the old file.
+pub fn write_bundle(
+    path: &Path,
+    templates: &BTreeMap<String, PathBuf>,
+    encoding: &'static Encoding,
+) -> std::io::Result<usize> {
+    fn write_str(buffer: &mut Vec<u8>, value: &str) -> std::io::Result<()> {
+        let len = u32::try_from(value.len())
+            .map_err(|_| invalid_bundle("Template is too large to bundle."))?;
+        buffer.extend_from_slice(&len.to_le_bytes());
+        buffer.extend_from_slice(value.as_bytes());
+        Ok(())
+    }
+
+    let mut body = Vec::new();
+    let mut count: u32 = 0;
+    for (name, template_path) in templates {
+        let bytes = std::fs::read(template_path)?;
+        let (contents, _, malformed) = encoding.decode(&bytes);
+        if malformed {
+            continue;
+        }
+        write_str(&mut body, name)?;
+        write_str(&mut body, &template_path.display().to_string())?;
+        write_str(&mut body, &contents)?;
+        count += 1;
+    }
+
+    let mut buffer = Vec::with_capacity(body.len() + 12);
+    buffer.extend_from_slice(BUNDLE_MAGIC);
+    buffer.extend_from_slice(&BUNDLE_VERSION.to_le_bytes());
+    buffer.extend_from_slice(&count.to_le_bytes());
+    buffer.extend_from_slice(&body);
+    let mut temporary = path.as_os_str().to_owned();
+    temporary.push(".tmp");
+    std::fs::write(&temporary, buffer)?;
+    std::fs::rename(&temporary, path)?;
+    Ok(count as usize)
+}
+
+struct BundleReader<'a> {
+    data: &'a [u8],
+    position: usize,
+}
+
+impl<'a> BundleReader<'a> {
+    fn take(&mut self, len: usize) -> std::io::Result<Range<usize>> {
+        let start = self.position;
+        let end = start
+            .checked_add(len)
+            .filter(|end| *end <= self.data.len())
+            .ok_or_else(|| invalid_bundle("Template bundle is truncated."))?;
+        self.position = end;
+        Ok(start..end)
+    }
+
+    fn read_u32(&mut self) -> std::io::Result<u32> {
+        let range = self.take(4)?;
+        let bytes: [u8; 4] = self.data[range].try_into().expect("took four bytes");
+        Ok(u32::from_le_bytes(bytes))
+    }
+
+    fn read_str(&mut self) -> std::io::Result<(&'a str, Range<usize>)> {
+        let len = self.read_u32()? as usize;
+        let range = self.take(len)?;
+        let data = self.data;
+        let value = std::str::from_utf8(&data[range.clone()])
+            .map_err(|_| invalid_bundle("Template bundle is not valid UTF-8."))?;
+        Ok((value, range))
+    }
+}
+
+struct BundleEntry {
+    path: PathBuf,
+    source: Range<usize>,
+}
+
+/// Loads templates from a file written by `write_bundle`.
+///
+/// The bundle is indexed once up front, so loading a template skips
+/// searching the template directories and reading and decoding its file.
+/// Templates are still parsed from their source on first use.
+pub struct BundleLoader {
+    // The bundle is mapped rather than read, so every process serving the
+    // same bundle shares one copy of it in the page cache.
+    data: Mmap,
+    entries: HashMap<String, BundleEntry>,
+}
+
+impl BundleLoader {
+    pub fn open(path: &Path) -> std::io::Result<Self> {
+        let file = File::open(path)?;
+        // SAFETY: `write_bundle` never changes a bundle in place, it renames
+        // a new file over it, so the mapped file isn't modified.
+        let data = unsafe { Mmap::map(&file)? };
+        let mut reader = BundleReader {
+            data: &data,
+            position: 0,
+        };
+        let magic = reader.take(BUNDLE_MAGIC.len())?;
+        if &data[magic] != BUNDLE_MAGIC {
+            return Err(invalid_bundle("Not a template bundle."));
+        }
+        if reader.read_u32()? != BUNDLE_VERSION {
+            return Err(invalid_bundle("Unsupported template bundle version."));
+        }
+        let count = reader.read_u32()?;
+        let mut entries = HashMap::new();
+        for _ in 0..count {
+            let (name, _) = reader.read_str()?;
+            let (path, _) = reader.read_str()?;
+            let (_, source) = reader.read_str()?;
+            let entry = BundleEntry {
+                path: PathBuf::from(path),
+                source,
+            };
+            entries.insert(name.to_string(), entry);
+        }
+        Ok(Self { data, entries })
+    }
+
+    fn contains(&self, template_name: &str) -> bool {
+        self.entries.contains_key(template_name)
+    }
+
+    fn get_template(
+        &self,
+        py: Python<'_>,
+        template_name: &str,
+        engine: &EngineData,
+    ) -> Result<PyResult<Template>, LoaderError> {
+        match self.entries.get(template_name) {
+            Some(entry) => {
+                let contents = std::str::from_utf8(&self.data[entry.source.clone()])
+                    .expect("Sources are checked when the bundle is opened");
+                Ok(Template::new(py, contents, entry.path.clone(), engine))
+            }
+            None => Err(LoaderError { tried: Vec::new() }),
+        }
+    }
+}
+
 pub struct ExternalLoader {}
 
 impl ExternalLoader {
@@ -232,12 +1034,13 @@ pub enum Loader {
     AppDirs(AppDirsLoader),
     Cached(CachedLoader),
     LocMem(LocMemLoader),
+    Bundle(BundleLoader),
     External(ExternalLoader),
 }
 
 impl Loader {
     pub fn get_template(
-        &mut self,
+        &self,
         py: Python<'_>,
         template_name: &str,
         engine: &EngineData,
@@ -247,9 +1050,26 @@ impl Loader {
             Self::AppDirs(loader) => loader.get_template(py, template_name, engine),
             Self::Cached(loader) => loader.get_template(py, template_name, engine),
             Self::LocMem(loader) => loader.get_template(py, template_name, engine),
+            Self::Bundle(loader) => loader.get_template(py, template_name, engine),
             Self::External(loader) => loader.get_template(py, template_name, engine),
         }
     }
+
+    pub fn reset(&self) {
+        match self {
+            Self::FileSystem(loader) => loader.reset(),
+            Self::AppDirs(loader) => loader.reset(),
+            Self::Cached(loader) => loader.reset(),
+            _ => {}
+        }
+    }
+
+    pub fn cache_info(&self) -> Option<CacheInfo> {
+        match self {
+            Self::Cached(loader) => Some(loader.cache_info()),
+            _ => None,
+        }
+    }
 }
 
 #[cfg(test)]
@@ -294,7 +1114,7 @@ mod tests {
             expected.push("tests/templates/basic.txt");
             #[cfg(windows)]
             expected.push("tests\\templates\\basic.txt");
-            assert_eq!(template.filename.unwrap(), expected);
+            assert_eq!(template.filename, Some(expected));
         })
     }
 
@@ -351,33 +1171,123 @@ mod tests {
     }
 
     #[test]
-    fn test_cached_loader() {
+    fn test_is_indexable() {
+        assert!(is_indexable("basic.txt"));
+        assert!(is_indexable("nested/inner.html"));
+        assert!(!is_indexable(""));
+        assert!(!is_indexable("/basic.txt"));
+        assert!(!is_indexable("./basic.txt"));
+        assert!(!is_indexable("nested/../basic.txt"));
+        assert!(!is_indexable("nested//inner.html"));
+        assert!(!is_indexable("nested\\inner.html"));
+    }
+
+    #[test]
+    fn test_filesystem_loader_index() {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
-            // Helper to check cache contents
-            let verify_cache = |cache: &HashMap<String, Result<Template, LoaderError>>,
-                                key: &str,
-                                expected_path: &Path| {
-                if let Some(Ok(cached_template)) = cache.get(key) {
-                    assert_eq!(cached_template.filename.as_ref().unwrap(), expected_path);
-                } else {
-                    panic!("Expected '{}' to be in cache.", key);
-                }
-            };
-
             let engine = EngineData::empty();
+            let dir = temp_template_dir("index");
+            std::fs::write(dir.join("existing.txt"), "existing").unwrap();
+            let loader =
+                FileSystemLoader::new(vec![dir.clone()], encoding_rs::UTF_8).with_index(true);
 
-            // Create a FileSystemLoader for the CachedLoader
-            let filesystem_loader =
-                FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8);
-
-            // Wrap the FileSystemLoader in a CachedLoader
-            let mut cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+            let template = loader
+                .get_template(py, "existing.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "existing");
 
-            // Load a template via the CachedLoader
-            let template = cached_loader
-                .get_template(py, "basic.txt", &engine)
+            // The index was built before this file existed.
+            std::fs::write(dir.join("added.txt"), "added").unwrap();
+            let error = loader.get_template(py, "added.txt", &engine).unwrap_err();
+            let expected = safe_join(&dir, "added.txt").unwrap();
+            assert_eq!(
+                error,
+                LoaderError {
+                    tried: vec![(
+                        expected.display().to_string(),
+                        "Source does not exist".to_string(),
+                    )],
+                },
+            );
+
+            // Names the index can't answer for are searched for.
+            let template = loader
+                .get_template(py, "./added.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "added");
+
+            loader.reset();
+            let template = loader
+                .get_template(py, "added.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "added");
+        })
+    }
+
+    #[test]
+    fn test_filesystem_loader_index_removed_template() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let first = temp_template_dir("index_first");
+            let second = temp_template_dir("index_second");
+            std::fs::write(first.join("shadowed.txt"), "first").unwrap();
+            std::fs::write(second.join("shadowed.txt"), "second").unwrap();
+            let loader = FileSystemLoader::new(vec![first.clone(), second], encoding_rs::UTF_8)
+                .with_index(true);
+
+            let template = loader
+                .get_template(py, "shadowed.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "first");
+
+            std::fs::remove_file(first.join("shadowed.txt")).unwrap();
+            let template = loader
+                .get_template(py, "shadowed.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "second");
+        })
+    }
+
+    #[test]
+    fn test_cached_loader() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            // Helper to check cache contents
+            let verify_cache =
+                |cache: &HashMap<String, CacheEntry>, key: &str, expected_path: &Path| {
+                    if let Some(CacheEntry {
+                        result: Ok(cached_template),
+                        ..
+                    }) = cache.get(key)
+                    {
+                        assert_eq!(cached_template.filename.as_ref().unwrap(), expected_path);
+                    } else {
+                        panic!("Expected '{}' to be in cache.", key);
+                    }
+                };
+
+            let engine = EngineData::empty();
+
+            // Create a FileSystemLoader for the CachedLoader
+            let filesystem_loader =
+                FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8);
+
+            // Wrap the FileSystemLoader in a CachedLoader
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+
+            // Load a template via the CachedLoader
+            let template = cached_loader
+                .get_template(py, "basic.txt", &engine)
                 .expect("Failed to load template")
                 .expect("Template file could not be read");
 
@@ -388,11 +1298,11 @@ mod tests {
             expected_path.push("tests/templates/basic.txt");
             #[cfg(windows)]
             expected_path.push("tests\\templates\\basic.txt");
-            assert_eq!(template.filename.unwrap(), expected_path);
+            assert_eq!(template.filename.as_ref(), Some(&expected_path));
 
             // Verify the cache state after first load
-            assert_eq!(cached_loader.cache.len(), 1);
-            verify_cache(&cached_loader.cache, "basic.txt", &expected_path);
+            assert_eq!(cached_loader.state().cache.len(), 1);
+            verify_cache(&cached_loader.state().cache, "basic.txt", &expected_path);
 
             // Load the same template again via the CachedLoader
             let template = cached_loader
@@ -401,11 +1311,127 @@ mod tests {
                 .expect("Template file could not be read");
 
             // Verify the template filename again
-            assert_eq!(template.filename.unwrap(), expected_path);
+            assert_eq!(template.filename.as_ref(), Some(&expected_path));
 
             // Verify the cache state remains consistent
-            assert_eq!(cached_loader.cache.len(), 1);
-            verify_cache(&cached_loader.cache, "basic.txt", &expected_path);
+            assert_eq!(cached_loader.state().cache.len(), 1);
+            verify_cache(&cached_loader.state().cache, "basic.txt", &expected_path);
+        });
+    }
+
+    #[test]
+    fn test_cached_loader_shares_compiled_template() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let filesystem_loader =
+                FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+
+            let first = cached_loader
+                .get_template(py, "basic.txt", &engine)
+                .unwrap()
+                .unwrap();
+            let second = cached_loader
+                .get_template(py, "basic.txt", &engine)
+                .unwrap()
+                .unwrap();
+
+            assert!(std::ptr::eq(&*first, &*second));
+        });
+    }
+
+    #[test]
+    fn test_cached_loader_shared_between_threads() {
+        pyo3::prepare_freethreaded_python();
+
+        let engine = EngineData::empty();
+        let filesystem_loader =
+            FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8);
+        let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+
+        let templates: Vec<Template> = std::thread::scope(|scope| {
+            let handles: Vec<_> = (0..8)
+                .map(|_| {
+                    scope.spawn(|| {
+                        Python::with_gil(|py| {
+                            cached_loader
+                                .get_template(py, "basic.txt", &engine)
+                                .unwrap()
+                                .unwrap()
+                        })
+                    })
+                })
+                .collect();
+            handles
+                .into_iter()
+                .map(|handle| handle.join().unwrap())
+                .collect()
+        });
+
+        // Only one thread loads the template; the rest wait for it.
+        let info = cached_loader.cache_info();
+        assert_eq!(info.misses, 1);
+        assert_eq!(info.hits, 7);
+        for template in &templates {
+            assert!(std::ptr::eq(&**template, &*templates[0]));
+        }
+    }
+
+    #[test]
+    fn test_cached_loader_reentrant_load() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let filesystem_loader =
+                FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+
+            // Act as if this thread is part way through loading the
+            // template, like a template that includes itself.
+            let current = std::thread::current().id();
+            cached_loader
+                .state()
+                .loading
+                .insert("basic.txt".to_string(), current);
+
+            let template = cached_loader
+                .get_template(py, "basic.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "Hello {{ user }}!\n");
+            assert!(cached_loader.state().cache.is_empty());
+        });
+    }
+
+    #[test]
+    fn test_cached_loader_reset_while_loading() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let filesystem_loader =
+                FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+
+            // A load that started before a reset finishes after it.
+            let generation = cached_loader.state().generation;
+            let template = cached_loader
+                .load(py, "basic.txt", &engine)
+                .unwrap()
+                .unwrap();
+            cached_loader.reset();
+            let entry = CacheEntry::new(Ok(template), None);
+            cached_loader.store("basic.txt", entry, generation);
+            assert!(cached_loader.state().cache.is_empty());
+
+            cached_loader
+                .get_template(py, "basic.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(cached_loader.state().cache.len(), 1);
         });
     }
 
@@ -418,7 +1444,7 @@ mod tests {
             let filesystem_loader =
                 FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8);
 
-            let mut cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
             let error = cached_loader
                 .get_template(py, "missing.txt", &engine)
                 .unwrap_err();
@@ -436,9 +1462,15 @@ mod tests {
             };
             assert_eq!(error, expected_err);
 
-            let cache = &cached_loader.cache;
             assert_eq!(
-                cache.get("missing.txt").unwrap().as_ref().unwrap_err(),
+                cached_loader
+                    .state()
+                    .cache
+                    .get("missing.txt")
+                    .unwrap()
+                    .result
+                    .as_ref()
+                    .unwrap_err(),
                 &expected_err
             );
 
@@ -449,6 +1481,241 @@ mod tests {
         })
     }
 
+    fn temp_template_dir(name: &str) -> PathBuf {
+        let dir = std::env::temp_dir().join(format!(
+            "django_rusty_templates_{}_{}",
+            name,
+            std::process::id()
+        ));
+        let _ = std::fs::remove_dir_all(&dir);
+        std::fs::create_dir_all(&dir).unwrap();
+        dir
+    }
+
+    #[test]
+    fn test_cached_loader_reloads_changed_template() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let dir = temp_template_dir("reload");
+            let path = dir.join("changing.txt");
+            std::fs::write(&path, "before").unwrap();
+
+            let filesystem_loader = FileSystemLoader::new(vec![dir.clone()], encoding_rs::UTF_8);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)])
+                .with_check_interval(Some(Duration::ZERO));
+
+            let template = cached_loader
+                .get_template(py, "changing.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "before");
+
+            std::fs::write(&path, "after the change").unwrap();
+            let template = cached_loader
+                .get_template(py, "changing.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "after the change");
+
+            std::fs::remove_dir_all(&dir).unwrap();
+        })
+    }
+
+    #[test]
+    fn test_cached_loader_finds_new_template() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let dir = temp_template_dir("new");
+
+            let filesystem_loader = FileSystemLoader::new(vec![dir.clone()], encoding_rs::UTF_8);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)])
+                .with_check_interval(Some(Duration::ZERO));
+
+            cached_loader
+                .get_template(py, "new.txt", &engine)
+                .unwrap_err();
+
+            std::fs::write(dir.join("new.txt"), "new").unwrap();
+            let template = cached_loader
+                .get_template(py, "new.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "new");
+
+            std::fs::remove_dir_all(&dir).unwrap();
+        })
+    }
+
+    #[test]
+    fn test_cached_loader_without_check_interval_keeps_template() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let dir = temp_template_dir("keep");
+            let path = dir.join("changing.txt");
+            std::fs::write(&path, "before").unwrap();
+
+            let filesystem_loader = FileSystemLoader::new(vec![dir.clone()], encoding_rs::UTF_8);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+
+            cached_loader
+                .get_template(py, "changing.txt", &engine)
+                .unwrap()
+                .unwrap();
+            std::fs::write(&path, "after the change").unwrap();
+            let template = cached_loader
+                .get_template(py, "changing.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "before");
+
+            cached_loader.reset();
+            assert!(cached_loader.state().cache.is_empty());
+            let template = cached_loader
+                .get_template(py, "changing.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template.template, "after the change");
+
+            std::fs::remove_dir_all(&dir).unwrap();
+        })
+    }
+
+    fn locmem_cached_loader(limits: CacheLimits) -> CachedLoader {
+        let templates = HashMap::from([
+            ("a.html".to_string(), "a".to_string()),
+            ("b.html".to_string(), "bb".to_string()),
+            ("c.html".to_string(), "ccc".to_string()),
+        ]);
+        CachedLoader::new(vec![Loader::LocMem(LocMemLoader::new(templates))]).with_limits(limits)
+    }
+
+    #[test]
+    fn test_cached_loader_max_entries() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let limits = CacheLimits {
+                max_entries: Some(2),
+                ..Default::default()
+            };
+            let cached_loader = locmem_cached_loader(limits);
+
+            for name in ["a.html", "b.html", "a.html", "c.html"] {
+                cached_loader
+                    .get_template(py, name, &engine)
+                    .unwrap()
+                    .unwrap();
+            }
+
+            assert!(cached_loader.state().cache.contains_key("a.html"));
+            assert!(!cached_loader.state().cache.contains_key("b.html"));
+            assert!(cached_loader.state().cache.contains_key("c.html"));
+            assert_eq!(
+                cached_loader.cache_info(),
+                CacheInfo {
+                    hits: 1,
+                    misses: 3,
+                    evictions: 1,
+                    entries: 2,
+                    missing: 0,
+                    bytes: 4,
+                }
+            );
+        })
+    }
+
+    #[test]
+    fn test_cached_loader_max_bytes() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let limits = CacheLimits {
+                max_bytes: Some(4),
+                ..Default::default()
+            };
+            let cached_loader = locmem_cached_loader(limits);
+
+            for name in ["a.html", "b.html", "c.html"] {
+                cached_loader
+                    .get_template(py, name, &engine)
+                    .unwrap()
+                    .unwrap();
+            }
+
+            assert!(!cached_loader.state().cache.contains_key("a.html"));
+            assert!(!cached_loader.state().cache.contains_key("b.html"));
+            assert!(cached_loader.state().cache.contains_key("c.html"));
+            assert_eq!(cached_loader.cache_info().bytes, 3);
+            assert_eq!(cached_loader.cache_info().evictions, 2);
+        })
+    }
+
+    #[test]
+    fn test_cached_loader_max_missing() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let limits = CacheLimits {
+                max_entries: Some(1),
+                max_missing: Some(2),
+                ..Default::default()
+            };
+            let cached_loader = locmem_cached_loader(limits);
+
+            cached_loader
+                .get_template(py, "a.html", &engine)
+                .unwrap()
+                .unwrap();
+            for name in ["x.html", "y.html", "z.html"] {
+                cached_loader.get_template(py, name, &engine).unwrap_err();
+            }
+
+            assert!(cached_loader.state().cache.contains_key("a.html"));
+            assert!(!cached_loader.state().cache.contains_key("x.html"));
+            assert!(cached_loader.state().cache.contains_key("y.html"));
+            assert!(cached_loader.state().cache.contains_key("z.html"));
+            let info = cached_loader.cache_info();
+            assert_eq!(info.entries, 1);
+            assert_eq!(info.missing, 2);
+            assert_eq!(info.evictions, 1);
+        })
+    }
+
+    #[test]
+    fn test_cached_loader_missing_ttl() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let limits = CacheLimits {
+                missing_ttl: Some(Duration::ZERO),
+                ..Default::default()
+            };
+            let cached_loader = locmem_cached_loader(limits);
+
+            cached_loader
+                .get_template(py, "x.html", &engine)
+                .unwrap_err();
+            cached_loader
+                .get_template(py, "x.html", &engine)
+                .unwrap_err();
+
+            let info = cached_loader.cache_info();
+            assert_eq!(info.hits, 0);
+            assert_eq!(info.misses, 2);
+            assert_eq!(info.missing, 1);
+        })
+    }
+
     #[test]
     fn test_cached_loader_invalid_encoding() {
         pyo3::prepare_freethreaded_python();
@@ -458,7 +1725,7 @@ mod tests {
             let filesystem_loader =
                 FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8);
 
-            let mut cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
             let error = cached_loader
                 .get_template(py, "invalid.txt", &engine)
                 .unwrap()
@@ -492,7 +1759,7 @@ mod tests {
                 .unwrap()
                 .unwrap();
             assert_eq!(template.template, "index".to_string());
-            assert_eq!(template.filename.unwrap(), PathBuf::from("index.html"));
+            assert_eq!(template.filename, Some(PathBuf::from("index.html")));
         });
     }
 
@@ -519,6 +1786,235 @@ mod tests {
         })
     }
 
+    #[test]
+    fn test_find_templates() {
+        let first = temp_template_dir("find_first");
+        let second = temp_template_dir("find_second");
+        std::fs::create_dir(first.join("nested")).unwrap();
+        std::fs::write(first.join("shadowed.html"), "first").unwrap();
+        std::fs::write(first.join("nested/inner.html"), "inner").unwrap();
+        std::fs::write(second.join("shadowed.html"), "second").unwrap();
+        std::fs::write(second.join("other.html"), "other").unwrap();
+
+        let templates = find_templates(&[first.clone(), second.clone()]);
+
+        let names: Vec<_> = templates.keys().map(String::as_str).collect();
+        assert_eq!(
+            names,
+            vec!["nested/inner.html", "other.html", "shadowed.html"]
+        );
+        assert_eq!(
+            templates["shadowed.html"],
+            safe_join(&first, "shadowed.html").unwrap()
+        );
+        assert_eq!(
+            templates["other.html"],
+            safe_join(&second, "other.html").unwrap()
+        );
+    }
+
+    #[cfg(unix)]
+    #[test]
+    fn test_find_templates_symlinks() {
+        use std::os::unix::fs::symlink;
+
+        let dir = temp_template_dir("find_symlinks");
+        let shared = dir.join("shared");
+        std::fs::create_dir(&shared).unwrap();
+        std::fs::write(shared.join("inner.html"), "inner").unwrap();
+        symlink(&shared, dir.join("first")).unwrap();
+        symlink(&shared, dir.join("second")).unwrap();
+        symlink(&shared, shared.join("loop")).unwrap();
+
+        let templates = find_templates(&[dir]);
+
+        let names: Vec<_> = templates.keys().map(String::as_str).collect();
+        assert_eq!(
+            names,
+            vec!["first/inner.html", "second/inner.html", "shared/inner.html"]
+        );
+    }
+
+    #[test]
+    fn test_read_templates() {
+        let paths = [
+            Path::new("tests/templates/basic.txt"),
+            Path::new("tests/templates/missing.txt"),
+            Path::new("tests/templates/invalid.txt"),
+        ];
+        let sources = read_templates(&paths, encoding_rs::UTF_8);
+
+        let expected = std::fs::read_to_string(paths[0]).unwrap();
+        assert!(matches!(&sources[0], Ok(contents) if *contents == expected));
+        assert!(matches!(sources[1], Err(ReadError::Missing)));
+        assert!(matches!(sources[2], Err(ReadError::Malformed(_))));
+    }
+
+    #[test]
+    fn test_cached_loader_warm() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let dirs = vec![PathBuf::from("tests/templates")];
+            let paths = find_templates(&dirs);
+            let names: Vec<_> = paths.keys().cloned().collect();
+            let filesystem_loader = FileSystemLoader::new(dirs, encoding_rs::UTF_8);
+            let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+
+            let results = cached_loader.warm(py, &names, &paths, encoding_rs::UTF_8, &engine);
+            let failed: Vec<_> = results
+                .iter()
+                .filter(|(_, result)| !matches!(result, Ok(Ok(_))))
+                .map(|(name, _)| name.as_str())
+                .collect();
+            // full_example.html needs a library this engine doesn't have.
+            assert_eq!(
+                failed,
+                vec!["full_example.html", "invalid.txt", "parse_error.txt"]
+            );
+            assert_eq!(cached_loader.cache_info().entries, names.len() - 3);
+
+            let template = cached_loader
+                .get_template(py, "basic.txt", &engine)
+                .unwrap()
+                .unwrap();
+            let expected =
+                FileSystemLoader::new(vec![PathBuf::from("tests/templates")], encoding_rs::UTF_8)
+                    .get_template(py, "basic.txt", &engine)
+                    .unwrap()
+                    .unwrap();
+            assert_eq!(template, expected);
+            let info = cached_loader.cache_info();
+            assert_eq!(info.hits, 1);
+            assert_eq!(info.misses, names.len() as u64);
+        })
+    }
+
+    #[test]
+    fn test_cached_loader_warm_while_loading() {
+        pyo3::prepare_freethreaded_python();
+
+        let engine = EngineData::empty();
+        let dirs = vec![PathBuf::from("tests/templates")];
+        let paths = find_templates(&dirs);
+        let names = vec!["basic.txt".to_string()];
+        let filesystem_loader = FileSystemLoader::new(dirs, encoding_rs::UTF_8);
+        let cached_loader = CachedLoader::new(vec![Loader::FileSystem(filesystem_loader)]);
+
+        // Another thread has started loading the template.
+        let other = std::thread::spawn(|| std::thread::current().id())
+            .join()
+            .unwrap();
+        cached_loader
+            .state()
+            .loading
+            .insert("basic.txt".to_string(), other);
+
+        let (loaded, warmed) = std::thread::scope(|scope| {
+            let warm = scope.spawn(|| {
+                Python::with_gil(|py| {
+                    cached_loader.warm(py, &names, &paths, encoding_rs::UTF_8, &engine)
+                })
+            });
+            let loaded = Python::with_gil(|py| {
+                let template = cached_loader
+                    .load(py, "basic.txt", &engine)
+                    .unwrap()
+                    .unwrap();
+                let entry = CacheEntry::new(Ok(template.clone()), None);
+                cached_loader.store("basic.txt", entry, 0);
+                template
+            });
+            cached_loader.state().loading.remove("basic.txt");
+            cached_loader.loaded.notify_all();
+            (loaded, warm.join().unwrap())
+        });
+
+        // Warming uses the other thread's template instead of its own.
+        let [(_, Ok(Ok(warmed)))] = warmed.as_slice() else {
+            panic!("Expected basic.txt to be warmed");
+        };
+        assert!(std::ptr::eq(&**warmed, &*loaded));
+    }
+
+    #[test]
+    fn test_bundle_loader() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let dirs = vec![PathBuf::from("tests/templates")];
+            let bundle = temp_template_dir("bundle").join("templates.bundle");
+
+            let templates = find_templates(&dirs);
+            let count = write_bundle(&bundle, &templates, encoding_rs::UTF_8).unwrap();
+            // invalid.txt isn't valid UTF-8 so it is left out.
+            assert_eq!(count, templates.len() - 1);
+
+            let bundle_loader = BundleLoader::open(&bundle).unwrap();
+            let filesystem_loader = FileSystemLoader::new(dirs, encoding_rs::UTF_8);
+            let template = bundle_loader
+                .get_template(py, "basic.txt", &engine)
+                .unwrap()
+                .unwrap();
+            let expected = filesystem_loader
+                .get_template(py, "basic.txt", &engine)
+                .unwrap()
+                .unwrap();
+            assert_eq!(template, expected);
+
+            let error = bundle_loader
+                .get_template(py, "invalid.txt", &engine)
+                .unwrap_err();
+            assert_eq!(error, LoaderError { tried: Vec::new() });
+        })
+    }
+
+    #[test]
+    fn test_bundle_loader_rewritten_bundle() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let dirs = vec![PathBuf::from("tests/templates")];
+            let bundle = temp_template_dir("rewritten_bundle").join("templates.bundle");
+            let templates = find_templates(&dirs);
+            write_bundle(&bundle, &templates, encoding_rs::UTF_8).unwrap();
+            let bundle_loader = BundleLoader::open(&bundle).unwrap();
+
+            // Writing the bundle again leaves the mapped file as it was.
+            write_bundle(&bundle, &BTreeMap::new(), encoding_rs::UTF_8).unwrap();
+            assert!(
+                bundle_loader
+                    .get_template(py, "basic.txt", &engine)
+                    .unwrap()
+                    .is_ok()
+            );
+            let rewritten = BundleLoader::open(&bundle).unwrap();
+            assert!(!rewritten.contains("basic.txt"));
+        })
+    }
+
+    #[test]
+    fn test_bundle_loader_invalid_bundle() {
+        let dir = temp_template_dir("invalid_bundle");
+
+        let not_a_bundle = dir.join("not_a_bundle");
+        std::fs::write(&not_a_bundle, "Hello {{ user }}!").unwrap();
+        let error = BundleLoader::open(&not_a_bundle).err().unwrap();
+        assert_eq!(error.kind(), ErrorKind::InvalidData);
+        assert_eq!(error.to_string(), "Not a template bundle.");
+
+        let truncated = dir.join("truncated");
+        let mut data = BUNDLE_MAGIC.to_vec();
+        data.extend_from_slice(&BUNDLE_VERSION.to_le_bytes());
+        data.extend_from_slice(&1u32.to_le_bytes());
+        std::fs::write(&truncated, data).unwrap();
+        let error = BundleLoader::open(&truncated).err().unwrap();
+        assert_eq!(error.to_string(), "Template bundle is truncated.");
+    }
+
     #[test]
     fn test_appdirs_loader() {
         pyo3::prepare_freethreaded_python();
@@ -539,7 +2035,7 @@ mod tests {
             expected.push("tests/templates/basic.txt");
             #[cfg(windows)]
             expected.push("tests\\templates\\basic.txt");
-            assert_eq!(template.filename.unwrap(), expected);
+            assert_eq!(template.filename, Some(expected));
         })
     }
 
@@ -0,0 +1,335 @@
+use either::Either;
+use pyo3::prelude::*;
+
+use crate::filters::FilterType;
+use crate::parse::{Filter, IfCondition, Tag, TagElement, TokenTree};
+use crate::render::types::{Context, ContextStack, Translations};
+use crate::render::{Evaluate, Render};
+use crate::types::{Argument, ArgumentType, TemplateString};
+
+/// Simplify parsed template nodes by doing work at compile time that
+/// would otherwise be repeated on every render:
+///
+/// * Native filters applied only to literals are rendered once.
+/// * `if` tags with only literals in their condition are replaced by the
+///   branch they always take.
+/// * `autoescape` tags are dropped once they only contain text.
+/// * Adjacent text, such as text either side of a comment, is merged.
+///
+/// `True`, `False` and `None` are not literals in conditions, because the
+/// context can shadow them.
+pub fn optimize(
+    py: Python<'_>,
+    template: TemplateString<'_>,
+    nodes: Vec<TokenTree>,
+    autoescape: bool,
+) -> Vec<TokenTree> {
+    let mut optimized = Vec::with_capacity(nodes.len());
+    for node in nodes {
+        match fold(py, template, node, autoescape) {
+            Either::Left(node) => push_node(template, &mut optimized, node),
+            Either::Right(nodes) => {
+                for node in nodes {
+                    push_node(template, &mut optimized, node)
+                }
+            }
+        }
+    }
+    // Parsing grows these vectors as it goes, so drop the spare capacity
+    // before the nodes are cached.
+    optimized.shrink_to_fit();
+    optimized
+}
+
+/// A context for evaluating nodes that don't look anything up.
+fn static_context(autoescape: bool) -> Context {
+    Context {
+        request: None,
+        dict: None,
+        context: ContextStack::default(),
+        autoescape,
+        translations: Translations::default(),
+    }
+}
+
+fn fold(
+    py: Python<'_>,
+    template: TemplateString<'_>,
+    node: TokenTree,
+    autoescape: bool,
+) -> Either<TokenTree, Vec<TokenTree>> {
+    match node {
+        TokenTree::Filter(filter) if is_constant_filter(&filter) => {
+            let mut context = static_context(autoescape);
+            let rendered = match filter.render(py, template, &mut context) {
+                Ok(rendered) => rendered.into_owned(),
+                // Leave the error to be raised when rendering.
+                Err(_) => return Either::Left(TokenTree::Filter(filter)),
+            };
+            Either::Left(TokenTree::Static(rendered))
+        }
+        TokenTree::Tag(tag) => fold_tag(py, template, *tag, autoescape),
+        node => Either::Left(node),
+    }
+}
+
+fn fold_tag(
+    py: Python<'_>,
+    template: TemplateString<'_>,
+    tag: Tag,
+    autoescape: bool,
+) -> Either<TokenTree, Vec<TokenTree>> {
+    match tag {
+        Tag::If {
+            condition,
+            truthy,
+            falsey,
+        } => {
+            if is_constant_condition(&condition) {
+                let mut context = static_context(autoescape);
+                let nodes = match condition.evaluate(py, template, &mut context) {
+                    Some(true) => truthy,
+                    _ => falsey.unwrap_or_default(),
+                };
+                return Either::Right(optimize(py, template, nodes, autoescape));
+            }
+            Either::Left(TokenTree::from(Tag::If {
+                condition,
+                truthy: optimize(py, template, truthy, autoescape),
+                falsey: falsey.map(|falsey| optimize(py, template, falsey, autoescape)),
+            }))
+        }
+        Tag::Autoescape { enabled, nodes } => {
+            let nodes = optimize(py, template, nodes, (&enabled).into());
+            if nodes
+                .iter()
+                .all(|node| matches!(node, TokenTree::Text(_) | TokenTree::Static(_)))
+            {
+                return Either::Right(nodes);
+            }
+            Either::Left(TokenTree::from(Tag::Autoescape { enabled, nodes }))
+        }
+        Tag::For(mut for_tag) => {
+            for_tag.nodes = optimize(py, template, for_tag.nodes, autoescape);
+            for_tag.empty = for_tag
+                .empty
+                .map(|empty| optimize(py, template, empty, autoescape));
+            Either::Left(TokenTree::from(Tag::For(for_tag)))
+        }
+        tag => Either::Left(TokenTree::from(tag)),
+    }
+}
+
+fn is_literal_argument(argument: &Argument) -> bool {
+    matches!(
+        argument.argument_type,
+        ArgumentType::Text(_) | ArgumentType::Int(_) | ArgumentType::Float(_)
+    )
+}
+
+fn is_constant(element: &TagElement) -> bool {
+    match element {
+        TagElement::Int(_) | TagElement::Float(_) | TagElement::Text(_) => true,
+        // Translations depend on the language active when rendering.
+        TagElement::TranslatedText(_) | TagElement::Variable(_) => false,
+        TagElement::Filter(filter) => is_constant_filter(filter),
+    }
+}
+
+/// Whether `filter` gives the same output on every render.
+fn is_constant_filter(filter: &Filter) -> bool {
+    let pure = match &filter.filter {
+        FilterType::Add(add) => is_literal_argument(&add.argument),
+        FilterType::AddSlashes(_)
+        | FilterType::Capfirst(_)
+        | FilterType::Escape(_)
+        | FilterType::Lower(_)
+        | FilterType::Slugify(_)
+        | FilterType::Upper(_) => true,
+        FilterType::Default(_)
+        | FilterType::DefaultIfNone(_)
+        | FilterType::External(_)
+        | FilterType::First(_)
+        | FilterType::Join(_)
+        | FilterType::Last(_)
+        | FilterType::Length(_)
+        | FilterType::Linebreaksbr(_)
+        | FilterType::Safe(_)
+        | FilterType::Striptags(_)
+        | FilterType::Title(_)
+        | FilterType::Truncatechars(_)
+        | FilterType::Truncatewords(_)
+        | FilterType::Urlencode(_)
+        | FilterType::Yesno(_) => false,
+    };
+    pure && is_constant(&filter.left)
+}
+
+fn is_constant_condition(condition: &IfCondition) -> bool {
+    match condition {
+        IfCondition::Variable(element) => is_constant(element),
+        IfCondition::Not(inner) => is_constant_condition(inner),
+        IfCondition::And(inner)
+        | IfCondition::Or(inner)
+        | IfCondition::Equal(inner)
+        | IfCondition::NotEqual(inner)
+        | IfCondition::LessThan(inner)
+        | IfCondition::GreaterThan(inner)
+        | IfCondition::LessThanEqual(inner)
+        | IfCondition::GreaterThanEqual(inner)
+        | IfCondition::In(inner)
+        | IfCondition::NotIn(inner)
+        | IfCondition::Is(inner)
+        | IfCondition::IsNot(inner) => {
+            is_constant_condition(&inner.0) && is_constant_condition(&inner.1)
+        }
+    }
+}
+
+fn static_text<'a>(template: TemplateString<'a>, node: &'a TokenTree) -> Option<&'a str> {
+    match node {
+        TokenTree::Text(text) => Some(template.content(text.at)),
+        TokenTree::Static(text) => Some(text.as_str()),
+        _ => None,
+    }
+}
+
+/// Push `node`, merging it into the last node if both are text.
+fn push_node(template: TemplateString<'_>, nodes: &mut Vec<TokenTree>, node: TokenTree) {
+    let Some(previous) = nodes.last_mut() else {
+        nodes.push(node);
+        return;
+    };
+    if let (TokenTree::Text(previous), TokenTree::Text(text)) = (&mut *previous, &node) {
+        // Text that is contiguous in the source only needs a longer span.
+        if previous.at.0 + previous.at.1 == text.at.0 {
+            previous.at.1 += text.at.1;
+            return;
+        }
+    }
+    let Some(text) = static_text(template, &node) else {
+        nodes.push(node);
+        return;
+    };
+    match previous {
+        TokenTree::Static(previous) => previous.push_str(text),
+        TokenTree::Text(previous_text) => {
+            let merged = format!("{}{text}", template.content(previous_text.at));
+            *previous = TokenTree::Static(merged);
+        }
+        _ => nodes.push(node),
+    }
+}
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    use std::collections::HashMap;
+
+    use crate::parse::Parser;
+    use crate::types::{Text, Variable};
+
+    fn parse_optimized(py: Python<'_>, template: &str, autoescape: bool) -> Vec<TokenTree> {
+        let libraries = HashMap::new();
+        let template = TemplateString(template);
+        let mut parser = Parser::new(py, template, &libraries);
+        let nodes = parser.parse().unwrap();
+        optimize(py, template, nodes, autoescape)
+    }
+
+    #[test]
+    fn test_merge_text() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let template = "Hello {# name #}world{{ name }}!";
+            let nodes = parse_optimized(py, template, false);
+            assert_eq!(
+                nodes,
+                vec![
+                    TokenTree::Static("Hello world".to_string()),
+                    TokenTree::Variable(Variable::new(py, template.into(), (24, 4))),
+                    TokenTree::Text(Text::new((31, 1))),
+                ]
+            );
+        })
+    }
+
+    #[test]
+    fn test_fold_filters() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            // Literals are already safe when autoescape is on, so turn it off
+            // to have `escape` change the output.
+            let template = r#"<p>{{ "ab"|upper }} {{ 1|add:2 }} {{ "<"|escape }}</p>"#;
+            let nodes = parse_optimized(py, template, false);
+            assert_eq!(
+                nodes,
+                vec![TokenTree::Static("<p>AB 3 &lt;</p>".to_string())]
+            );
+        })
+    }
+
+    #[test]
+    fn test_fold_filters_variable() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let nodes = parse_optimized(py, r#"{{ "a"|add:b }}{{ a|upper }}"#, false);
+            assert!(matches!(
+                nodes.as_slice(),
+                [TokenTree::Filter(_), TokenTree::Filter(_)]
+            ));
+        })
+    }
+
+    #[test]
+    fn test_prune_if() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let nodes = parse_optimized(py, "a{% if 1 %}b{% else %}c{% endif %}d", false);
+            assert_eq!(nodes, vec![TokenTree::Static("abd".to_string())]);
+
+            let template = r#"a{% if "x" == "y" %}b{% elif 2 > 1 %}c{% endif %}d"#;
+            let nodes = parse_optimized(py, template, false);
+            assert_eq!(nodes, vec![TokenTree::Static("acd".to_string())]);
+
+            let nodes = parse_optimized(py, "a{% if 0 %}b{% endif %}d", false);
+            assert_eq!(nodes, vec![TokenTree::Static("ad".to_string())]);
+        })
+    }
+
+    #[test]
+    fn test_keep_if_on_names() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let nodes = parse_optimized(py, "{% if True %}b{% endif %}", false);
+            let [TokenTree::Tag(tag)] = nodes.as_slice() else {
+                panic!("Expected a single tag, got {nodes:?}");
+            };
+            assert!(matches!(**tag, Tag::If { .. }));
+        })
+    }
+
+    #[test]
+    fn test_drop_autoescape() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let template = r#"{% autoescape off %}<{{ "<"|lower }}>{% endautoescape %}"#;
+            let nodes = parse_optimized(py, template, true);
+            assert_eq!(nodes, vec![TokenTree::Static("<<>".to_string())]);
+
+            let template = "{% autoescape off %}{{ a }}{% endautoescape %}";
+            let nodes = parse_optimized(py, template, true);
+            let [TokenTree::Tag(tag)] = nodes.as_slice() else {
+                panic!("Expected a single tag, got {nodes:?}");
+            };
+            assert!(matches!(**tag, Tag::Autoescape { .. }));
+        })
+    }
+}
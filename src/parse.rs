@@ -6,23 +6,38 @@ use miette::{Diagnostic, SourceSpan};
 use num_bigint::BigInt;
 use pyo3::intern;
 use pyo3::prelude::*;
+use pyo3::sync::GILOnceCell;
 use thiserror::Error;
 
 use crate::filters::AddFilter;
 use crate::filters::AddSlashesFilter;
 use crate::filters::CapfirstFilter;
 use crate::filters::DefaultFilter;
+use crate::filters::DefaultIfNoneFilter;
 use crate::filters::EscapeFilter;
 use crate::filters::ExternalFilter;
+use crate::filters::FilterFlags;
 use crate::filters::FilterType;
+use crate::filters::FirstFilter;
+use crate::filters::JoinFilter;
+use crate::filters::LastFilter;
+use crate::filters::LengthFilter;
+use crate::filters::LinebreaksbrFilter;
 use crate::filters::LowerFilter;
 use crate::filters::SafeFilter;
 use crate::filters::SlugifyFilter;
+use crate::filters::StriptagsFilter;
+use crate::filters::TitleFilter;
+use crate::filters::TruncatecharsFilter;
+use crate::filters::TruncatewordsFilter;
 use crate::filters::UpperFilter;
+use crate::filters::UrlencodeFilter;
+use crate::filters::YesnoFilter;
 use crate::lex::START_TAG_LEN;
 use crate::lex::autoescape::{AutoescapeEnabled, AutoescapeError, lex_autoescape_argument};
 use crate::lex::common::LexerError;
 use crate::lex::core::{Lexer, TokenType};
+use crate::lex::forloop::{ForLexerError, lex_for};
 use crate::lex::ifcondition::{
     IfConditionAtom, IfConditionLexer, IfConditionOperator, IfConditionTokenType,
 };
@@ -40,11 +55,13 @@ use crate::types::TranslatedText;
 use crate::types::Variable;
 
 impl ArgumentToken {
-    fn parse(&self, template: TemplateString<'_>) -> Result<Argument, ParseError> {
+    fn parse(&self, py: Python<'_>, template: TemplateString<'_>) -> Result<Argument, ParseError> {
         Ok(Argument {
             at: self.at,
             argument_type: match self.argument_type {
-                ArgumentTokenType::Variable => ArgumentType::Variable(Variable::new(self.at)),
+                ArgumentTokenType::Variable => {
+                    ArgumentType::Variable(Variable::new(py, template, self.at))
+                }
                 ArgumentTokenType::Text => ArgumentType::Text(Text::new(self.content_at())),
                 ArgumentTokenType::Numeric => match template.content(self.at).parse::<BigInt>() {
                     Ok(n) => ArgumentType::Int(n),
@@ -109,10 +126,34 @@ impl Filter {
                 Some(right) => FilterType::Default(DefaultFilter::new(right)),
                 None => return Err(ParseError::MissingArgument { at: at.into() }),
             },
+            "default_if_none" => match right {
+                Some(right) => FilterType::DefaultIfNone(DefaultIfNoneFilter::new(right)),
+                None => return Err(ParseError::MissingArgument { at: at.into() }),
+            },
             "escape" => match right {
                 Some(right) => return Err(unexpected_argument("escape", right)),
                 None => FilterType::Escape(EscapeFilter),
             },
+            "first" => match right {
+                Some(right) => return Err(unexpected_argument("first", right)),
+                None => FilterType::First(FirstFilter),
+            },
+            "join" => match right {
+                Some(right) => FilterType::Join(JoinFilter::new(right)),
+                None => return Err(ParseError::MissingArgument { at: at.into() }),
+            },
+            "last" => match right {
+                Some(right) => return Err(unexpected_argument("last", right)),
+                None => FilterType::Last(LastFilter),
+            },
+            "length" => match right {
+                Some(right) => return Err(unexpected_argument("length", right)),
+                None => FilterType::Length(LengthFilter),
+            },
+            "linebreaksbr" => match right {
+                Some(right) => return Err(unexpected_argument("linebreaksbr", right)),
+                None => FilterType::Linebreaksbr(LinebreaksbrFilter),
+            },
             "lower" => match right {
                 Some(right) => return Err(unexpected_argument("lower", right)),
                 None => FilterType::Lower(LowerFilter),
@@ -125,13 +166,31 @@ impl Filter {
                 Some(right) => return Err(unexpected_argument("slugify", right)),
                 None => FilterType::Slugify(SlugifyFilter),
             },
+            "striptags" => match right {
+                Some(right) => return Err(unexpected_argument("striptags", right)),
+                None => FilterType::Striptags(StriptagsFilter),
+            },
+            "title" => match right {
+                Some(right) => return Err(unexpected_argument("title", right)),
+                None => FilterType::Title(TitleFilter),
+            },
+            "truncatechars" => match right {
+                Some(right) => FilterType::Truncatechars(TruncatecharsFilter::new(right)),
+                None => return Err(ParseError::MissingArgument { at: at.into() }),
+            },
+            "truncatewords" => match right {
+                Some(right) => FilterType::Truncatewords(TruncatewordsFilter::new(right)),
+                None => return Err(ParseError::MissingArgument { at: at.into() }),
+            },
             "upper" => match right {
                 Some(right) => return Err(unexpected_argument("upper", right)),
                 None => FilterType::Upper(UpperFilter),
             },
+            "urlencode" => FilterType::Urlencode(UrlencodeFilter::new(right)),
+            "yesno" => FilterType::Yesno(YesnoFilter::new(right)),
             external => {
-                let external = match parser.external_filters.get(external) {
-                    Some(external) => external.clone().unbind(),
+                let (external, flags) = match parser.external_filters.get(external) {
+                    Some((external, flags)) => (external.clone().unbind(), *flags),
                     None => {
                         return Err(ParseError::InvalidFilter {
                             at: at.into(),
@@ -139,7 +198,7 @@ impl Filter {
                         });
                     }
                 };
-                FilterType::External(ExternalFilter::new(external, right))
+                FilterType::External(ExternalFilter::new(external, right, flags))
             }
         };
         Ok(Self { at, left, filter })
@@ -318,12 +377,22 @@ impl IfConditionOperator {
     }
 }
 
+#[derive(Clone, Debug, PartialEq)]
+pub struct For {
+    pub variables: Vec<String>,
+    pub iterable: TagElement,
+    pub reversed: bool,
+    pub nodes: Vec<TokenTree>,
+    pub empty: Option<Vec<TokenTree>>,
+}
+
 #[derive(Clone, Debug, PartialEq)]
 pub enum Tag {
     Autoescape {
         enabled: AutoescapeEnabled,
         nodes: Vec<TokenTree>,
     },
+    For(For),
     If {
         condition: IfCondition,
         truthy: Vec<TokenTree>,
@@ -338,6 +407,8 @@ enum EndTagType {
     Autoescape,
     Elif,
     Else,
+    Empty,
+    EndFor,
     EndIf,
     Verbatim,
 }
@@ -348,6 +419,8 @@ impl EndTagType {
             EndTagType::Autoescape => "endautoescape",
             EndTagType::Elif => "elif",
             EndTagType::Else => "else",
+            EndTagType::Empty => "empty",
+            EndTagType::EndFor => "endfor",
             EndTagType::EndIf => "endif",
             EndTagType::Verbatim => "endverbatim",
         }
@@ -370,12 +443,22 @@ impl EndTag {
 #[derive(Clone, Debug, PartialEq)]
 pub enum TokenTree {
     Text(Text),
+    // Output worked out when the template was compiled.
+    Static(String),
     TranslatedText(Text),
-    Tag(Tag),
+    // Boxed, as tags are much larger than the text and variables that
+    // make up most of a template.
+    Tag(Box<Tag>),
     Variable(Variable),
     Filter(Box<Filter>),
 }
 
+impl From<Tag> for TokenTree {
+    fn from(tag: Tag) -> Self {
+        Self::Tag(Box::new(tag))
+    }
+}
+
 impl From<TagElement> for TokenTree {
     fn from(tag_element: TagElement) -> Self {
         match tag_element {
@@ -414,6 +497,9 @@ pub enum ParseError {
     BlockError(#[from] TagLexerError),
     #[error(transparent)]
     #[diagnostic(transparent)]
+    ForLexerError(#[from] ForLexerError),
+    #[error(transparent)]
+    #[diagnostic(transparent)]
     LexerError(#[from] LexerError),
     #[error(transparent)]
     #[diagnostic(transparent)]
@@ -565,13 +651,21 @@ impl LoadToken {
     }
 }
 
+// Builtin filters that call Django's implementation, because they depend on
+// locale formats and time zone settings.
+const DJANGO_FILTER_NAMES: [&str; 2] = ["date", "floatformat"];
+
+type DjangoFilters = Vec<(&'static str, Py<PyAny>, FilterFlags)>;
+static DJANGO_FILTERS: GILOnceCell<DjangoFilters> = GILOnceCell::new();
+
 pub struct Parser<'t, 'l, 'py> {
     py: Python<'py>,
     template: TemplateString<'t>,
     lexer: Lexer<'t>,
     libraries: &'l HashMap<String, Py<PyAny>>,
     external_tags: HashMap<String, Bound<'py, PyAny>>,
-    external_filters: HashMap<String, Bound<'py, PyAny>>,
+    // Each filter's flags are read once, when its library is loaded.
+    external_filters: HashMap<String, (Bound<'py, PyAny>, FilterFlags)>,
 }
 
 impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
@@ -603,11 +697,15 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
             lexer: Lexer::new(template),
             libraries,
             external_tags: HashMap::new(),
-            external_filters,
+            external_filters: external_filters
+                .into_iter()
+                .map(|(name, filter)| (name, (filter, FilterFlags::default())))
+                .collect(),
         }
     }
 
     pub fn parse(&mut self) -> Result<Vec<TokenTree>, PyParseError> {
+        self.load_django_filters()?;
         let mut nodes = Vec::new();
         while let Some(token) = self.lexer.next() {
             let node = match token.token_type {
@@ -699,12 +797,13 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
             None => return Err(ParseError::EmptyVariable { at: at.into() }),
             Some(t) => t,
         };
-        let mut var = TagElement::Variable(Variable::new(variable_token.at));
+        let variable = Variable::new(self.py, self.template, variable_token.at);
+        let mut var = TagElement::Variable(variable);
         for filter_token in filter_lexer {
             let filter_token = filter_token?;
             let argument = match filter_token.argument {
                 None => None,
-                Some(ref a) => Some(a.parse(self.template)?),
+                Some(ref a) => Some(a.parse(self.py, self.template)?),
             };
             let filter = Filter::new(self, filter_token.at, var, argument)?;
             var = TagElement::Filter(Box::new(filter));
@@ -758,6 +857,17 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
                 at,
                 parts,
             }),
+            "for" => Either::Left(self.parse_for(at, parts)?),
+            "empty" => Either::Right(EndTag {
+                end: EndTagType::Empty,
+                at,
+                parts,
+            }),
+            "endfor" => Either::Right(EndTag {
+                end: EndTagType::EndFor,
+                at,
+                parts,
+            }),
             _ => todo!(),
         })
     }
@@ -791,7 +901,7 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
                         .into());
                     }
                 }
-                return Ok(TokenTree::Tag(Tag::Load));
+                return Ok(TokenTree::from(Tag::Load));
             }
         }
         for token in tokens {
@@ -801,7 +911,7 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
             self.external_filters.extend(filters);
             self.external_tags.extend(tags);
         }
-        Ok(TokenTree::Tag(Tag::Load))
+        Ok(TokenTree::from(Tag::Load))
     }
 
     fn get_tags(
@@ -811,11 +921,44 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
         library.getattr(intern!(self.py, "tags"))?.extract()
     }
 
+    /// Make Django's own versions of the builtin filters without a native
+    /// implementation available, before any `{% load %}` can override them.
+    fn load_django_filters(&mut self) -> PyResult<()> {
+        let filters = DJANGO_FILTERS.get_or_try_init(self.py, || {
+            let library = self
+                .py
+                .import(intern!(self.py, "django.template.defaultfilters"))?
+                .getattr(intern!(self.py, "register"))?;
+            let filters = library.getattr(intern!(self.py, "filters"))?;
+            DJANGO_FILTER_NAMES
+                .iter()
+                .map(|&name| {
+                    let filter = filters.get_item(name)?;
+                    let flags = FilterFlags::new(&filter)?;
+                    Ok((name, filter.unbind(), flags))
+                })
+                .collect::<PyResult<Vec<_>>>()
+        })?;
+        for (name, filter, flags) in filters {
+            self.external_filters
+                .insert(name.to_string(), (filter.bind(self.py).clone(), *flags));
+        }
+        Ok(())
+    }
+
     fn get_filters(
         &mut self,
         library: &Bound<'py, PyAny>,
-    ) -> Result<HashMap<String, Bound<'py, PyAny>>, PyErr> {
-        library.getattr(intern!(self.py, "filters"))?.extract()
+    ) -> Result<HashMap<String, (Bound<'py, PyAny>, FilterFlags)>, PyErr> {
+        let filters: HashMap<String, Bound<'py, PyAny>> =
+            library.getattr(intern!(self.py, "filters"))?.extract()?;
+        filters
+            .into_iter()
+            .map(|(name, filter)| {
+                let flags = FilterFlags::new(&filter)?;
+                Ok((name, (filter, flags)))
+            })
+            .collect()
     }
 
     fn parse_url(&mut self, at: (usize, usize), parts: TagParts) -> Result<TokenTree, ParseError> {
@@ -876,7 +1019,7 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
             kwargs,
             variable,
         };
-        Ok(TokenTree::Tag(Tag::Url(url)))
+        Ok(TokenTree::from(Tag::Url(url)))
     }
 
     fn parse_autoescape(
@@ -886,7 +1029,7 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
     ) -> Result<TokenTree, PyParseError> {
         let token = lex_autoescape_argument(self.template, parts).map_err(ParseError::from)?;
         let (nodes, _) = self.parse_until(vec![EndTagType::Autoescape], "autoescape", at)?;
-        Ok(TokenTree::Tag(Tag::Autoescape {
+        Ok(TokenTree::from(Tag::Autoescape {
             enabled: token.enabled,
             nodes,
         }))
@@ -925,12 +1068,46 @@ impl<'t, 'l, 'py> Parser<'t, 'l, 'py> {
             } => None,
             _ => unreachable!(),
         };
-        Ok(TokenTree::Tag(Tag::If {
+        Ok(TokenTree::from(Tag::If {
             condition,
             truthy: nodes,
             falsey,
         }))
     }
+
+    fn parse_for(
+        &mut self,
+        at: (usize, usize),
+        parts: TagParts,
+    ) -> Result<TokenTree, PyParseError> {
+        let tokens = lex_for(self.template, parts).map_err(ParseError::from)?;
+        let iterable = self.parse_variable(
+            self.template.content(tokens.iterable),
+            tokens.iterable,
+            tokens.iterable.0,
+        )?;
+        let (nodes, end_tag) =
+            self.parse_until(vec![EndTagType::Empty, EndTagType::EndFor], "for", at)?;
+        let empty = match end_tag.end {
+            EndTagType::Empty => {
+                let (nodes, _) = self.parse_until(vec![EndTagType::EndFor], "empty", end_tag.at)?;
+                Some(nodes)
+            }
+            _ => None,
+        };
+        let variables = tokens
+            .variables
+            .into_iter()
+            .map(|variable| self.template.content(variable).to_string())
+            .collect();
+        Ok(TokenTree::from(Tag::For(For {
+            variables,
+            iterable,
+            reversed: tokens.reversed,
+            nodes,
+            empty,
+        })))
+    }
 }
 
 #[cfg(test)]
@@ -968,6 +1145,23 @@ mod tests {
         }
     }
 
+    #[test]
+    fn test_node_sizes() {
+        // Text and variables make up most of a template, so they are kept
+        // small and tags are boxed.
+        assert_eq!(std::mem::size_of::<Text>(), 8);
+        assert_eq!(std::mem::size_of::<Variable>(), 24);
+        assert!(std::mem::size_of::<TokenTree>() <= 32);
+    }
+
+    #[test]
+    fn test_token_tree_size() {
+        assert!(
+            std::mem::size_of::<TokenTree>()
+                <= std::mem::size_of::<Variable>() + std::mem::size_of::<usize>()
+        );
+    }
+
     #[test]
     fn test_empty_template() {
         pyo3::prepare_freethreaded_python();
@@ -1032,8 +1226,8 @@ mod tests {
             let template = TemplateString("{{ foo }}");
             let mut parser = Parser::new(py, template, &libraries);
             let nodes = parser.parse().unwrap();
-            let variable = Variable { at: (3, 3) };
-            assert_eq!(nodes, vec![TokenTree::Variable(variable)]);
+            let variable = Variable::new(py, template, (3, 3));
+            assert_eq!(nodes, vec![TokenTree::Variable(variable.clone())]);
             assert_eq!(
                 variable.parts(template).collect::<Vec<_>>(),
                 vec![("foo", (3, 3))]
@@ -1050,8 +1244,8 @@ mod tests {
             let template = TemplateString("{{ foo.bar.baz }}");
             let mut parser = Parser::new(py, template, &libraries);
             let nodes = parser.parse().unwrap();
-            let variable = Variable { at: (3, 11) };
-            assert_eq!(nodes, vec![TokenTree::Variable(variable)]);
+            let variable = Variable::new(py, template, (3, 11));
+            assert_eq!(nodes, vec![TokenTree::Variable(variable.clone())]);
             assert_eq!(
                 variable.parts(template).collect::<Vec<_>>(),
                 vec![("foo", (3, 3)), ("bar", (7, 3)), ("baz", (11, 3))]
@@ -1059,6 +1253,55 @@ mod tests {
         })
     }
 
+    #[test]
+    fn test_variable_keys() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let libraries = HashMap::new();
+            let template = TemplateString("{{ foo.0.bar }}{{ foo }}");
+            let mut parser = Parser::new(py, template, &libraries);
+            let nodes = parser.parse().unwrap();
+            let (first, second) = match nodes.as_slice() {
+                [TokenTree::Variable(first), TokenTree::Variable(second)] => (first, second),
+                _ => panic!("Expected two variables, got {nodes:?}"),
+            };
+
+            let keys: Vec<_> = first
+                .keys()
+                .iter()
+                .map(|key| (key.name.bind(py).to_string(), key.index, key.at))
+                .collect();
+            assert_eq!(
+                keys,
+                vec![
+                    ("foo".to_string(), None, (3, 3)),
+                    ("0".to_string(), Some(0), (7, 1)),
+                    ("bar".to_string(), None, (9, 3)),
+                ]
+            );
+            // Names are interned, so each is a single Python string.
+            let foo = &second.keys()[0].name;
+            assert!(foo.bind(py).is(first.keys()[0].name.bind(py)));
+        })
+    }
+
+    #[test]
+    fn test_variable_eq() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let foo = Variable::new(py, TemplateString("{{ foo.bar }}"), (3, 7));
+            let same = Variable::new(py, TemplateString("{{ foo.bar }}"), (3, 7));
+            let other = Variable::new(py, TemplateString("{{ baz.qux }}"), (3, 7));
+            let index = Variable::new(py, TemplateString("{{ foo.123 }}"), (3, 7));
+            assert_eq!(foo, same);
+            // Variables at the same place in other templates differ by name.
+            assert_ne!(foo, other);
+            assert_ne!(foo, index);
+        })
+    }
+
     #[test]
     fn test_filter() {
         pyo3::prepare_freethreaded_python();
@@ -1072,15 +1315,16 @@ mod tests {
 
             assert_eq!(nodes.len(), 1);
 
-            let foo = Variable { at: (3, 3) };
+            let foo = Variable::new(py, template, (3, 3));
             let external = get_external_filter(&nodes[0]);
             assert!(external.is_none(py));
             let bar = TokenTree::Filter(Box::new(Filter {
                 at: (7, 3),
-                left: TagElement::Variable(foo),
+                left: TagElement::Variable(foo.clone()),
                 filter: FilterType::External(ExternalFilter {
                     filter: external,
                     argument: None,
+                    flags: FilterFlags::default(),
                 }),
             }));
             assert_eq!(nodes, vec![bar]);
@@ -1125,7 +1369,7 @@ mod tests {
             let nodes = parser.parse().unwrap();
             assert_eq!(nodes.len(), 1);
 
-            let foo = TagElement::Variable(Variable { at: (3, 3) });
+            let foo = TagElement::Variable(Variable::new(py, template.into(), (3, 3)));
             let external = get_external_filter_tag_element(&nodes[0]);
             assert!(external.is_none(py));
             let bar = TagElement::Filter(Box::new(Filter {
@@ -1134,6 +1378,7 @@ mod tests {
                 filter: FilterType::External(ExternalFilter {
                     filter: external,
                     argument: None,
+                    flags: FilterFlags::default(),
                 }),
             }));
             let external = get_external_filter(&nodes[0]);
@@ -1144,6 +1389,7 @@ mod tests {
                 filter: FilterType::External(ExternalFilter {
                     filter: external,
                     argument: None,
+                    flags: FilterFlags::default(),
                 }),
             }));
             assert_eq!(nodes, vec![baz]);
@@ -1162,8 +1408,8 @@ mod tests {
             let nodes = parser.parse().unwrap();
             assert_eq!(nodes.len(), 1);
 
-            let foo = TagElement::Variable(Variable { at: (3, 3) });
-            let baz = Variable { at: (11, 3) };
+            let foo = TagElement::Variable(Variable::new(py, template, (3, 3)));
+            let baz = Variable::new(py, template, (11, 3));
             let external = get_external_filter(&nodes[0]);
             assert!(external.is_none(py));
             let bar = TokenTree::Filter(Box::new(Filter {
@@ -1173,8 +1419,9 @@ mod tests {
                     filter: external,
                     argument: Some(Argument {
                         at: (11, 3),
-                        argument_type: ArgumentType::Variable(baz),
+                        argument_type: ArgumentType::Variable(baz.clone()),
                     }),
+                    flags: FilterFlags::default(),
                 }),
             }));
             assert_eq!(nodes, vec![bar]);
@@ -1196,7 +1443,7 @@ mod tests {
             let mut parser = Parser::new_with_filters(py, template, &libraries, filters);
             let nodes = parser.parse().unwrap();
 
-            let foo = TagElement::Variable(Variable { at: (3, 3) });
+            let foo = TagElement::Variable(Variable::new(py, template, (3, 3)));
             let baz = Text::new((12, 3));
             let external = get_external_filter(&nodes[0]);
             assert!(external.is_none(py));
@@ -1209,6 +1456,7 @@ mod tests {
                         at: (11, 5),
                         argument_type: ArgumentType::Text(baz),
                     }),
+                    flags: FilterFlags::default(),
                 }),
             }));
             assert_eq!(nodes, vec![bar]);
@@ -1227,7 +1475,7 @@ mod tests {
             let mut parser = Parser::new_with_filters(py, template, &libraries, filters);
             let nodes = parser.parse().unwrap();
 
-            let foo = TagElement::Variable(Variable { at: (3, 3) });
+            let foo = TagElement::Variable(Variable::new(py, template, (3, 3)));
             let baz = TranslatedText::new((14, 3));
             let external = get_external_filter(&nodes[0]);
             assert!(external.is_none(py));
@@ -1240,6 +1488,7 @@ mod tests {
                         at: (11, 8),
                         argument_type: ArgumentType::TranslatedText(baz),
                     }),
+                    flags: FilterFlags::default(),
                 }),
             }));
             assert_eq!(nodes, vec![bar]);
@@ -1258,7 +1507,7 @@ mod tests {
             let mut parser = Parser::new_with_filters(py, template.into(), &libraries, filters);
             let nodes = parser.parse().unwrap();
 
-            let foo = TagElement::Variable(Variable { at: (3, 3) });
+            let foo = TagElement::Variable(Variable::new(py, template.into(), (3, 3)));
             let num = Argument {
                 at: (11, 5),
                 argument_type: ArgumentType::Float(5.2e3),
@@ -1271,6 +1520,7 @@ mod tests {
                 filter: FilterType::External(ExternalFilter {
                     filter: external,
                     argument: Some(num),
+                    flags: FilterFlags::default(),
                 }),
             }));
             assert_eq!(nodes, vec![bar]);
@@ -1288,7 +1538,7 @@ mod tests {
             let mut parser = Parser::new_with_filters(py, template.into(), &libraries, filters);
             let nodes = parser.parse().unwrap();
 
-            let foo = TagElement::Variable(Variable { at: (3, 3) });
+            let foo = TagElement::Variable(Variable::new(py, template.into(), (3, 3)));
             let num = Argument {
                 at: (11, 2),
                 argument_type: ArgumentType::Int(99.into()),
@@ -1301,6 +1551,7 @@ mod tests {
                 filter: FilterType::External(ExternalFilter {
                     filter: external,
                     argument: Some(num),
+                    flags: FilterFlags::default(),
                 }),
             }));
             assert_eq!(nodes, vec![bar]);
@@ -1318,7 +1569,7 @@ mod tests {
             let mut parser = Parser::new_with_filters(py, template.into(), &libraries, filters);
             let nodes = parser.parse().unwrap();
 
-            let foo = TagElement::Variable(Variable { at: (3, 3) });
+            let foo = TagElement::Variable(Variable::new(py, template.into(), (3, 3)));
             let num = Argument {
                 at: (11, 17),
                 argument_type: ArgumentType::Int("99999999999999999".parse::<BigInt>().unwrap()),
@@ -1331,6 +1582,7 @@ mod tests {
                 filter: FilterType::External(ExternalFilter {
                     filter: external,
                     argument: Some(num),
+                    flags: FilterFlags::default(),
                 }),
             }));
             assert_eq!(nodes, vec![bar]);
@@ -1384,14 +1636,14 @@ mod tests {
             let mut parser = Parser::new(py, template, &libraries);
             let nodes = parser.parse().unwrap();
 
-            let foo = TagElement::Variable(Variable { at: (3, 3) });
-            let baz = Variable { at: (15, 3) };
+            let foo = TagElement::Variable(Variable::new(py, template, (3, 3)));
+            let baz = Variable::new(py, template, (15, 3));
             let bar = TokenTree::Filter(Box::new(Filter {
                 at: (7, 7),
                 left: foo,
                 filter: FilterType::Default(DefaultFilter::new(Argument {
                     at: (15, 3),
-                    argument_type: ArgumentType::Variable(baz),
+                    argument_type: ArgumentType::Variable(baz.clone()),
                 })),
             }));
             assert_eq!(nodes, vec![bar]);
@@ -1481,6 +1733,52 @@ mod tests {
         })
     }
 
+    #[test]
+    fn test_parse_for() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let libraries = HashMap::new();
+            let template = "{% for x in items %}{{ x }}{% empty %}none{% endfor %}";
+            let mut parser = Parser::new(py, template.into(), &libraries);
+            let nodes = parser.parse().unwrap();
+
+            let for_tag = TokenTree::from(Tag::For(For {
+                variables: vec!["x".to_string()],
+                iterable: TagElement::Variable(Variable::new(py, template.into(), (12, 5))),
+                reversed: false,
+                nodes: vec![TokenTree::Variable(Variable::new(
+                    py,
+                    template.into(),
+                    (23, 1),
+                ))],
+                empty: Some(vec![TokenTree::Text(Text::new((38, 4)))]),
+            }));
+
+            assert_eq!(nodes, vec![for_tag]);
+        })
+    }
+
+    #[test]
+    fn test_parse_for_missing_end_tag() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let libraries = HashMap::new();
+            let template = "{% for x in items %}{{ x }}";
+            let mut parser = Parser::new(py, template.into(), &libraries);
+            let error = parser.parse().unwrap_err().unwrap_parse_error();
+            assert_eq!(
+                error,
+                ParseError::MissingEndTag {
+                    start: "for",
+                    expected: "empty, endfor".to_string(),
+                    at: (0, 20).into(),
+                }
+            );
+        })
+    }
+
     #[test]
     fn test_parse_url_tag() {
         pyo3::prepare_freethreaded_python();
@@ -1491,7 +1789,7 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
+            let url = TokenTree::from(Tag::Url(Url {
                 view_name: TagElement::Text(Text { at: (8, 13) }),
                 args: vec![],
                 kwargs: vec![],
@@ -1512,7 +1810,7 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
+            let url = TokenTree::from(Tag::Url(Url {
                 view_name: TagElement::TranslatedText(Text { at: (10, 13) }),
                 args: vec![],
                 kwargs: vec![],
@@ -1533,8 +1831,8 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
-                view_name: TagElement::Variable(Variable { at: (7, 14) }),
+            let url = TokenTree::from(Tag::Url(Url {
+                view_name: TagElement::Variable(Variable::new(py, template.into(), (7, 14))),
                 args: vec![],
                 kwargs: vec![],
                 variable: None,
@@ -1554,7 +1852,7 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let some_view_name = TagElement::Variable(Variable { at: (7, 14) });
+            let some_view_name = TagElement::Variable(Variable::new(py, template.into(), (7, 14)));
             let home = Text { at: (31, 4) };
             let default = Box::new(Filter {
                 at: (22, 7),
@@ -1564,7 +1862,7 @@ mod tests {
                     argument_type: ArgumentType::Text(home),
                 })),
             });
-            let url = TokenTree::Tag(Tag::Url(Url {
+            let url = TokenTree::from(Tag::Url(Url {
                 view_name: TagElement::Filter(default),
                 args: vec![],
                 kwargs: vec![],
@@ -1598,7 +1896,7 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
+            let url = TokenTree::from(Tag::Url(Url {
                 view_name: TagElement::Int(64.into()),
                 args: vec![],
                 kwargs: vec![],
@@ -1619,13 +1917,13 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
-                view_name: TagElement::Variable(Variable { at: (7, 14) }),
+            let url = TokenTree::from(Tag::Url(Url {
+                view_name: TagElement::Variable(Variable::new(py, template.into(), (7, 14))),
                 args: vec![
                     TagElement::Text(Text { at: (23, 3) }),
                     TagElement::Filter(Box::new(Filter {
                         at: (32, 7),
-                        left: TagElement::Variable(Variable { at: (28, 3) }),
+                        left: TagElement::Variable(Variable::new(py, template.into(), (28, 3))),
                         filter: FilterType::Default(DefaultFilter::new(Argument {
                             at: (40, 6),
                             argument_type: ArgumentType::Text(Text { at: (41, 4) }),
@@ -1653,8 +1951,8 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
-                view_name: TagElement::Variable(Variable { at: (7, 14) }),
+            let url = TokenTree::from(Tag::Url(Url {
+                view_name: TagElement::Variable(Variable::new(py, template.into(), (7, 14))),
                 args: vec![],
                 kwargs: vec![
                     ("foo".to_string(), TagElement::Text(Text { at: (27, 3) })),
@@ -1677,8 +1975,8 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
-                view_name: TagElement::Variable(Variable { at: (7, 14) }),
+            let url = TokenTree::from(Tag::Url(Url {
+                view_name: TagElement::Variable(Variable::new(py, template.into(), (7, 14))),
                 args: vec![TagElement::Text(Text { at: (23, 3) })],
                 kwargs: vec![],
                 variable: Some("some_url".to_string()),
@@ -1698,8 +1996,8 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
-                view_name: TagElement::Variable(Variable { at: (7, 14) }),
+            let url = TokenTree::from(Tag::Url(Url {
+                view_name: TagElement::Variable(Variable::new(py, template.into(), (7, 14))),
                 args: vec![],
                 kwargs: vec![("foo".to_string(), TagElement::Text(Text { at: (27, 3) }))],
                 variable: Some("some_url".to_string()),
@@ -1719,12 +2017,12 @@ mod tests {
             let mut parser = Parser::new(py, template.into(), &libraries);
             let nodes = parser.parse().unwrap();
 
-            let url = TokenTree::Tag(Tag::Url(Url {
-                view_name: TagElement::Variable(Variable { at: (7, 14) }),
+            let url = TokenTree::from(Tag::Url(Url {
+                view_name: TagElement::Variable(Variable::new(py, template.into(), (7, 14))),
                 args: vec![
                     TagElement::Text(Text { at: (23, 3) }),
-                    TagElement::Variable(Variable { at: (28, 3) }),
-                    TagElement::Variable(Variable { at: (32, 4) }),
+                    TagElement::Variable(Variable::new(py, template.into(), (28, 3))),
+                    TagElement::Variable(Variable::new(py, template.into(), (32, 4))),
                 ],
                 kwargs: vec![],
                 variable: None,
@@ -1775,8 +2073,8 @@ mod tests {
                 FilterType::Lower(LowerFilter)
             );
             assert_ne!(
-                FilterType::External(ExternalFilter::new(py.None(), None)),
-                FilterType::External(ExternalFilter::new(py.None(), None))
+                FilterType::External(ExternalFilter::new(py.None(), None, FilterFlags::default())),
+                FilterType::External(ExternalFilter::new(py.None(), None, FilterFlags::default()))
             );
             assert_ne!(
                 FilterType::Lower(LowerFilter),
@@ -9,7 +9,7 @@ use pyo3::prelude::*;
 
 use crate::error::PyRenderError;
 use crate::types::TemplateString;
-use types::{Content, Context};
+use types::{Content, Context, Output};
 
 pub type ResolveResult<'t, 'py> = Result<Option<Content<'t, 'py>>, PyRenderError>;
 pub type RenderResult<'t> = Result<Cow<'t, str>, PyRenderError>;
@@ -41,6 +41,20 @@ pub trait Render {
         template: TemplateString<'t>,
         context: &mut Context,
     ) -> RenderResult<'t>;
+
+    /// Render onto the end of `output`. Elements containing other elements
+    /// override this to write their children straight into `output` rather
+    /// than building and joining intermediate strings.
+    fn render_to<'t>(
+        &'t self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+        output: &mut Output<'t>,
+    ) -> Result<(), PyRenderError> {
+        output.push(self.render(py, template, context)?);
+        Ok(())
+    }
 }
 
 /// Trait for evaluating an expression in a boolean context
@@ -86,6 +100,20 @@ where
             None => Ok(Cow::Borrowed("")),
         }
     }
+
+    fn render_to<'t>(
+        &'t self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+        output: &mut Output<'t>,
+    ) -> Result<(), PyRenderError> {
+        // Escaping is left to `output`, which does it without the GIL.
+        if let Some(content) = self.resolve(py, template, context, ResolveFailures::Raise)? {
+            output.push_content(content.resolve_string(context)?);
+        }
+        Ok(())
+    }
 }
 
 impl<T> Render for Vec<T>
@@ -98,12 +126,22 @@ where
         template: TemplateString<'t>,
         context: &mut Context,
     ) -> RenderResult<'t> {
-        Ok(Cow::Owned(
-            self.iter()
-                .map(|node| node.render(py, template, context))
-                .collect::<Result<Vec<_>, _>>()?
-                .join(""),
-        ))
+        let mut output = Output::default();
+        self.render_to(py, template, context, &mut output)?;
+        Ok(Cow::Owned(output.join(py, 0)))
+    }
+
+    fn render_to<'t>(
+        &'t self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+        output: &mut Output<'t>,
+    ) -> Result<(), PyRenderError> {
+        for node in self {
+            node.render_to(py, template, context, output)?;
+        }
+        Ok(())
     }
 }
 
@@ -122,4 +160,17 @@ where
             None => Cow::Borrowed(""),
         })
     }
+
+    fn render_to<'t>(
+        &'t self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+        output: &mut Output<'t>,
+    ) -> Result<(), PyRenderError> {
+        match self {
+            Some(inner) => inner.render_to(py, template, context, output),
+            None => Ok(()),
+        }
+    }
 }
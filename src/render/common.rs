@@ -1,18 +1,60 @@
 use std::borrow::Cow;
-use std::collections::BTreeMap;
 
+use pyo3::exceptions::{PyTypeError, PyValueError};
+use pyo3::intern;
 use pyo3::prelude::*;
+use pyo3::sync::GILOnceCell;
 
-use super::types::{Content, ContentString, Context};
+use super::types::{Content, ContentString, Context, Output};
 use super::{Evaluate, Render, RenderResult, Resolve, ResolveFailures, ResolveResult};
-use crate::error::RenderError;
+use crate::error::{PyRenderError, RenderError};
+use crate::filters::read_flag;
 use crate::parse::{TagElement, TokenTree};
 use crate::types::Argument;
 use crate::types::ArgumentType;
+use crate::types::Span;
 use crate::types::TemplateString;
 use crate::types::Text;
 use crate::types::TranslatedText;
 use crate::types::Variable;
+use crate::utils::PyResultMethods;
+
+pub(super) static GETTEXT: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
+static SIGNATURE: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
+
+/// Call `variable` without arguments if it is callable, as Django does for
+/// each part of a variable's name. `None` is what Django renders as
+/// `string_if_invalid`: a callable that alters data or needs arguments.
+fn call_if_callable(variable: Bound<'_, PyAny>) -> PyResult<Option<Bound<'_, PyAny>>> {
+    if !variable.is_callable() || read_flag(&variable, "do_not_call_in_templates")? {
+        return Ok(Some(variable));
+    }
+    if read_flag(&variable, "alters_data")? {
+        return Ok(None);
+    }
+    let py = variable.py();
+    let error = match variable.call0().ok_or_isinstance_of::<PyTypeError>(py)? {
+        Ok(called) => return Ok(Some(called)),
+        Err(error) => error,
+    };
+    // A `TypeError` raised inside a callable that takes no arguments is
+    // a real error.
+    let signature = SIGNATURE.import(py, "inspect", "signature")?;
+    let signature = match signature
+        .call1((&variable,))
+        .ok_or_isinstance_of::<PyValueError>(py)?
+    {
+        Ok(signature) => signature,
+        Err(_) => return Ok(None),
+    };
+    match signature
+        .call_method0(intern!(py, "bind"))
+        .ok_or_isinstance_of::<PyTypeError>(py)?
+    {
+        Ok(_) => Err(error),
+        Err(_) => Ok(None),
+    }
+}
 
 impl Resolve for Variable {
     fn resolve<'t, 'py>(
@@ -22,29 +64,45 @@ impl Resolve for Variable {
         context: &mut Context,
         failures: ResolveFailures,
     ) -> ResolveResult<'t, 'py> {
-        let mut parts = self.parts(template);
-        let (first, mut object_at) = parts.next().expect("Variable names cannot be empty");
-        let mut variable = match context.context.get(first) {
-            Some(variable) => variable.bind(py).clone(),
+        let keys = self.keys();
+        let (first, keys) = keys.split_first().expect("Variable names cannot be empty");
+        let mut object_at = first.at;
+        let mut variable = match context.get(py, template.content(first.at), first.name.bind(py))? {
+            Some(variable) => variable,
+            None => return Ok(None),
+        };
+        variable = match call_if_callable(variable)? {
+            Some(variable) => variable,
             None => return Ok(None),
         };
 
-        for (part, key_at) in parts {
-            variable = match variable.get_item(part) {
-                Ok(variable) => variable,
-                Err(_) => match variable.getattr(part) {
+        for key in keys {
+            let part = key.name.bind(py);
+            let item = match key.is_unsubscriptable(&variable) {
+                true => None,
+                false => match variable.get_item(part) {
+                    Ok(item) => Some(item),
+                    Err(_) => {
+                        key.failed_subscript(&variable);
+                        None
+                    }
+                },
+            };
+            variable = match item {
+                Some(item) => item,
+                None => match variable.getattr(part) {
                     Ok(variable) => variable,
                     Err(_) => {
-                        let int = match part.parse::<usize>() {
-                            Ok(int) => int,
-                            Err(_) => {
+                        let int = match key.index {
+                            Some(int) => int,
+                            None => {
                                 return match failures {
                                     ResolveFailures::Raise => {
                                         Err(RenderError::VariableDoesNotExist {
-                                            key: part.to_string(),
+                                            key: template.content(key.at).to_string(),
                                             object: variable.str()?.to_string(),
-                                            key_at: key_at.into(),
-                                            object_at: Some(object_at.into()),
+                                            key_at: key.at.widen().into(),
+                                            object_at: Some(object_at.widen().into()),
                                         }
                                         .into())
                                     }
@@ -59,7 +117,11 @@ impl Resolve for Variable {
                     }
                 },
             };
-            object_at.1 += key_at.1 + 1;
+            variable = match call_if_callable(variable)? {
+                Some(variable) => variable,
+                None => return Ok(None),
+            };
+            object_at.1 += key.at.1 + 1;
         }
         Ok(Some(Content::Py(variable)))
     }
@@ -89,10 +151,10 @@ impl Resolve for TranslatedText {
         context: &mut Context,
         _failures: ResolveFailures,
     ) -> ResolveResult<'t, 'py> {
-        let resolved = Cow::Borrowed(template.content(self.at));
-        let django_translation = py.import("django.utils.translation")?;
-        let get_text = django_translation.getattr("gettext")?;
-        let resolved = get_text.call1((resolved,))?.extract::<String>()?;
+        let resolved = context.translations.literal(py, self.at, || {
+            let gettext = GETTEXT.import(py, "django.utils.translation", "gettext")?;
+            gettext.call1((template.content(self.at),))?.extract()
+        })?;
         Ok(Some(Content::String(match context.autoescape {
             false => ContentString::String(Cow::Owned(resolved)),
             true => ContentString::HtmlSafe(Cow::Owned(resolved)),
@@ -118,16 +180,11 @@ impl Resolve for Argument {
                     Some(content) => content,
                     None => {
                         let key = template.content(variable.at).to_string();
-                        let context: BTreeMap<&String, &Bound<'py, PyAny>> = context
-                            .context
-                            .iter()
-                            .map(|(k, v)| (k, v.bind(py)))
-                            .collect();
-                        let object = format!("{:?}", context);
+                        let object = format!("{:?}", context.to_map(py));
                         return Err(RenderError::ArgumentDoesNotExist {
                             key,
                             object,
-                            key_at: variable.at.into(),
+                            key_at: variable.at.widen().into(),
                             object_at: None,
                         }
                         .into());
@@ -187,36 +244,62 @@ impl Render for TokenTree {
     ) -> RenderResult<'t> {
         match self {
             Self::Text(text) => text.render(py, template, context),
+            Self::Static(text) => Ok(Cow::Owned(text.clone())),
             Self::TranslatedText(_text) => todo!(),
             Self::Tag(tag) => tag.render(py, template, context),
             Self::Variable(variable) => variable.render(py, template, context),
             Self::Filter(filter) => filter.render(py, template, context),
         }
     }
+
+    fn render_to<'t>(
+        &'t self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+        output: &mut Output<'t>,
+    ) -> Result<(), PyRenderError> {
+        match self {
+            Self::Text(text) => {
+                output.push(template.content(text.at));
+                Ok(())
+            }
+            Self::Static(text) => {
+                output.push(text.as_str());
+                Ok(())
+            }
+            Self::TranslatedText(_text) => todo!(),
+            Self::Tag(tag) => tag.render_to(py, template, context, output),
+            Self::Variable(variable) => variable.render_to(py, template, context, output),
+            Self::Filter(filter) => filter.render_to(py, template, context, output),
+        }
+    }
 }
 
 #[cfg(test)]
 mod tests {
     use super::*;
 
-    use std::collections::HashMap;
-
     use pyo3::types::{PyDict, PyList, PyString};
 
+    use crate::render::types::{ContextStack, Translations};
+
     #[test]
     fn test_render_variable() {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
             let name = PyString::new(py, "Lily").into_any();
-            let context = HashMap::from([("name".to_string(), name.unbind())]);
+            let context = ContextStack::from_iter([("name".to_string(), name.unbind())]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name }}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
 
             let rendered = variable.render(py, template, &mut context).unwrap();
             assert_eq!(rendered, "Lily");
@@ -231,14 +314,16 @@ mod tests {
             let data = PyDict::new(py);
             let name = PyString::new(py, "Lily");
             data.set_item("name", name).unwrap();
-            let context = HashMap::from([("data".to_string(), data.into_any().unbind())]);
+            let context = ContextStack::from_iter([("data".to_string(), data.into_any().unbind())]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ data.name }}");
-            let variable = Variable::new((3, 9));
+            let variable = Variable::new(py, template, (3, 9));
 
             let rendered = variable.render(py, template, &mut context).unwrap();
             assert_eq!(rendered, "Lily");
@@ -252,14 +337,17 @@ mod tests {
         Python::with_gil(|py| {
             let name = PyString::new(py, "Lily");
             let names = PyList::new(py, [name]).unwrap();
-            let context = HashMap::from([("names".to_string(), names.into_any().unbind())]);
+            let context =
+                ContextStack::from_iter([("names".to_string(), names.into_any().unbind())]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ names.0 }}");
-            let variable = Variable::new((3, 7));
+            let variable = Variable::new(py, template, (3, 7));
 
             let rendered = variable.render(py, template, &mut context).unwrap();
             assert_eq!(rendered, "Lily");
@@ -285,37 +373,170 @@ user = User('Lily')
             )
             .unwrap();
 
-            let context = locals.extract().unwrap();
             let mut context = Context {
-                context,
+                context: ContextStack::default(),
+                dict: Some(locals.unbind()),
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ user.name }}");
-            let variable = Variable::new((3, 9));
+            let variable = Variable::new(py, template, (3, 9));
 
             let rendered = variable.render(py, template, &mut context).unwrap();
             assert_eq!(rendered, "Lily");
         })
     }
 
+    #[test]
+    fn test_render_remembers_unsubscriptable_types() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let locals = PyDict::new(py);
+            py.run(
+                c"
+class User:
+    def __init__(self, name):
+        self.name = name
+
+class Users(dict):
+    pass
+
+user = User('Lily')
+users = Users(name='Bryony')
+",
+                None,
+                Some(&locals),
+            )
+            .unwrap();
+            let user = locals.get_item("user").unwrap().unwrap();
+            let users = locals.get_item("users").unwrap().unwrap();
+
+            let mut context = Context {
+                context: ContextStack::default(),
+                dict: Some(locals.unbind()),
+                request: None,
+                autoescape: false,
+                translations: Translations::default(),
+            };
+            let template = TemplateString("{{ user.name }}");
+            let variable = Variable::new(py, template, (3, 9));
+            let name = &variable.keys()[1];
+            assert!(!name.is_unsubscriptable(&user));
+
+            for _ in 0..2 {
+                let rendered = variable.render(py, template, &mut context).unwrap();
+                assert_eq!(rendered, "Lily");
+                assert!(name.is_unsubscriptable(&user));
+            }
+
+            let template = TemplateString("{{ users.name }}");
+            let variable = Variable::new(py, template, (3, 10));
+            let rendered = variable.render(py, template, &mut context).unwrap();
+            assert_eq!(rendered, "Bryony");
+            let name = &variable.keys()[1];
+            assert!(!name.is_unsubscriptable(&users));
+        })
+    }
+
+    #[test]
+    fn test_context_lookup_order() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let dict = PyDict::new(py);
+            dict.set_item("name", "Lily").unwrap();
+            dict.set_item("True", "shadowed").unwrap();
+            let local = PyString::new(py, "Bryony").into_any().unbind();
+            let context = Context {
+                context: ContextStack::from_iter([("name".to_string(), local)]),
+                dict: Some(dict.unbind()),
+                request: None,
+                autoescape: false,
+                translations: Translations::default(),
+            };
+
+            let name = context.get(py, "name", "name").unwrap().unwrap();
+            assert_eq!(name.extract::<String>().unwrap(), "Bryony");
+            let shadowed = context.get(py, "True", "True").unwrap().unwrap();
+            assert_eq!(shadowed.extract::<String>().unwrap(), "shadowed");
+            assert!(context.get(py, "None", "None").unwrap().unwrap().is_none());
+            assert!(context.get(py, "missing", "missing").unwrap().is_none());
+
+            let map = context.to_map(py);
+            assert_eq!(
+                format!("{map:?}"),
+                r#"{"False": False, "None": None, "True": 'shadowed', "name": 'Bryony'}"#
+            );
+        })
+    }
+
     #[test]
     fn test_render_html_autoescape() {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
             let html = PyString::new(py, "<p>Hello World!</p>").into_any().unbind();
-            let context = HashMap::from([("html".to_string(), html)]);
+            let context = ContextStack::from_iter([("html".to_string(), html)]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: true,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ html }}");
-            let html = Variable::new((3, 4));
+            let html = Variable::new(py, template, (3, 4));
 
             let rendered = html.render(py, template, &mut context).unwrap();
             assert_eq!(rendered, "&lt;p&gt;Hello World!&lt;/p&gt;");
         })
     }
+
+    #[test]
+    fn test_render_translated_text_once() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let environ = py.import("os").unwrap().getattr("environ").unwrap();
+            environ
+                .call_method1("setdefault", ("DJANGO_SETTINGS_MODULE", "tests.settings"))
+                .unwrap();
+            py.import("django").unwrap().call_method0("setup").unwrap();
+            let translation = py.import("django.utils.translation").unwrap();
+
+            let mut context = Context {
+                context: ContextStack::default(),
+                dict: None,
+                request: None,
+                autoescape: false,
+                translations: Translations::default(),
+            };
+            let template = TemplateString("{{ _('Save') }}");
+            let text = TranslatedText::new((6, 4));
+
+            // A literal already translated during this render isn't looked
+            // up again.
+            let translated = context
+                .translations
+                .literal(py, (6, 4), || Ok("Speichern".to_string()))
+                .unwrap();
+            assert_eq!(translated, "Speichern");
+            let rendered = text.render(py, template, &mut context).unwrap();
+            assert_eq!(rendered, "Speichern");
+
+            // Nor is the active language read again until Python code that
+            // could change it has run.
+            translation.call_method1("activate", ("fr",)).unwrap();
+            let rendered = text.render(py, template, &mut context).unwrap();
+            assert_eq!(rendered, "Speichern");
+
+            // Then the translations are dropped if it changed.
+            context.translations.recheck_language();
+            let rendered = text.render(py, template, &mut context);
+            translation.call_method0("deactivate").unwrap();
+            assert_eq!(rendered.unwrap(), "Save");
+        })
+    }
 }
@@ -1,21 +1,30 @@
 use std::borrow::Cow;
 use std::sync::LazyLock;
 
-use html_escape::encode_quoted_attribute_to_string;
+use html_escape::{encode_quoted_attribute, encode_quoted_attribute_to_string};
+use num_bigint::Sign;
+use num_traits::{ToPrimitive, Zero};
+use pyo3::exceptions::{PyIndexError, PyTypeError, PyValueError};
+use pyo3::intern;
 use pyo3::prelude::*;
 use pyo3::sync::GILOnceCell;
-use pyo3::types::PyType;
+use pyo3::types::{PyDateTime, PyDict, PyString, PyType};
 
+use crate::error::PyRenderError;
 use crate::filters::{
-    AddFilter, AddSlashesFilter, CapfirstFilter, DefaultFilter, EscapeFilter, ExternalFilter,
-    FilterType, LowerFilter, SafeFilter, SlugifyFilter, UpperFilter,
+    AddFilter, AddSlashesFilter, CapfirstFilter, DefaultFilter, DefaultIfNoneFilter, EscapeFilter,
+    ExternalFilter, FilterType, FirstFilter, JoinFilter, LastFilter, LengthFilter,
+    LinebreaksbrFilter, LowerFilter, SafeFilter, SlugifyFilter, StriptagsFilter, TitleFilter,
+    TruncatecharsFilter, TruncatewordsFilter, UpperFilter, UrlencodeFilter, YesnoFilter,
 };
 use crate::parse::Filter;
-use crate::render::types::{Content, ContentString, Context};
+use crate::render::common::GETTEXT;
+use crate::render::types::{Content, ContentString, Context, MARK_SAFE};
 use crate::render::{Resolve, ResolveFailures, ResolveResult};
-use crate::types::TemplateString;
-use regex::Regex;
+use crate::types::{Argument, TemplateString};
+use regex::{Captures, Regex};
 use unicode_normalization::UnicodeNormalization;
+use unicode_normalization::char::canonical_combining_class;
 
 // Used for replacing all non-word and non-spaces with an empty string
 static NON_WORD_RE: LazyLock<Regex> =
@@ -25,7 +34,17 @@ static NON_WORD_RE: LazyLock<Regex> =
 static WHITESPACE_RE: LazyLock<Regex> =
     LazyLock::new(|| Regex::new(r"[-\s]+").expect("Static string will never panic"));
 
+// Python's `str.title` capitalises letters after apostrophes and digits,
+// which Django's `title` filter undoes
+static APOSTROPHE_RE: LazyLock<Regex> =
+    LazyLock::new(|| Regex::new("([a-z])'([A-Z])").expect("Static string will never panic"));
+
+static DIGIT_RE: LazyLock<Regex> =
+    LazyLock::new(|| Regex::new(r"\d([A-Z])").expect("Static string will never panic"));
+
 static SAFEDATA: GILOnceCell<Py<PyType>> = GILOnceCell::new();
+static TEMPLATE_LOCALTIME: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
+static STRIP_TAGS: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
 
 trait IntoOwnedContent<'t, 'py> {
     fn into_content(self) -> Option<Content<'t, 'py>>;
@@ -67,17 +86,76 @@ impl Resolve for Filter {
             FilterType::AddSlashes(filter) => filter.resolve(left, py, template, context),
             FilterType::Capfirst(filter) => filter.resolve(left, py, template, context),
             FilterType::Default(filter) => filter.resolve(left, py, template, context),
+            FilterType::DefaultIfNone(filter) => filter.resolve(left, py, template, context),
             FilterType::Escape(filter) => filter.resolve(left, py, template, context),
             FilterType::External(filter) => filter.resolve(left, py, template, context),
+            FilterType::First(filter) => filter.resolve(left, py, template, context),
+            FilterType::Join(filter) => filter.resolve(left, py, template, context),
+            FilterType::Last(filter) => filter.resolve(left, py, template, context),
+            FilterType::Length(filter) => filter.resolve(left, py, template, context),
+            FilterType::Linebreaksbr(filter) => filter.resolve(left, py, template, context),
             FilterType::Lower(filter) => filter.resolve(left, py, template, context),
             FilterType::Safe(filter) => filter.resolve(left, py, template, context),
             FilterType::Slugify(filter) => filter.resolve(left, py, template, context),
+            FilterType::Striptags(filter) => filter.resolve(left, py, template, context),
+            FilterType::Title(filter) => filter.resolve(left, py, template, context),
+            FilterType::Truncatechars(filter) => filter.resolve(left, py, template, context),
+            FilterType::Truncatewords(filter) => filter.resolve(left, py, template, context),
             FilterType::Upper(filter) => filter.resolve(left, py, template, context),
+            FilterType::Urlencode(filter) => filter.resolve(left, py, template, context),
+            FilterType::Yesno(filter) => filter.resolve(left, py, template, context),
         };
         result
     }
 }
 
+/// A string created by a filter, which is escaped if autoescape is on.
+fn unsafe_content<'t, 'py>(content: String, context: &Context) -> Option<Content<'t, 'py>> {
+    Some(Content::String(match context.autoescape {
+        true => ContentString::HtmlUnsafe(Cow::Owned(content)),
+        false => ContentString::String(Cow::Owned(content)),
+    }))
+}
+
+/// Convert `content` to a string like Python's `str`, ignoring `__html__`.
+fn raw_string<'t>(content: Content<'t, '_>) -> PyResult<Cow<'t, str>> {
+    Ok(match content {
+        Content::Py(object) => Cow::Owned(object.str()?.extract::<String>()?),
+        Content::String(content) => content.into_raw(),
+        Content::Float(n) => Cow::Owned(n.to_string()),
+        Content::Int(n) => Cow::Owned(n.to_string()),
+    })
+}
+
+/// Resolve a filter argument which the filter converts to a string.
+fn resolve_string_argument<'t>(
+    argument: &Argument,
+    py: Python<'_>,
+    template: TemplateString<'t>,
+    context: &mut Context,
+) -> Result<Cow<'t, str>, PyRenderError> {
+    let argument = argument
+        .resolve(py, template, context, ResolveFailures::Raise)?
+        .expect("missing argument in context should already have raised");
+    Ok(raw_string(argument)?)
+}
+
+/// The length to truncate to, or `None` if the argument isn't an integer.
+fn resolve_length(
+    argument: &Argument,
+    py: Python<'_>,
+    template: TemplateString<'_>,
+    context: &mut Context,
+) -> Result<Option<usize>, PyRenderError> {
+    let length = argument
+        .resolve(py, template, context, ResolveFailures::Raise)?
+        .expect("missing argument in context should already have raised");
+    Ok(length.to_bigint().map(|length| match length.sign() {
+        Sign::Plus => length.to_usize().unwrap_or(usize::MAX),
+        Sign::Minus | Sign::NoSign => 0,
+    }))
+}
+
 pub trait ResolveFilter {
     fn resolve<'t, 'py>(
         &self,
@@ -182,6 +260,24 @@ impl ResolveFilter for DefaultFilter {
     }
 }
 
+impl ResolveFilter for DefaultIfNoneFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        match variable {
+            Some(Content::Py(left)) if left.is_none() => {
+                self.argument
+                    .resolve(py, template, context, ResolveFailures::Raise)
+            }
+            left => Ok(left),
+        }
+    }
+}
+
 impl ResolveFilter for EscapeFilter {
     fn resolve<'t, 'py>(
         &self,
@@ -226,12 +322,227 @@ impl ResolveFilter for ExternalFilter {
             Some(arg) => arg.resolve(py, template, context, ResolveFailures::Raise)?,
             None => None,
         };
+        // Django only checks whether the input is safe for `is_safe` filters.
+        let safe_input = self.flags.is_safe
+            && match &variable {
+                Some(Content::String(ContentString::HtmlSafe(_))) => true,
+                Some(Content::Py(object)) => {
+                    #[allow(non_snake_case)]
+                    let SafeData = SAFEDATA.import(py, "django.utils.safestring", "SafeData")?;
+                    object.is_instance(SafeData)?
+                }
+                _ => false,
+            };
+        let variable = match variable.map(|content| content.to_py(py)).transpose()? {
+            Some(value) if self.flags.expects_localtime && value.is_instance_of::<PyDateTime>() => {
+                let template_localtime =
+                    TEMPLATE_LOCALTIME.import(py, "django.utils.timezone", "template_localtime")?;
+                Some(template_localtime.call1((value,))?)
+            }
+            variable => variable,
+        };
+        let kwargs = match self.flags.needs_autoescape {
+            true => {
+                let kwargs = PyDict::new(py);
+                kwargs.set_item(intern!(py, "autoescape"), context.autoescape)?;
+                Some(kwargs)
+            }
+            false => None,
+        };
         let filter = self.filter.bind(py);
         let value = match arg {
-            Some(arg) => filter.call1((variable, arg))?,
-            None => filter.call1((variable,))?,
+            Some(arg) => filter.call((variable, arg.to_py(py)?), kwargs.as_ref())?,
+            None => filter.call((variable,), kwargs.as_ref())?,
+        };
+        // The filter may have activated another language.
+        context.translations.recheck_language();
+        if !safe_input {
+            return Ok(Some(Content::Py(value)));
+        }
+        // The output of an `is_safe` filter is safe when its input was, so
+        // strings can be rendered without checking for `__html__`.
+        Ok(Some(match value.is_instance_of::<PyString>() {
+            true => Content::String(ContentString::HtmlSafe(Cow::Owned(value.extract()?))),
+            false => {
+                let mark_safe = MARK_SAFE.import(py, "django.utils.safestring", "mark_safe")?;
+                Content::Py(mark_safe.call1((value,))?)
+            }
+        }))
+    }
+}
+
+impl ResolveFilter for FirstFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        _template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let content = match variable {
+            Some(Content::String(content)) => match content.as_raw().chars().next() {
+                Some(first) => unsafe_content(first.to_string(), context),
+                None => "".as_content(),
+            },
+            Some(content) => match content.to_py(py)?.get_item(0) {
+                Ok(first) => Some(Content::Py(first)),
+                Err(error) if error.is_instance_of::<PyIndexError>(py) => "".as_content(),
+                Err(error) => return Err(error.into()),
+            },
+            None => "".as_content(),
+        };
+        Ok(content)
+    }
+}
+
+impl ResolveFilter for JoinFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let separator = self
+            .argument
+            .resolve(py, template, context, ResolveFailures::Raise)?
+            .expect("missing argument in context should already have raised")
+            .render(context)?;
+        let items: Vec<String> = match variable {
+            Some(Content::String(content)) => content
+                .as_raw()
+                .chars()
+                .map(|c| match context.autoescape {
+                    true => encode_quoted_attribute(&c.to_string()).into_owned(),
+                    false => c.to_string(),
+                })
+                .collect(),
+            Some(Content::Py(object)) => {
+                let iter = match object.try_iter() {
+                    Ok(iter) => iter,
+                    Err(error) if error.is_instance_of::<PyTypeError>(py) => {
+                        return Ok(Some(Content::Py(object)));
+                    }
+                    Err(error) => return Err(error.into()),
+                };
+                let mut items = Vec::new();
+                for item in iter {
+                    let item = item?;
+                    let item = match context.autoescape {
+                        true => Content::Py(item).render(context)?.into_owned(),
+                        // Without autoescape Django uses `str.join`, which
+                        // fails for anything but strings.
+                        false => match item.is_instance_of::<PyString>() {
+                            true => item.extract::<String>()?,
+                            false => return Ok(Some(Content::Py(object))),
+                        },
+                    };
+                    items.push(item);
+                }
+                items
+            }
+            // Numbers aren't iterable, so Django returns them unchanged.
+            Some(content) => return Ok(Some(content)),
+            None => Vec::new(),
+        };
+        Ok(Some(Content::String(ContentString::HtmlSafe(Cow::Owned(
+            items.join(&*separator),
+        )))))
+    }
+}
+
+impl ResolveFilter for LastFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        _template: TemplateString<'t>,
+        _context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        // Django registers `last` with `is_safe`, so the last character of
+        // a safe string is still safe.
+        let content = match variable {
+            Some(Content::String(content)) => match content.as_raw().chars().next_back() {
+                Some(last) => Some(content.map_content(|_| Cow::Owned(last.to_string()))),
+                None => "".as_content(),
+            },
+            Some(Content::Py(object)) => match object.get_item(-1) {
+                Ok(last) => {
+                    #[allow(non_snake_case)]
+                    let SafeData = SAFEDATA.import(py, "django.utils.safestring", "SafeData")?;
+                    match object.is_instance(SafeData)? && last.is_instance_of::<PyString>() {
+                        true => Some(Content::String(ContentString::HtmlSafe(Cow::Owned(
+                            last.extract()?,
+                        )))),
+                        false => Some(Content::Py(last)),
+                    }
+                }
+                Err(error) if error.is_instance_of::<PyIndexError>(py) => "".as_content(),
+                Err(error) => return Err(error.into()),
+            },
+            Some(content) => match content.to_py(py)?.get_item(-1) {
+                Ok(last) => Some(Content::Py(last)),
+                Err(error) if error.is_instance_of::<PyIndexError>(py) => "".as_content(),
+                Err(error) => return Err(error.into()),
+            },
+            None => "".as_content(),
+        };
+        Ok(content)
+    }
+}
+
+impl ResolveFilter for LengthFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        _template: TemplateString<'t>,
+        _context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let length = match variable {
+            Some(Content::String(content)) => content.as_raw().chars().count(),
+            Some(Content::Py(object)) => match object.len() {
+                Ok(length) => length,
+                Err(error)
+                    if error.is_instance_of::<PyTypeError>(py)
+                        || error.is_instance_of::<PyValueError>(py) =>
+                {
+                    0
+                }
+                Err(error) => return Err(error.into()),
+            },
+            Some(Content::Int(_)) | Some(Content::Float(_)) | None => 0,
+        };
+        Ok(Some(Content::Int(length.into())))
+    }
+}
+
+fn normalize_newlines(content: &str) -> String {
+    content.replace("\r\n", "\n").replace('\r', "\n")
+}
+
+impl ResolveFilter for LinebreaksbrFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        _py: Python<'py>,
+        _template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let content = match variable {
+            Some(content) => match content.resolve_string(context)? {
+                ContentString::HtmlUnsafe(content) => {
+                    encode_quoted_attribute(&normalize_newlines(&content)).into_owned()
+                }
+                ContentString::HtmlSafe(content) | ContentString::String(content) => {
+                    normalize_newlines(&content)
+                }
+            },
+            None => return Ok("".as_content()),
         };
-        Ok(Some(Content::Py(value)))
+        Ok(Some(Content::String(ContentString::HtmlSafe(Cow::Owned(
+            content.replace('\n', "<br>"),
+        )))))
     }
 }
 
@@ -328,6 +639,181 @@ impl ResolveFilter for SlugifyFilter {
     }
 }
 
+impl ResolveFilter for StriptagsFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        _template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let content = match variable {
+            Some(content) => content.resolve_string(context)?,
+            None => return Ok("".as_content()),
+        };
+        let raw = content.as_raw();
+        // Anything without both angle brackets has no tags to strip, so only
+        // call Django's HTML parser when there might be some.
+        if !(raw.contains('<') && raw.contains('>')) {
+            return Ok(Some(Content::String(content)));
+        }
+        let strip_tags = STRIP_TAGS.import(py, "django.utils.html", "strip_tags")?;
+        let stripped = strip_tags.call1((&**raw,))?.extract::<String>()?;
+        Ok(Some(content.map_content(|_| Cow::Owned(stripped))))
+    }
+}
+
+fn title(py: Python<'_>, content: &str) -> PyResult<String> {
+    // Python titlecases other scripts with rules of its own, such as `ǆ`
+    // becoming `ǅ`, so only ASCII is handled here.
+    let titled = match content.is_ascii() {
+        true => {
+            let mut titled = String::with_capacity(content.len());
+            let mut previous_is_cased = false;
+            for c in content.chars() {
+                titled.push(match previous_is_cased {
+                    true => c.to_ascii_lowercase(),
+                    false => c.to_ascii_uppercase(),
+                });
+                previous_is_cased = c.is_ascii_alphabetic();
+            }
+            titled
+        }
+        false => PyString::new(py, content)
+            .call_method0(intern!(py, "title"))?
+            .extract()?,
+    };
+    let titled =
+        APOSTROPHE_RE.replace_all(&titled, |captures: &Captures| captures[0].to_lowercase());
+    let titled = DIGIT_RE.replace_all(&titled, |captures: &Captures| captures[0].to_lowercase());
+    Ok(titled.into_owned())
+}
+
+impl ResolveFilter for TitleFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        _template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let content = match variable {
+            Some(content) => {
+                let content = content.resolve_string(context)?;
+                let titled = title(py, content.as_raw())?;
+                Some(content.map_content(|_| Cow::Owned(titled)))
+            }
+            None => "".as_content(),
+        };
+        Ok(content)
+    }
+}
+
+/// Add `truncate` to the end of `text`, like Django's `Truncator`.
+fn add_truncation_text(text: &str, truncate: &str) -> String {
+    if truncate.contains("%(truncated_text)s") {
+        return truncate.replace("%(truncated_text)s", text);
+    }
+    if text.ends_with(truncate) {
+        return text.to_string();
+    }
+    format!("{text}{truncate}")
+}
+
+/// Truncate `text` to `length` characters, counting the truncation text but
+/// not combining characters.
+fn truncate_chars(text: &str, length: usize, truncate: &str) -> String {
+    let text = text.nfc().collect::<String>();
+    let is_combining = |c: char| canonical_combining_class(c) != 0;
+    let mut truncate_length = length;
+    for c in add_truncation_text("", truncate).chars() {
+        if !is_combining(c) {
+            truncate_length -= 1;
+            if truncate_length == 0 {
+                break;
+            }
+        }
+    }
+    let mut count = 0;
+    let mut end = None;
+    for (index, c) in text.char_indices() {
+        if is_combining(c) {
+            continue;
+        }
+        count += 1;
+        if end.is_none() && count > truncate_length {
+            end = Some(index);
+        }
+        if count > length {
+            return add_truncation_text(&text[..end.unwrap_or(0)], truncate);
+        }
+    }
+    text
+}
+
+impl ResolveFilter for TruncatecharsFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let length = match resolve_length(&self.argument, py, template, context)? {
+            Some(0) => return Ok("".as_content()),
+            Some(length) => length,
+            None => return Ok(variable),
+        };
+        let content = match variable {
+            Some(content) => content.resolve_string(context)?,
+            None => return Ok("".as_content()),
+        };
+        let truncate = context.translations.truncation(py)?;
+        Ok(Some(content.map_content(|content| {
+            Cow::Owned(truncate_chars(&content, length, truncate))
+        })))
+    }
+}
+
+/// Whether Python's `str.split` treats `c` as whitespace.
+fn is_python_whitespace(c: char) -> bool {
+    c.is_whitespace() || ('\x1c'..='\x1f').contains(&c)
+}
+
+fn truncate_words(text: &str, length: usize) -> String {
+    let words = text
+        .split(is_python_whitespace)
+        .filter(|word| !word.is_empty())
+        .collect::<Vec<_>>();
+    if words.len() > length {
+        return add_truncation_text(&words[..length].join(" "), " …");
+    }
+    words.join(" ")
+}
+
+impl ResolveFilter for TruncatewordsFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let length = match resolve_length(&self.argument, py, template, context)? {
+            Some(0) => return Ok("".as_content()),
+            Some(length) => length,
+            None => return Ok(variable),
+        };
+        let content = match variable {
+            Some(content) => content.resolve_string(context)?,
+            None => return Ok("".as_content()),
+        };
+        Ok(Some(content.map_content(|content| {
+            Cow::Owned(truncate_words(&content, length))
+        })))
+    }
+}
+
 impl ResolveFilter for UpperFilter {
     fn resolve<'t, 'py>(
         &self,
@@ -347,12 +833,86 @@ impl ResolveFilter for UpperFilter {
     }
 }
 
+/// Percent-encode `content` like Python's `urllib.parse.quote`.
+fn urlencode(content: &str, safe: &str) -> String {
+    let mut encoded = String::with_capacity(content.len());
+    for byte in content.bytes() {
+        if byte.is_ascii_alphanumeric()
+            || b"_.-~".contains(&byte)
+            || (byte.is_ascii() && safe.as_bytes().contains(&byte))
+        {
+            encoded.push(byte as char);
+        } else {
+            encoded.push_str(&format!("%{byte:02X}"));
+        }
+    }
+    encoded
+}
+
+impl ResolveFilter for UrlencodeFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let safe = match &self.argument {
+            Some(argument) => resolve_string_argument(argument, py, template, context)?,
+            None => Cow::Borrowed("/"),
+        };
+        let content = match variable {
+            Some(content) => raw_string(content)?,
+            None => return Ok("".as_content()),
+        };
+        Ok(unsafe_content(urlencode(&content, &safe), context))
+    }
+}
+
+impl ResolveFilter for YesnoFilter {
+    fn resolve<'t, 'py>(
+        &self,
+        variable: Option<Content<'t, 'py>>,
+        py: Python<'py>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> ResolveResult<'t, 'py> {
+        let choices = match &self.argument {
+            Some(argument) => resolve_string_argument(argument, py, template, context)?,
+            None => {
+                let gettext = GETTEXT.import(py, "django.utils.translation", "gettext")?;
+                Cow::Owned(gettext.call1(("yes,no,maybe",))?.extract::<String>()?)
+            }
+        };
+        let (yes, no, maybe) = match choices.split(',').collect::<Vec<_>>().as_slice() {
+            [yes, no, maybe] => (*yes, *no, *maybe),
+            [yes, no, ..] => (*yes, *no, *no),
+            _ => return Ok(variable),
+        };
+        let truthy = match variable {
+            Some(Content::Py(object)) if object.is_none() => None,
+            Some(Content::Py(object)) => Some(object.is_truthy()?),
+            Some(Content::String(content)) => Some(!content.as_raw().is_empty()),
+            Some(Content::Int(n)) => Some(!n.is_zero()),
+            Some(Content::Float(n)) => Some(n != 0.0),
+            None => Some(false),
+        };
+        let choice = match truthy {
+            Some(true) => yes,
+            Some(false) => no,
+            None => maybe,
+        };
+        Ok(unsafe_content(choice.to_string(), context))
+    }
+}
+
 #[cfg(test)]
 mod tests {
     use super::*;
     use crate::filters::{AddSlashesFilter, DefaultFilter, LowerFilter, UpperFilter};
     use crate::parse::TagElement;
     use crate::render::Render;
+    use crate::render::types::{ContextStack, Translations};
     use crate::template::django_rusty_templates::{EngineData, Template};
     use crate::types::{Argument, ArgumentType, Text, Variable};
 
@@ -373,22 +933,22 @@ mod tests {
         Ok(safe_string)
     }
 
-    use std::collections::HashMap;
-
     #[test]
     fn test_render_filter() {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
             let name = PyString::new(py, "Lily").into_any();
-            let context = HashMap::from([("name".to_string(), name.unbind())]);
+            let context = ContextStack::from_iter([("name".to_string(), name.unbind())]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name|default:'Bryony' }}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
             let filter = Filter {
                 at: (8, 7),
                 left: TagElement::Variable(variable),
@@ -579,14 +1139,16 @@ mod tests {
 
         Python::with_gil(|py| {
             let name = PyString::new(py, "'hello'").into_any();
-            let context = HashMap::from([("quotes".to_string(), name.unbind())]);
+            let context = ContextStack::from_iter([("quotes".to_string(), name.unbind())]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ quotes|addslashes }}");
-            let variable = Variable::new((3, 6));
+            let variable = Variable::new(py, template, (3, 6));
             let filter = Filter {
                 at: (10, 10),
                 left: TagElement::Variable(variable),
@@ -641,14 +1203,16 @@ mod tests {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
-            let context = HashMap::new();
+            let context = ContextStack::default();
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name|default:'Bryony' }}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
             let filter = Filter {
                 at: (8, 7),
                 left: TagElement::Variable(variable),
@@ -668,14 +1232,16 @@ mod tests {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
-            let context = HashMap::new();
+            let context = ContextStack::default();
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ count|default:12}}");
-            let variable = Variable::new((3, 5));
+            let variable = Variable::new(py, template, (3, 5));
             let filter = Filter {
                 at: (9, 7),
                 left: TagElement::Variable(variable),
@@ -695,14 +1261,16 @@ mod tests {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
-            let context = HashMap::new();
+            let context = ContextStack::default();
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ count|default:3.5}}");
-            let variable = Variable::new((3, 5));
+            let variable = Variable::new(py, template, (3, 5));
             let filter = Filter {
                 at: (9, 7),
                 left: TagElement::Variable(variable),
@@ -723,20 +1291,22 @@ mod tests {
 
         Python::with_gil(|py| {
             let me = PyString::new(py, "Lily").into_any();
-            let context = HashMap::from([("me".to_string(), me.unbind())]);
+            let context = ContextStack::from_iter([("me".to_string(), me.unbind())]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name|default:me}}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
             let filter = Filter {
                 at: (8, 7),
                 left: TagElement::Variable(variable),
                 filter: FilterType::Default(DefaultFilter::new(Argument {
                     at: (16, 2),
-                    argument_type: ArgumentType::Variable(Variable::new((16, 2))),
+                    argument_type: ArgumentType::Variable(Variable::new(py, template, (16, 2))),
                 })),
             };
 
@@ -751,14 +1321,16 @@ mod tests {
 
         Python::with_gil(|py| {
             let name = PyString::new(py, "Lily").into_any();
-            let context = HashMap::from([("name".to_string(), name.unbind())]);
+            let context = ContextStack::from_iter([("name".to_string(), name.unbind())]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name|lower }}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
             let filter = Filter {
                 at: (8, 5),
                 left: TagElement::Variable(variable),
@@ -775,14 +1347,16 @@ mod tests {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
-            let context = HashMap::new();
+            let context = ContextStack::default();
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name|lower }}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
             let filter = Filter {
                 at: (8, 5),
                 left: TagElement::Variable(variable),
@@ -799,14 +1373,16 @@ mod tests {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
-            let context = HashMap::new();
+            let context = ContextStack::default();
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name|default:'Bryony'|lower }}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
             let default = Filter {
                 at: (8, 7),
                 left: TagElement::Variable(variable),
@@ -832,14 +1408,16 @@ mod tests {
 
         Python::with_gil(|py| {
             let name = PyString::new(py, "Foo").into_any();
-            let context = HashMap::from([("name".to_string(), name.unbind())]);
+            let context = ContextStack::from_iter([("name".to_string(), name.unbind())]);
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name|upper }}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
             let filter = Filter {
                 at: (8, 5),
                 left: TagElement::Variable(variable),
@@ -856,14 +1434,16 @@ mod tests {
         pyo3::prepare_freethreaded_python();
 
         Python::with_gil(|py| {
-            let context = HashMap::new();
+            let context = ContextStack::default();
             let mut context = Context {
                 context,
+                dict: None,
                 request: None,
                 autoescape: false,
+                translations: Translations::default(),
             };
             let template = TemplateString("{{ name|upper }}");
-            let variable = Variable::new((3, 4));
+            let variable = Variable::new(py, template, (3, 4));
             let filter = Filter {
                 at: (8, 5),
                 left: TagElement::Variable(variable),
@@ -2,18 +2,23 @@ use std::borrow::Cow;
 
 use num_bigint::BigInt;
 use num_traits::cast::ToPrimitive;
-use pyo3::exceptions::PyAttributeError;
+use pyo3::exceptions::{PyAttributeError, PyKeyError, PyTypeError, PyValueError};
+use pyo3::intern;
 use pyo3::prelude::*;
-use pyo3::types::{PyBool, PyDict, PyList, PyNone};
+use pyo3::sync::GILOnceCell;
+use pyo3::types::{PyBool, PyDict, PyIterator, PyList, PyNone, PyTuple};
 
-use super::types::{Content, ContentString, Context};
+use super::types::{Content, ContentString, Context, Output};
 use super::{Evaluate, Render, RenderResult, Resolve, ResolveFailures, ResolveResult};
 use crate::error::PyRenderError;
-use crate::parse::{IfCondition, Tag, Url};
+use crate::parse::{For, IfCondition, Tag, Url};
 use crate::template::django_rusty_templates::NoReverseMatch;
 use crate::types::TemplateString;
 use crate::utils::PyResultMethods;
 
+static REVERSE: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
+static REVERSED: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
+
 fn current_app(py: Python, request: &Option<Py<PyAny>>) -> PyResult<Py<PyAny>> {
     let none = py.None();
     let request = match request {
@@ -47,8 +52,7 @@ impl Resolve for Url {
             Some(view_name) => view_name,
             None => Content::String(ContentString::String(Cow::Borrowed(""))),
         };
-        let urls = py.import("django.urls")?;
-        let reverse = urls.getattr("reverse")?;
+        let reverse = REVERSE.import(py, "django.urls", "reverse")?;
 
         let current_app = current_app(py, &context.request)?;
         let url = if self.kwargs.is_empty() {
@@ -74,7 +78,7 @@ impl Resolve for Url {
             None => Ok(Some(Content::Py(url?))),
             Some(variable) => match url.ok_or_isinstance_of::<NoReverseMatch>(py)? {
                 Ok(url) => {
-                    context.context.insert(variable.clone(), url.unbind());
+                    context.context.insert(variable, url.unbind());
                     Ok(None)
                 }
                 Err(_) => Ok(None),
@@ -696,31 +700,299 @@ impl Render for Tag {
         context: &mut Context,
     ) -> RenderResult<'t> {
         Ok(match self {
+            Self::Load => Cow::Borrowed(""),
+            Self::Url(url) => url.render(py, template, context)?,
+            _ => {
+                let mut output = Output::default();
+                self.render_to(py, template, context, &mut output)?;
+                Cow::Owned(output.join(py, 0))
+            }
+        })
+    }
+
+    fn render_to<'t>(
+        &'t self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+        output: &mut Output<'t>,
+    ) -> Result<(), PyRenderError> {
+        match self {
             Self::Autoescape { enabled, nodes } => {
                 let autoescape = context.autoescape;
                 context.autoescape = enabled.into();
-
-                let mut rendered = vec![];
-                for node in nodes {
-                    rendered.push(node.render(py, template, context)?)
-                }
-
+                let rendered = nodes.render_to(py, template, context, output);
                 context.autoescape = autoescape;
-                Cow::Owned(rendered.join(""))
+                rendered
             }
+            Self::For(for_tag) => for_tag.render_to(py, template, context, output),
             Self::If {
                 condition,
                 truthy,
                 falsey,
             } => {
                 if condition.evaluate(py, template, context).unwrap_or(false) {
-                    truthy.render(py, template, context)?
+                    truthy.render_to(py, template, context, output)
                 } else {
-                    falsey.render(py, template, context)?
+                    falsey.render_to(py, template, context, output)
                 }
             }
-            Self::Load => Cow::Borrowed(""),
-            Self::Url(url) => url.render(py, template, context)?,
+            Self::Load => Ok(()),
+            Self::Url(url) => url.render_to(py, template, context, output),
+        }
+    }
+}
+
+/// The `forloop` variable of a `{% for %}` tag. Each item gets its own,
+/// so a reference kept by a filter still shows the counters of its item.
+/// Like Django's dict, its values can be read as attributes or by key.
+#[pyclass(frozen)]
+pub struct ForLoop {
+    counter0: usize,
+    length: usize,
+    parentloop: Option<Py<PyAny>>,
+}
+
+#[pymethods]
+impl ForLoop {
+    #[getter]
+    fn counter0(&self) -> usize {
+        self.counter0
+    }
+
+    #[getter]
+    fn counter(&self) -> usize {
+        self.counter0 + 1
+    }
+
+    #[getter]
+    fn revcounter(&self) -> usize {
+        self.length.saturating_sub(self.counter0)
+    }
+
+    #[getter]
+    fn revcounter0(&self) -> usize {
+        self.length.saturating_sub(self.counter0 + 1)
+    }
+
+    #[getter]
+    fn first(&self) -> bool {
+        self.counter0 == 0
+    }
+
+    #[getter]
+    fn last(&self) -> bool {
+        self.counter0 + 1 == self.length
+    }
+
+    #[getter]
+    fn length(&self) -> usize {
+        self.length
+    }
+
+    /// The enclosing loop's `forloop`, or an empty dict like Django's.
+    #[getter]
+    fn parentloop<'py>(&self, py: Python<'py>) -> Bound<'py, PyAny> {
+        match &self.parentloop {
+            Some(parentloop) => parentloop.bind(py).clone(),
+            None => PyDict::new(py).into_any(),
+        }
+    }
+
+    fn __getitem__<'py>(&self, py: Python<'py>, key: &str) -> PyResult<Bound<'py, PyAny>> {
+        Ok(match key {
+            "counter0" => self.counter0().into_pyobject(py)?.into_any(),
+            "counter" => self.counter().into_pyobject(py)?.into_any(),
+            "revcounter" => self.revcounter().into_pyobject(py)?.into_any(),
+            "revcounter0" => self.revcounter0().into_pyobject(py)?.into_any(),
+            "first" => PyBool::new(py, self.first()).to_owned().into_any(),
+            "last" => PyBool::new(py, self.last()).to_owned().into_any(),
+            "length" => self.length().into_pyobject(py)?.into_any(),
+            "parentloop" => self.parentloop(py),
+            _ => return Err(PyKeyError::new_err(key.to_string())),
         })
     }
 }
+
+/// The items of a `{% for %}` loop, read one at a time so a stream can
+/// stop between any two of them.
+pub struct ForItems {
+    values: ForValues,
+    length: usize,
+    parentloop: Option<Py<PyAny>>,
+    // How many items have been read.
+    count: usize,
+}
+
+enum ForValues {
+    // Lists and tuples are read by index, without an iterator or a copy.
+    List(Py<PyList>),
+    Tuple(Py<PyTuple>),
+    Iterator(Py<PyIterator>),
+}
+
+impl For {
+    /// Resolve the items to loop over and push the loop's frame onto the
+    /// context, which the caller pops when the loop ends. Returns `None`
+    /// without pushing a frame when the `{% empty %}` branch renders instead.
+    pub fn start(
+        &self,
+        py: Python<'_>,
+        template: TemplateString<'_>,
+        context: &mut Context,
+    ) -> Result<Option<ForItems>, PyRenderError> {
+        let values = match self.iterable.resolve(
+            py,
+            template,
+            context,
+            ResolveFailures::IgnoreVariableDoesNotExist,
+        )? {
+            Some(values) => values.to_py(py)?,
+            None => return Ok(None),
+        };
+        if values.is_none() {
+            return Ok(None);
+        }
+        // Like Django, anything without a length is copied into a list first.
+        let (values, length) = match values.len() {
+            Ok(length) => (values, length),
+            Err(error) if error.is_instance_of::<PyTypeError>(py) => {
+                let values = py.get_type::<PyList>().call1((values,))?;
+                let length = values.len()?;
+                (values, length)
+            }
+            Err(error) => return Err(error.into()),
+        };
+        if length == 0 {
+            return Ok(None);
+        }
+        let values = if let Ok(list) = values.downcast_exact::<PyList>() {
+            ForValues::List(list.clone().unbind())
+        } else if let Ok(tuple) = values.downcast_exact::<PyTuple>() {
+            ForValues::Tuple(tuple.clone().unbind())
+        } else {
+            let items = match self.reversed {
+                true => REVERSED
+                    .import(py, "builtins", "reversed")?
+                    .call1((values,))?,
+                false => values,
+            };
+            ForValues::Iterator(items.try_iter()?.unbind())
+        };
+
+        let parentloop = context
+            .get(py, "forloop", intern!(py, "forloop"))?
+            .map(Bound::unbind);
+
+        // The loop's names go in their own frame, which shadows any names
+        // from outside the loop until it ends.
+        context.context.push();
+        Ok(Some(ForItems {
+            values,
+            length,
+            parentloop,
+            count: 0,
+        }))
+    }
+
+    /// Set the loop variables to the next item, returning `false` once
+    /// there are no more items.
+    pub fn next_item(
+        &self,
+        py: Python<'_>,
+        context: &mut Context,
+        items: &mut ForItems,
+    ) -> Result<bool, PyRenderError> {
+        let i = items.count;
+        let index = match self.reversed {
+            true => items.length.wrapping_sub(i + 1),
+            false => i,
+        };
+        let item = match &items.values {
+            ForValues::List(list) if i < items.length => list.bind(py).get_item(index)?,
+            ForValues::Tuple(tuple) if i < items.length => tuple.bind(py).get_item(index)?,
+            ForValues::Iterator(iterator) => match iterator.bind(py).clone().next() {
+                Some(item) => item?,
+                None => return Ok(false),
+            },
+            _ => return Ok(false),
+        };
+        items.count += 1;
+        let forloop = ForLoop {
+            counter0: i,
+            length: items.length,
+            parentloop: items
+                .parentloop
+                .as_ref()
+                .map(|parentloop| parentloop.clone_ref(py)),
+        };
+        context
+            .context
+            .insert("forloop", Py::new(py, forloop)?.into_any());
+
+        match self.variables.as_slice() {
+            [variable] => context.context.insert(variable, item.unbind()),
+            variables => {
+                let length = match item.len() {
+                    Ok(length) => length,
+                    Err(error) if error.is_instance_of::<PyTypeError>(py) => 1,
+                    Err(error) => return Err(error.into()),
+                };
+                if length != variables.len() {
+                    let message = format!(
+                        "Need {} values to unpack in for loop; got {}. ",
+                        variables.len(),
+                        length
+                    );
+                    return Err(PyValueError::new_err(message).into());
+                }
+                for (variable, value) in variables.iter().zip(item.try_iter()?) {
+                    context.context.insert(variable, value?.unbind());
+                }
+            }
+        }
+        Ok(true)
+    }
+
+    fn render_items<'t>(
+        &'t self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+        output: &mut Output<'t>,
+        items: &mut ForItems,
+    ) -> Result<(), PyRenderError> {
+        while self.next_item(py, context, items)? {
+            self.nodes.render_to(py, template, context, output)?;
+        }
+        Ok(())
+    }
+}
+
+impl Render for For {
+    fn render<'t>(
+        &self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+    ) -> RenderResult<'t> {
+        let mut output = Output::default();
+        self.render_to(py, template, context, &mut output)?;
+        Ok(Cow::Owned(output.join(py, 0)))
+    }
+
+    fn render_to<'t>(
+        &'t self,
+        py: Python<'_>,
+        template: TemplateString<'t>,
+        context: &mut Context,
+        output: &mut Output<'t>,
+    ) -> Result<(), PyRenderError> {
+        let Some(mut items) = self.start(py, template, context)? else {
+            return self.empty.render_to(py, template, context, output);
+        };
+        let rendered = self.render_items(py, template, context, output, &mut items);
+        context.context.pop();
+        rendered
+    }
+}
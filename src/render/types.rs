@@ -1,19 +1,223 @@
 use std::borrow::Cow;
-use std::collections::HashMap;
+use std::collections::{BTreeMap, HashMap};
 
-use html_escape::encode_quoted_attribute;
+use html_escape::{encode_quoted_attribute, encode_quoted_attribute_to_string};
 use num_bigint::{BigInt, ToBigInt};
 use pyo3::exceptions::PyAttributeError;
 use pyo3::intern;
 use pyo3::prelude::*;
-use pyo3::types::{PyInt, PyString, PyType};
+use pyo3::pybacked::PyBackedStr;
+use pyo3::sync::GILOnceCell;
+use pyo3::types::{PyBool, PyDict, PyInt, PyString, PyType};
 
+use crate::types::NodeAt;
 use crate::utils::PyResultMethods;
 
+pub(super) static MARK_SAFE: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
+static GET_LANGUAGE: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
+static PGETTEXT: GILOnceCell<Py<PyAny>> = GILOnceCell::new();
+
 pub struct Context {
     pub request: Option<Py<PyAny>>,
-    pub context: HashMap<String, Py<PyAny>>,
+    // The context passed to `render`, which is read lazily instead of being
+    // copied.
+    pub dict: Option<Py<PyDict>>,
+    // Names set while rendering, such as loop variables or
+    // `{% url ... as name %}`, layered on top of `dict`.
+    pub context: ContextStack,
     pub autoescape: bool,
+    pub translations: Translations,
+}
+
+/// Strings translated while rendering, so a literal inside a loop is only
+/// translated once per render. The active language is read at the first
+/// translation, and again only after Python code that could activate
+/// another language has run; the translations are dropped if it changed.
+#[derive(Debug, Default)]
+pub struct Translations {
+    language: Option<String>,
+    // Whether `language` is still known to be the active language.
+    checked: bool,
+    // Translated string literals by their position in the template.
+    literals: HashMap<NodeAt, String>,
+    // What `truncatechars` adds to the text it shortens.
+    truncation: Option<String>,
+}
+
+impl Translations {
+    /// Forget what was translated if the active language has changed since.
+    fn check_language(&mut self, py: Python<'_>) -> PyResult<()> {
+        if self.checked {
+            return Ok(());
+        }
+        let get_language = GET_LANGUAGE.import(py, "django.utils.translation", "get_language")?;
+        let language: Option<PyBackedStr> = get_language.call0()?.extract()?;
+        if self.language.as_deref() != language.as_deref() {
+            self.literals.clear();
+            self.truncation = None;
+            self.language = language.map(|language| language.to_string());
+        }
+        self.checked = true;
+        Ok(())
+    }
+
+    /// Read the active language again before the next translation, because
+    /// Python code that may have activated another one has run.
+    pub fn recheck_language(&mut self) {
+        self.checked = false;
+    }
+
+    /// The literal at `at` in the active language, from `translate` unless
+    /// it was already translated.
+    pub fn literal(
+        &mut self,
+        py: Python<'_>,
+        at: NodeAt,
+        translate: impl FnOnce() -> PyResult<String>,
+    ) -> PyResult<String> {
+        self.check_language(py)?;
+        if let Some(translated) = self.literals.get(&at) {
+            return Ok(translated.clone());
+        }
+        let translated = translate()?;
+        self.literals.insert(at, translated.clone());
+        Ok(translated)
+    }
+
+    /// The format Django's `Truncator` uses for truncated text in the
+    /// active language.
+    pub fn truncation(&mut self, py: Python<'_>) -> PyResult<&str> {
+        self.check_language(py)?;
+        if self.truncation.is_none() {
+            let pgettext = PGETTEXT.import(py, "django.utils.translation", "pgettext")?;
+            let truncation = pgettext
+                .call1((
+                    "String to return when truncating text",
+                    "%(truncated_text)s…",
+                ))?
+                .extract()?;
+            self.truncation = Some(truncation);
+        }
+        Ok(self.truncation.as_deref().expect("Set above"))
+    }
+}
+
+/// The names set while rendering, as a stack of frames. A block tag pushes
+/// a frame for its own names and pops it when it ends, so nothing outside
+/// the block is copied or needs restoring.
+#[derive(Debug, Default)]
+pub struct ContextStack {
+    // The names in every frame, the innermost frame last.
+    entries: Vec<(String, Py<PyAny>)>,
+    // Where each pushed frame starts in `entries`.
+    frames: Vec<usize>,
+}
+
+impl ContextStack {
+    /// The value of `key` in the innermost frame that sets it.
+    pub fn get(&self, key: &str) -> Option<&Py<PyAny>> {
+        self.entries
+            .iter()
+            .rev()
+            .find(|(name, _)| name == key)
+            .map(|(_, value)| value)
+    }
+
+    /// Set `key` in the innermost frame, shadowing any outer value.
+    pub fn insert(&mut self, key: &str, value: Py<PyAny>) {
+        let start = self.frames.last().copied().unwrap_or(0);
+        match self.entries[start..]
+            .iter_mut()
+            .find(|(name, _)| name == key)
+        {
+            Some((_, slot)) => *slot = value,
+            None => self.entries.push((key.to_string(), value)),
+        }
+    }
+
+    /// Start a new innermost frame.
+    pub fn push(&mut self) {
+        self.frames.push(self.entries.len());
+    }
+
+    /// Drop the innermost frame and every name set in it.
+    pub fn pop(&mut self) {
+        let start = self.frames.pop().expect("A frame was pushed");
+        self.entries.truncate(start);
+    }
+
+    /// Every name set, outermost first.
+    pub fn iter(&self) -> impl Iterator<Item = (&str, &Py<PyAny>)> {
+        self.entries
+            .iter()
+            .map(|(name, value)| (name.as_str(), value))
+    }
+}
+
+impl FromIterator<(String, Py<PyAny>)> for ContextStack {
+    fn from_iter<I: IntoIterator<Item = (String, Py<PyAny>)>>(iter: I) -> Self {
+        Self {
+            entries: iter.into_iter().collect(),
+            frames: Vec::new(),
+        }
+    }
+}
+
+fn builtin<'py>(py: Python<'py>, key: &str) -> Option<Bound<'py, PyAny>> {
+    match key {
+        "None" => Some(py.None().into_bound(py)),
+        "True" => Some(PyBool::new(py, true).to_owned().into_any()),
+        "False" => Some(PyBool::new(py, false).to_owned().into_any()),
+        _ => None,
+    }
+}
+
+impl Context {
+    /// Find a top-level name. Names set while rendering shadow the caller's
+    /// context, which shadows the builtin `None`, `True` and `False`.
+    ///
+    /// `py_key` is the same name for looking up in the caller's context,
+    /// such as a string interned by the parser.
+    pub fn get<'py, K>(
+        &self,
+        py: Python<'py>,
+        key: &str,
+        py_key: K,
+    ) -> PyResult<Option<Bound<'py, PyAny>>>
+    where
+        K: IntoPyObject<'py>,
+    {
+        if let Some(value) = self.context.get(key) {
+            return Ok(Some(value.bind(py).clone()));
+        }
+        if let Some(dict) = &self.dict {
+            if let Some(value) = dict.bind(py).get_item(py_key)? {
+                return Ok(Some(value));
+            }
+        }
+        Ok(builtin(py, key))
+    }
+
+    /// Every name in the context with the value it resolves to, for error
+    /// messages.
+    pub fn to_map<'py>(&self, py: Python<'py>) -> BTreeMap<String, Bound<'py, PyAny>> {
+        let mut map = BTreeMap::new();
+        for key in ["None", "True", "False"] {
+            let value = builtin(py, key).expect("This is a builtin name");
+            map.insert(key.to_string(), value);
+        }
+        if let Some(dict) = &self.dict {
+            for (key, value) in dict.bind(py) {
+                if let Ok(key) = key.extract::<String>() {
+                    map.insert(key, value);
+                }
+            }
+        }
+        for (key, value) in self.context.iter() {
+            map.insert(key.to_string(), value.bind(py).clone());
+        }
+        map
+    }
 }
 
 #[derive(Debug, IntoPyObject)]
@@ -58,6 +262,77 @@ impl<'t, 'py> ContentString<'t> {
     }
 }
 
+/// Rendered output, kept as pieces until the render ends. Template text is
+/// borrowed rather than copied, and text that needs HTML escaping is only
+/// escaped when the pieces are joined, so joining does all the copying and
+/// escaping in one pass that doesn't need the GIL.
+#[derive(Debug, Default)]
+pub struct Output<'t> {
+    pieces: Vec<Piece<'t>>,
+    // The length of the pieces before escaping.
+    len: usize,
+}
+
+#[derive(Debug)]
+enum Piece<'t> {
+    Text(Cow<'t, str>),
+    Escape(Cow<'t, str>),
+}
+
+// Releasing and reacquiring the GIL costs more than joining short output,
+// so only output at least this long is joined without it.
+const ALLOW_THREADS_LEN: usize = 4 * 1024;
+
+impl<'t> Output<'t> {
+    pub fn push(&mut self, text: impl Into<Cow<'t, str>>) {
+        let text = text.into();
+        if !text.is_empty() {
+            self.len += text.len();
+            self.pieces.push(Piece::Text(text));
+        }
+    }
+
+    pub fn push_content(&mut self, content: ContentString<'t>) {
+        match content {
+            ContentString::HtmlUnsafe(text) => {
+                self.len += text.len();
+                self.pieces.push(Piece::Escape(text));
+            }
+            ContentString::String(text) | ContentString::HtmlSafe(text) => self.push(text),
+        }
+    }
+
+    /// The length of the output so far, before escaping.
+    pub fn len(&self) -> usize {
+        self.len
+    }
+
+    pub fn is_empty(&self) -> bool {
+        self.len == 0
+    }
+
+    /// Join the pieces into one string with at least `capacity` bytes
+    /// reserved, such as the length of the last output.
+    pub fn join(&self, py: Python<'_>, capacity: usize) -> String {
+        let join = || {
+            let mut output = String::with_capacity(capacity.max(self.len));
+            for piece in &self.pieces {
+                match piece {
+                    Piece::Text(text) => output.push_str(text),
+                    Piece::Escape(text) => {
+                        encode_quoted_attribute_to_string(text, &mut output);
+                    }
+                }
+            }
+            output
+        };
+        match self.len < ALLOW_THREADS_LEN {
+            true => join(),
+            false => py.allow_threads(join),
+        }
+    }
+}
+
 fn resolve_python<'t>(value: Bound<'_, PyAny>, context: &Context) -> PyResult<ContentString<'t>> {
     if !context.autoescape {
         return Ok(ContentString::String(
@@ -156,11 +431,42 @@ impl<'t, 'py> Content<'t, 'py> {
                     let string = s
                         .into_pyobject(py)
                         .expect("A string can always be converted to a Python str.");
-                    let safestring = py.import(intern!(py, "django.utils.safestring"))?;
-                    let mark_safe = safestring.getattr(intern!(py, "mark_safe"))?;
+                    let mark_safe = MARK_SAFE.import(py, "django.utils.safestring", "mark_safe")?;
                     mark_safe.call1((string,))?
                 }
             },
         })
     }
 }
+
+#[cfg(test)]
+mod tests {
+    use super::*;
+
+    #[test]
+    fn test_context_stack() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let value = |value: i64| value.into_pyobject(py).unwrap().into_any().unbind();
+            let get = |stack: &ContextStack, key: &str| {
+                stack
+                    .get(key)
+                    .map(|value| value.extract::<i64>(py).unwrap())
+            };
+
+            let mut stack = ContextStack::from_iter([("a".to_string(), value(1))]);
+            stack.push();
+            stack.insert("a", value(2));
+            stack.insert("b", value(3));
+            stack.insert("b", value(4));
+            assert_eq!(get(&stack, "a"), Some(2));
+            assert_eq!(get(&stack, "b"), Some(4));
+            assert_eq!(stack.iter().count(), 3);
+
+            stack.pop();
+            assert_eq!(get(&stack, "a"), Some(1));
+            assert_eq!(get(&stack, "b"), None);
+        })
+    }
+}
@@ -1,21 +1,31 @@
 use pyo3::prelude::*;
 
-#[pymodule]
+#[pymodule(gil_used = false)]
 pub mod django_rusty_templates {
     use std::collections::HashMap;
+    use std::ops::Deref;
     use std::path::PathBuf;
+    use std::sync::Arc;
+    use std::sync::atomic::{AtomicUsize, Ordering};
+    use std::time::Duration;
 
     use encoding_rs::Encoding;
-    use pyo3::exceptions::{PyAttributeError, PyImportError};
+    use pyo3::exceptions::{PyAttributeError, PyImportError, PyValueError};
     use pyo3::import_exception_bound;
     use pyo3::intern;
     use pyo3::prelude::*;
-    use pyo3::types::{PyBool, PyDict, PyString};
+    use pyo3::types::{PyBytes, PyDict, PyList, PyString};
 
-    use crate::loaders::{AppDirsLoader, CachedLoader, FileSystemLoader, Loader};
-    use crate::parse::{Parser, TokenTree};
-    use crate::render::Render;
-    use crate::render::types::Context;
+    use crate::error::PyRenderError;
+    use crate::loaders::{
+        AppDirsLoader, BundleLoader, CacheInfo, CacheLimits, CachedLoader, FileSystemLoader,
+        Loader, find_templates, get_app_template_dirs, write_bundle,
+    };
+    use crate::optimize::optimize;
+    use crate::parse::{For, Parser, Tag, TokenTree};
+    use crate::render::tags::ForItems;
+    use crate::render::types::{Context, ContextStack, Output, Translations};
+    use crate::render::{Evaluate, Render};
     use crate::types::TemplateString;
     use crate::utils::PyResultMethods;
 
@@ -98,7 +108,19 @@ pub mod django_rusty_templates {
         Ok(libs)
     }
 
-    #[pyclass]
+    fn seconds_to_duration(name: &str, seconds: Option<f64>) -> PyResult<Option<Duration>> {
+        match seconds {
+            None => Ok(None),
+            Some(seconds) => match Duration::try_from_secs_f64(seconds) {
+                Ok(duration) => Ok(Some(duration)),
+                Err(_) => Err(PyValueError::new_err(format!(
+                    "{name} must be a non-negative number of seconds."
+                ))),
+            },
+        }
+    }
+
+    #[pyclass(frozen)]
     pub struct Engine {
         dirs: Vec<PathBuf>,
         app_dirs: bool,
@@ -112,6 +134,26 @@ pub mod django_rusty_templates {
     }
 
     impl Engine {
+        /// The directories searched by the filesystem and app directories
+        /// loaders, in the order they search them.
+        fn template_dirs(&self, py: Python<'_>) -> PyResult<Vec<PathBuf>> {
+            let mut dirs = self.dirs.clone();
+            if self.app_dirs {
+                dirs.extend(get_app_template_dirs(py, "templates")?);
+            }
+            Ok(dirs)
+        }
+
+        /// Find `template_name` in the template cache without loading it.
+        fn cached_template(&self, template_name: &str) -> Option<Template> {
+            self.template_loaders
+                .iter()
+                .find_map(|loader| match loader {
+                    Loader::Cached(cached_loader) => cached_loader.cached(template_name),
+                    _ => None,
+                })
+        }
+
         fn find_template_loader<'py>(
             _py: Python<'py>,
             _loader: &str,
@@ -124,7 +166,7 @@ pub mod django_rusty_templates {
     #[pymethods]
     impl Engine {
         #[new]
-        #[pyo3(signature = (dirs=None, app_dirs=false, context_processors=None, debug=false, loaders=None, string_if_invalid="".to_string(), file_charset="utf-8".to_string(), libraries=None, builtins=None, autoescape=true))]
+        #[pyo3(signature = (dirs=None, app_dirs=false, context_processors=None, debug=false, loaders=None, string_if_invalid="".to_string(), file_charset="utf-8".to_string(), libraries=None, builtins=None, autoescape=true, autoreload_interval=None, cache_max_entries=None, cache_max_bytes=None, cache_max_missing=None, cache_missing_ttl=None, bundle=None, template_index=false))]
         #[allow(clippy::too_many_arguments)] // We're matching Django's Engine __init__ signature
         pub fn new(
             _py: Python<'_>,
@@ -138,6 +180,13 @@ pub mod django_rusty_templates {
             libraries: Option<Bound<'_, PyAny>>,
             builtins: Option<Bound<'_, PyAny>>,
             autoescape: bool,
+            autoreload_interval: Option<f64>,
+            cache_max_entries: Option<usize>,
+            cache_max_bytes: Option<usize>,
+            cache_max_missing: Option<usize>,
+            cache_missing_ttl: Option<f64>,
+            bundle: Option<PathBuf>,
+            template_index: bool,
         ) -> PyResult<Self> {
             let dirs = match dirs {
                 Some(dirs) => dirs.extract()?,
@@ -151,6 +200,13 @@ pub mod django_rusty_templates {
                 Some(encoding) => encoding,
                 None => todo!(),
             };
+            let check_interval = seconds_to_duration("autoreload_interval", autoreload_interval)?;
+            let cache_limits = CacheLimits {
+                max_entries: cache_max_entries,
+                max_bytes: cache_max_bytes,
+                max_missing: cache_max_missing,
+                missing_ttl: seconds_to_duration("cache_missing_ttl", cache_missing_ttl)?,
+            };
             let template_loaders = match loaders {
                 Some(_) if app_dirs => {
                     let err = ImproperlyConfigured::new_err(
@@ -160,15 +216,45 @@ pub mod django_rusty_templates {
                 }
                 Some(_loaders) => todo!(),
                 None => {
+                    // The index is only rebuilt by `reset`, so templates
+                    // added later would never be found.
+                    if template_index && check_interval.is_some() {
+                        let err = ImproperlyConfigured::new_err(
+                            "template_index must not be set when autoreload_interval is defined.",
+                        );
+                        return Err(err);
+                    }
+                    let mut loaders = Vec::new();
+                    if let Some(bundle) = bundle {
+                        // Bundled templates are never read from their files,
+                        // so edits to them could never be picked up.
+                        if check_interval.is_some() {
+                            let err = ImproperlyConfigured::new_err(
+                                "bundle must not be set when autoreload_interval is defined.",
+                            );
+                            return Err(err);
+                        }
+                        let bundle_loader = BundleLoader::open(&bundle).map_err(|err| {
+                            ImproperlyConfigured::new_err(format!(
+                                "Could not load template bundle {}: {err}",
+                                bundle.display()
+                            ))
+                        })?;
+                        loaders.push(Loader::Bundle(bundle_loader));
+                    }
                     let filesystem_loader =
-                        Loader::FileSystem(FileSystemLoader::new(dirs.clone(), encoding));
-                    let appdirs_loader = Loader::AppDirs(AppDirsLoader::new(encoding));
-                    let loaders = if app_dirs {
-                        vec![filesystem_loader, appdirs_loader]
-                    } else {
-                        vec![filesystem_loader]
-                    };
-                    let cached_loader = Loader::Cached(CachedLoader::new(loaders));
+                        FileSystemLoader::new(dirs.clone(), encoding).with_index(template_index);
+                    loaders.push(Loader::FileSystem(filesystem_loader));
+                    if app_dirs {
+                        let appdirs_loader =
+                            AppDirsLoader::new(encoding).with_index(template_index);
+                        loaders.push(Loader::AppDirs(appdirs_loader));
+                    }
+                    let cached_loader = Loader::Cached(
+                        CachedLoader::new(loaders)
+                            .with_check_interval(check_interval)
+                            .with_limits(cache_limits),
+                    );
                     vec![cached_loader]
                 }
             };
@@ -194,13 +280,9 @@ pub mod django_rusty_templates {
             })
         }
 
-        pub fn get_template(
-            &mut self,
-            py: Python<'_>,
-            template_name: String,
-        ) -> PyResult<Template> {
+        pub fn get_template(&self, py: Python<'_>, template_name: String) -> PyResult<Template> {
             let mut tried = Vec::new();
-            for loader in &mut self.template_loaders {
+            for loader in &self.template_loaders {
                 match loader.get_template(py, &template_name, &self.data) {
                     Ok(template) => return template,
                     Err(e) => tried.push(e.tried),
@@ -209,6 +291,72 @@ pub mod django_rusty_templates {
             Err(TemplateDoesNotExist::new_err((template_name, tried)))
         }
 
+        /// Like `get_template`, but returns an awaitable. Templates that
+        /// aren't cached yet are loaded on a worker thread, so the event
+        /// loop isn't blocked on reading and parsing them.
+        pub fn aget_template<'py>(
+            slf: &Bound<'py, Self>,
+            template_name: String,
+        ) -> PyResult<Bound<'py, PyAny>> {
+            let py = slf.py();
+            let template = slf.get().cached_template(&template_name);
+            py.import(intern!(py, "django_rusty_templates._async"))?
+                .getattr(intern!(py, "aget_template"))?
+                .call1((slf, template_name, template))
+        }
+
+        /// Clear any cached templates, like Django's `Loader.reset`.
+        pub fn reset(&self) {
+            for loader in &self.template_loaders {
+                loader.reset();
+            }
+        }
+
+        /// Hit, miss and eviction counts for the template cache.
+        pub fn cache_info(&self) -> Option<CacheInfo> {
+            self.template_loaders.iter().find_map(Loader::cache_info)
+        }
+
+        /// Write the source of every template in `dirs` and the app
+        /// directories to a bundle file, which can be passed back as the
+        /// `bundle` option. Returns the number of templates written.
+        pub fn write_bundle(&self, py: Python<'_>, path: PathBuf) -> PyResult<usize> {
+            let templates = find_templates(&self.template_dirs(py)?);
+            Ok(write_bundle(&path, &templates, self.encoding)?)
+        }
+
+        /// Load templates into the cache before they are first used, for
+        /// example before forking workers. With no `names`, every template
+        /// in `dirs` and the app directories is loaded and any that fail
+        /// are skipped. Returns the number of cached templates.
+        #[pyo3(signature = (names=None))]
+        pub fn warm(&self, py: Python<'_>, names: Option<Vec<String>>) -> PyResult<usize> {
+            let paths = find_templates(&self.template_dirs(py)?);
+            let strict = names.is_some();
+            let names = names.unwrap_or_else(|| paths.keys().cloned().collect());
+            let mut warmed = 0;
+            for loader in &self.template_loaders {
+                let Loader::Cached(cached_loader) = loader else {
+                    continue;
+                };
+                let results = cached_loader.warm(py, &names, &paths, self.encoding, &self.data);
+                for (template_name, result) in results {
+                    match result {
+                        Ok(Ok(_)) => warmed += 1,
+                        Ok(Err(err)) if strict => return Err(err),
+                        Err(err) if strict => {
+                            return Err(TemplateDoesNotExist::new_err((
+                                template_name,
+                                vec![err.tried],
+                            )));
+                        }
+                        _ => {}
+                    }
+                }
+            }
+            Ok(warmed)
+        }
+
         #[allow(clippy::wrong_self_convention)] // We're implementing a Django interface
         pub fn from_string(&self, template_code: Bound<'_, PyString>) -> PyResult<Template> {
             Template::new_from_string(template_code.py(), template_code.extract()?, &self.data)
@@ -217,22 +365,70 @@ pub mod django_rusty_templates {
         // TODO render_to_string needs implementation.
     }
 
-    #[derive(Debug, Clone, PartialEq)]
-    #[pyclass]
-    pub struct Template {
+    /// The immutable result of parsing a template.
+    #[derive(Debug)]
+    pub struct CompiledTemplate {
         pub filename: Option<PathBuf>,
         pub template: String,
         pub nodes: Vec<TokenTree>,
         pub autoescape: bool,
+        // The length of the last rendered output, used to size the next
+        // output buffer.
+        pub(crate) render_size: AtomicUsize,
+    }
+
+    impl PartialEq for CompiledTemplate {
+        fn eq(&self, other: &Self) -> bool {
+            self.filename == other.filename
+                && self.template == other.template
+                && self.nodes == other.nodes
+                && self.autoescape == other.autoescape
+        }
+    }
+
+    /// A cheap, reference counted handle to a `CompiledTemplate`.
+    ///
+    /// Cloning a `Template` only bumps a reference count, so loaders can
+    /// share one compiled template between every caller.
+    #[derive(Debug, Clone, PartialEq)]
+    #[pyclass(frozen)]
+    pub struct Template {
+        compiled: Arc<CompiledTemplate>,
+    }
+
+    impl Deref for Template {
+        type Target = CompiledTemplate;
+
+        fn deref(&self) -> &Self::Target {
+            &self.compiled
+        }
     }
 
     impl Template {
+        fn from_compiled(compiled: CompiledTemplate) -> Self {
+            Self {
+                compiled: Arc::new(compiled),
+            }
+        }
+
+        /// Nodes store their spans as `u32`s, so larger templates can't be
+        /// parsed.
+        fn check_size(template: &str) -> PyResult<()> {
+            match u32::try_from(template.len()) {
+                Ok(_) => Ok(()),
+                Err(_) => Err(PyValueError::new_err(
+                    "Templates larger than 4 GiB are not supported.",
+                )),
+            }
+        }
+
         pub fn new(
             py: Python<'_>,
             template: &str,
             filename: PathBuf,
             engine_data: &EngineData,
         ) -> PyResult<Self> {
+            Self::check_size(template)?;
             let mut parser = Parser::new(py, TemplateString(template), &engine_data.libraries);
             let nodes = match parser.parse() {
                 Ok(nodes) => nodes,
@@ -243,12 +439,14 @@ pub mod django_rusty_templates {
                     return Err(TemplateSyntaxError::with_source_code(err.into(), source));
                 }
             };
-            Ok(Self {
+            let nodes = optimize(py, TemplateString(template), nodes, engine_data.autoescape);
+            Ok(Self::from_compiled(CompiledTemplate {
                 template: template.to_string(),
                 filename: Some(filename),
                 nodes,
                 autoescape: engine_data.autoescape,
-            })
+                render_size: AtomicUsize::default(),
+            }))
         }
 
         pub fn new_from_string(
@@ -256,6 +454,7 @@ pub mod django_rusty_templates {
             template: String,
             engine_data: &EngineData,
         ) -> PyResult<Self> {
+            Self::check_size(&template)?;
             let mut parser = Parser::new(py, TemplateString(&template), &engine_data.libraries);
             let nodes = match parser.parse() {
                 Ok(nodes) => nodes,
@@ -264,30 +463,59 @@ pub mod django_rusty_templates {
                     return Err(TemplateSyntaxError::with_source_code(err.into(), template));
                 }
             };
-            Ok(Self {
+            let nodes = optimize(py, TemplateString(&template), nodes, engine_data.autoescape);
+            Ok(Self::from_compiled(CompiledTemplate {
                 template,
                 filename: None,
                 nodes,
                 autoescape: engine_data.autoescape,
-            })
+                render_size: AtomicUsize::default(),
+            }))
         }
 
         fn _render(&self, py: Python<'_>, context: &mut Context) -> PyResult<String> {
-            let mut rendered = String::with_capacity(self.template.len());
+            let mut output = Output::default();
+            self.render_nodes(py, &self.nodes, context, &mut output)?;
+            let rendered = output.join(py, self.render_size.load(Ordering::Relaxed));
+            self.render_size.store(rendered.len(), Ordering::Relaxed);
+            Ok(rendered)
+        }
+
+        fn render_nodes<'t, T: Render>(
+            &'t self,
+            py: Python<'_>,
+            nodes: &'t T,
+            context: &mut Context,
+            output: &mut Output<'t>,
+        ) -> PyResult<()> {
             let template = TemplateString(&self.template);
-            for node in &self.nodes {
-                match node.render(py, template, context) {
-                    Ok(content) => rendered.push_str(&content),
-                    Err(err) => {
-                        let err = err.try_into_render_error()?;
-                        return Err(VariableDoesNotExist::with_source_code(
-                            err.into(),
-                            self.template.clone(),
-                        ));
-                    }
+            nodes
+                .render_to(py, template, context, output)
+                .map_err(|err| self.source_error(err))
+        }
+
+        /// Show where in the template a render error happened.
+        fn source_error(&self, err: PyRenderError) -> PyErr {
+            match err.try_into_render_error() {
+                Ok(err) => {
+                    VariableDoesNotExist::with_source_code(err.into(), self.template.clone())
                 }
+                Err(err) => err,
+            }
+        }
+
+        fn build_context(
+            &self,
+            context: Option<Bound<'_, PyDict>>,
+            request: Option<Bound<'_, PyAny>>,
+        ) -> Context {
+            Context {
+                request: request.map(Bound::unbind),
+                dict: context.map(Bound::unbind),
+                context: ContextStack::default(),
+                autoescape: self.autoescape,
+                translations: Translations::default(),
             }
-            Ok(rendered)
         }
     }
 
@@ -300,29 +528,300 @@ pub mod django_rusty_templates {
             context: Option<Bound<'_, PyDict>>,
             request: Option<Bound<'_, PyAny>>,
         ) -> PyResult<String> {
-            let mut base_context = HashMap::from([
-                ("None".to_string(), py.None()),
-                ("True".to_string(), PyBool::new(py, true).to_owned().into()),
+            let mut context = self.build_context(context, request);
+            self._render(py, &mut context)
+        }
+
+        /// Like `render`, but returns an awaitable for async views.
+        /// Awaitable context values are awaited and async generators are
+        /// collected before rendering on a worker thread. QuerySets stay
+        /// lazy and are evaluated there.
+        #[pyo3(signature = (context=None, request=None))]
+        pub fn arender<'py>(
+            slf: &Bound<'py, Self>,
+            context: Option<Bound<'py, PyDict>>,
+            request: Option<Bound<'py, PyAny>>,
+        ) -> PyResult<Bound<'py, PyAny>> {
+            let py = slf.py();
+            py.import(intern!(py, "django_rusty_templates._async"))?
+                .getattr(intern!(py, "arender"))?
+                .call1((slf, context, request))
+        }
+
+        /// Render the template straight to UTF-8 encoded `bytes`, skipping
+        /// the intermediate `str` that `HttpResponse` would encode again.
+        ///
+        /// This is opt-in only. Django's backend contract is that `render`
+        /// returns a `str`, so `render_to_string`, `TemplateResponse` and
+        /// the `render` shortcut still build a `str` and encode it. Views
+        /// that want the saving call this directly, as in
+        /// `HttpResponse(template.render_bytes(context, request))`.
+        #[pyo3(signature = (context=None, request=None))]
+        pub fn render_bytes<'py>(
+            &self,
+            py: Python<'py>,
+            context: Option<Bound<'py, PyDict>>,
+            request: Option<Bound<'py, PyAny>>,
+        ) -> PyResult<Bound<'py, PyBytes>> {
+            let rendered = self.render(py, context, request)?;
+            Ok(PyBytes::new(py, rendered.as_bytes()))
+        }
+
+        /// Render the template once for each dict in `contexts`. Returns a
+        /// list of the outputs, or a single string with the outputs joined
+        /// by `separator` if one is given.
+        #[pyo3(signature = (contexts, request=None, separator=None))]
+        pub fn render_many(
+            &self,
+            py: Python<'_>,
+            contexts: Bound<'_, PyAny>,
+            request: Option<Bound<'_, PyAny>>,
+            separator: Option<&str>,
+        ) -> PyResult<Py<PyAny>> {
+            let request = request.map(Bound::unbind);
+            let mut contexts = contexts.try_iter()?.map(|context| -> PyResult<Context> {
+                Ok(Context {
+                    request: request.as_ref().map(|request| request.clone_ref(py)),
+                    dict: Some(context?.downcast_into::<PyDict>()?.unbind()),
+                    context: ContextStack::default(),
+                    autoescape: self.autoescape,
+                    translations: Translations::default(),
+                })
+            });
+
+            let Some(separator) = separator else {
+                let rendered = PyList::empty(py);
+                for context in contexts {
+                    rendered.append(self._render(py, &mut context?)?)?;
+                }
+                return Ok(rendered.into_any().unbind());
+            };
+
+            let mut output = Output::default();
+            if let Some(context) = contexts.next() {
+                self.render_nodes(py, &self.nodes, &mut context?, &mut output)?;
+            }
+            for context in contexts {
+                output.push(separator);
+                self.render_nodes(py, &self.nodes, &mut context?, &mut output)?;
+            }
+            let rendered = output.join(py, 0);
+            Ok(rendered.into_pyobject(py)?.into_any().unbind())
+        }
+
+        /// Render the template incrementally, returning an iterator of
+        /// strings suitable for Django's `StreamingHttpResponse`.
+        #[pyo3(signature = (context=None, request=None, chunk_size=8192))]
+        pub fn stream(
+            &self,
+            py: Python<'_>,
+            context: Option<Bound<'_, PyDict>>,
+            request: Option<Bound<'_, PyAny>>,
+            chunk_size: usize,
+        ) -> PyResult<TemplateStream> {
+            if chunk_size == 0 {
+                return Err(PyValueError::new_err(
+                    "chunk_size must be a positive integer.",
+                ));
+            }
+            Ok(TemplateStream {
+                context: self.build_context(context, request),
+                template: self.clone(),
+                position: 0,
+                blocks: Vec::new(),
+                chunk_size,
+            })
+        }
+    }
+
+    /// An iterator over the output of a template, returning a chunk once at
+    /// least `chunk_size` bytes are ready. Block tags are rendered a node at
+    /// a time, so a chunk can end inside a loop or an `{% if %}`.
+    #[pyclass]
+    pub struct TemplateStream {
+        template: Template,
+        context: Context,
+        // The next top-level node.
+        position: usize,
+        // The block tags being rendered, outermost first.
+        blocks: Vec<Block>,
+        chunk_size: usize,
+    }
+
+    /// A block tag part way through its body. The tag is the node before
+    /// the position in the enclosing node list.
+    struct Block {
+        body: Body,
+        // The next node in the body.
+        position: usize,
+    }
+
+    enum Body {
+        // `{% autoescape %}`, with the setting to restore at its end.
+        Autoescape(bool),
+        If(bool),
+        For(ForItems),
+        ForEmpty,
+    }
+
+    impl Block {
+        fn nodes<'t>(&self, tag: &'t TokenTree) -> &'t [TokenTree] {
+            let TokenTree::Tag(tag) = tag else {
+                unreachable!("Blocks are only started by tags")
+            };
+            match (tag.as_ref(), &self.body) {
+                (Tag::Autoescape { nodes, .. }, Body::Autoescape(_)) => nodes,
+                (Tag::If { truthy, .. }, Body::If(true)) => truthy,
                 (
-                    "False".to_string(),
-                    PyBool::new(py, false).to_owned().into(),
-                ),
-            ]);
-            let context = match context {
-                Some(context) => {
-                    let new_context: HashMap<_, _> = context.extract()?;
-                    base_context.extend(new_context.into_iter());
-                    base_context
+                    Tag::If {
+                        falsey: Some(falsey),
+                        ..
+                    },
+                    Body::If(false),
+                ) => falsey,
+                (Tag::For(for_tag), Body::For(_)) => &for_tag.nodes,
+                (
+                    Tag::For(For {
+                        empty: Some(empty), ..
+                    }),
+                    Body::ForEmpty,
+                ) => empty,
+                _ => unreachable!("A block's body matches its tag"),
+            }
+        }
+    }
+
+    /// The node list `blocks` are rendering and the tag whose body it is,
+    /// starting from the template's `nodes`.
+    fn current_body<'t>(
+        nodes: &'t [TokenTree],
+        position: usize,
+        blocks: &[Block],
+    ) -> (&'t [TokenTree], Option<&'t TokenTree>) {
+        let mut nodes = nodes;
+        let mut position = position;
+        let mut tag = None;
+        for block in blocks {
+            let node = &nodes[position - 1];
+            nodes = block.nodes(node);
+            position = block.position;
+            tag = Some(node);
+        }
+        (nodes, tag)
+    }
+
+    impl TemplateStream {
+        /// Render the next node, or start or finish a block. Returns
+        /// `false` once the whole template has been rendered.
+        fn step<'t>(
+            py: Python<'_>,
+            template: &'t Template,
+            context: &mut Context,
+            position: &mut usize,
+            blocks: &mut Vec<Block>,
+            chunk: &mut Output<'t>,
+        ) -> Result<bool, PyRenderError> {
+            let (nodes, tag) = current_body(&template.nodes, *position, blocks);
+            let next = match blocks.last_mut() {
+                Some(block) => &mut block.position,
+                None => position,
+            };
+            let Some(node) = nodes.get(*next) else {
+                let Some(mut block) = blocks.pop() else {
+                    return Ok(false);
+                };
+                match &mut block.body {
+                    Body::Autoescape(autoescape) => context.autoescape = *autoescape,
+                    Body::For(items) => {
+                        let Some(TokenTree::Tag(tag)) = tag else {
+                            unreachable!("Blocks are only started by tags")
+                        };
+                        let Tag::For(for_tag) = tag.as_ref() else {
+                            unreachable!("A block's body matches its tag")
+                        };
+                        if for_tag.next_item(py, context, items)? {
+                            block.position = 0;
+                            blocks.push(block);
+                        } else {
+                            context.context.pop();
+                        }
+                    }
+                    Body::If(_) | Body::ForEmpty => {}
                 }
-                None => base_context,
+                return Ok(true);
             };
-            let request = request.map(|request| request.unbind());
-            let mut context = Context {
-                request,
-                context,
-                autoescape: self.autoescape,
+            *next += 1;
+            let template_string = TemplateString(&template.template);
+            let body = match node {
+                TokenTree::Tag(tag) => match tag.as_ref() {
+                    Tag::Autoescape { enabled, .. } => {
+                        let autoescape = context.autoescape;
+                        context.autoescape = enabled.into();
+                        Some(Body::Autoescape(autoescape))
+                    }
+                    Tag::If {
+                        condition, falsey, ..
+                    } => {
+                        let truthy = condition
+                            .evaluate(py, template_string, context)
+                            .unwrap_or(false);
+                        (truthy || falsey.is_some()).then_some(Body::If(truthy))
+                    }
+                    Tag::For(for_tag) => match for_tag.start(py, template_string, context)? {
+                        Some(mut items) => match for_tag.next_item(py, context, &mut items)? {
+                            true => Some(Body::For(items)),
+                            false => {
+                                context.context.pop();
+                                None
+                            }
+                        },
+                        None => for_tag.empty.is_some().then_some(Body::ForEmpty),
+                    },
+                    _ => {
+                        node.render_to(py, template_string, context, chunk)?;
+                        None
+                    }
+                },
+                _ => {
+                    node.render_to(py, template_string, context, chunk)?;
+                    None
+                }
             };
-            self._render(py, &mut context)
+            if let Some(body) = body {
+                blocks.push(Block { body, position: 0 });
+            }
+            Ok(true)
+        }
+    }
+
+    #[pymethods]
+    impl TemplateStream {
+        fn __iter__(slf: PyRef<'_, Self>) -> PyRef<'_, Self> {
+            slf
+        }
+
+        fn __next__(&mut self, py: Python<'_>) -> PyResult<Option<String>> {
+            let Self {
+                template,
+                context,
+                position,
+                blocks,
+                chunk_size,
+            } = self;
+            let mut chunk = Output::default();
+            while chunk.len() < *chunk_size {
+                match Self::step(py, template, context, position, blocks, &mut chunk) {
+                    Ok(true) => {}
+                    Ok(false) => break,
+                    Err(err) => {
+                        // Stop the stream after an error.
+                        *position = template.nodes.len();
+                        blocks.clear();
+                        return Err(template.source_error(err));
+                    }
+                }
+            }
+            Ok((!chunk.is_empty()).then(|| chunk.join(py, *chunk_size)))
         }
     }
 }
@@ -331,6 +830,8 @@ pub mod django_rusty_templates {
 mod tests {
     use super::django_rusty_templates::*;
 
+    use std::sync::atomic::Ordering;
+
     use pyo3::Python;
     use pyo3::types::{PyDict, PyDictMethods, PyString};
 
@@ -404,6 +905,95 @@ mod tests {
         })
     }
 
+    #[test]
+    fn test_render_remembers_size() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let template_string =
+                "{% if user %}{% if user %}Hello {{ user }}!{% endif %}{% endif %}".to_string();
+            let template = Template::new_from_string(py, template_string, &engine).unwrap();
+            assert_eq!(template.render_size.load(Ordering::Relaxed), 0);
+
+            let context = PyDict::new(py);
+            context.set_item("user", "Lily").unwrap();
+            let rendered = template.render(py, Some(context.clone()), None).unwrap();
+            assert_eq!(rendered, "Hello Lily!");
+            assert_eq!(template.render_size.load(Ordering::Relaxed), rendered.len());
+
+            let rendered = template.render(py, Some(context), None).unwrap();
+            assert_eq!(rendered, "Hello Lily!");
+        })
+    }
+
+    #[test]
+    fn test_render_long_text() {
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let text = "<p>Lorem ipsum</p>".repeat(4096);
+            let template_string = format!("{text}{{# comment #}}{text}{{{{ user }}}}{text}");
+            let template = Template::new_from_string(py, template_string, &engine).unwrap();
+            let context = PyDict::new(py);
+            context.set_item("user", "Lily").unwrap();
+
+            let rendered = template.render(py, Some(context), None).unwrap();
+            assert_eq!(rendered, format!("{text}{text}Lily{text}"));
+        })
+    }
+
+    #[test]
+    fn test_render_joins_output_without_the_gil() {
+        use std::sync::Arc;
+        use std::sync::atomic::AtomicBool;
+
+        pyo3::prepare_freethreaded_python();
+
+        Python::with_gil(|py| {
+            let engine = EngineData::empty();
+            let text = "<p>Lorem ipsum</p>".repeat(1 << 19);
+            let template_string = format!("{text}{{# comment #}}{{{{ user }}}}");
+            let template = Template::new_from_string(py, template_string, &engine).unwrap();
+            let context = PyDict::new(py);
+            context.set_item("user", "<b>Lily</b>").unwrap();
+
+            // While this thread holds the GIL, the other thread can only
+            // take it if the render releases it.
+            let started = Arc::new(AtomicBool::new(false));
+            let rendering = Arc::new(AtomicBool::new(true));
+            let overlapped = Arc::new(AtomicBool::new(false));
+            let other = {
+                let started = started.clone();
+                let rendering = rendering.clone();
+                let overlapped = overlapped.clone();
+                std::thread::spawn(move || {
+                    while rendering.load(Ordering::SeqCst) {
+                        Python::with_gil(|_| {
+                            if rendering.load(Ordering::SeqCst) && started.load(Ordering::SeqCst) {
+                                overlapped.store(true, Ordering::SeqCst);
+                            }
+                        });
+                        started.store(true, Ordering::SeqCst);
+                    }
+                })
+            };
+            py.allow_threads(|| {
+                while !started.load(Ordering::SeqCst) {
+                    std::thread::yield_now();
+                }
+            });
+
+            let rendered = template.render(py, Some(context), None).unwrap();
+            rendering.store(false, Ordering::SeqCst);
+            py.allow_threads(|| other.join().unwrap());
+
+            assert_eq!(rendered, format!("{text}&lt;b&gt;Lily&lt;/b&gt;"));
+            assert!(overlapped.load(Ordering::SeqCst));
+        })
+    }
+
     #[test]
     fn test_render_template_variable() {
         pyo3::prepare_freethreaded_python();
@@ -485,6 +1075,13 @@ user = User(["Lily"])
                 None,
                 None,
                 false,
+                None,
+                None,
+                None,
+                None,
+                None,
+                None,
+                false,
             )
             .unwrap();
             let template_string = PyString::new(py, "Hello {{ user }}!");
@@ -509,7 +1106,7 @@ user = User(["Lily"])
             let sys_path = py.import("sys").unwrap().getattr("path").unwrap();
             let sys_path = sys_path.downcast().unwrap();
             sys_path.append(cwd).unwrap();
-            let mut engine = Engine::new(
+            let engine = Engine::new(
                 py,
                 Some(vec!["tests/templates"].into_pyobject(py).unwrap()),
                 false,
@@ -526,6 +1123,13 @@ user = User(["Lily"])
                 ),
                 None,
                 false,
+                None,
+                None,
+                None,
+                None,
+                None,
+                None,
+                false,
             )
             .unwrap();
             let template = engine
@@ -1,15 +1,48 @@
+use std::sync::{Arc, OnceLock};
+
 use num_bigint::BigInt;
+use pyo3::intern;
+use pyo3::prelude::*;
+use pyo3::types::{PyString, PyType};
 
 #[derive(Clone, Copy)]
 pub struct TemplateString<'t>(pub &'t str);
 
 impl<'t> TemplateString<'t> {
-    pub fn content(&self, at: (usize, usize)) -> &'t str {
-        let (start, len) = at;
+    pub fn content(&self, at: impl Span) -> &'t str {
+        let (start, len) = at.widen();
         &self.0[start..start + len]
     }
 }
 
+/// The start and length of a node in the template source, as stored in
+/// the text and variable nodes that make up most of a template. `u32`s
+/// halve the size of these spans; templates are limited to 4 GiB.
+pub type NodeAt = (u32, u32);
+
+/// A start and length in the template source.
+pub trait Span: Copy {
+    fn widen(self) -> (usize, usize);
+}
+
+impl Span for (usize, usize) {
+    fn widen(self) -> (usize, usize) {
+        self
+    }
+}
+
+impl Span for NodeAt {
+    fn widen(self) -> (usize, usize) {
+        (self.0 as usize, self.1 as usize)
+    }
+}
+
+/// Narrow a span from the lexer to store it in a node.
+pub fn narrow(at: (usize, usize)) -> NodeAt {
+    let narrow = |n: usize| u32::try_from(n).expect("Templates are smaller than 4 GiB");
+    (narrow(at.0), narrow(at.1))
+}
+
 impl<'t> From<&'t str> for TemplateString<'t> {
     fn from(value: &'t str) -> Self {
         TemplateString(value)
@@ -48,41 +81,138 @@ impl<'t> Iterator for PartsIterator<'t> {
 
 #[derive(Clone, Copy, Debug, PartialEq, Eq)]
 pub struct Text {
-    pub at: (usize, usize),
+    pub at: NodeAt,
 }
 
 impl Text {
     pub fn new(at: (usize, usize)) -> Self {
-        Self { at }
+        Self { at: narrow(at) }
     }
 }
 
 #[derive(Clone, Copy, Debug, PartialEq, Eq)]
 pub struct TranslatedText {
-    pub at: (usize, usize),
+    pub at: NodeAt,
 }
 
 impl TranslatedText {
     pub fn new(at: (usize, usize)) -> Self {
-        Self { at }
+        Self { at: narrow(at) }
     }
 }
 
-#[derive(Clone, Copy, Debug, PartialEq, Eq)]
+/// One part of a dotted variable name, prepared for lookups.
+#[derive(Debug)]
+pub struct LookupKey {
+    pub at: NodeAt,
+    /// The part as an interned Python string.
+    pub name: Py<PyString>,
+    /// The part as a list index, if it is one.
+    pub index: Option<usize>,
+    // Types seen here that have no `__getitem__`, so `variable[part]` can
+    // be skipped without raising and discarding a `TypeError`. Each slot
+    // is set at most once, so checking them never takes a lock.
+    unsubscriptable: [OnceLock<Py<PyType>>; UNSUBSCRIPTABLE_CACHE_SIZE],
+}
+
+// How many types a lookup key remembers, like a polymorphic inline cache.
+const UNSUBSCRIPTABLE_CACHE_SIZE: usize = 4;
+
+impl LookupKey {
+    fn new(py: Python<'_>, part: &str, at: (usize, usize)) -> Self {
+        Self {
+            at: narrow(at),
+            name: PyString::intern(py, part).unbind(),
+            index: part.parse().ok(),
+            unsubscriptable: Default::default(),
+        }
+    }
+
+    /// Whether `variable[part]` is already known to fail.
+    pub fn is_unsubscriptable(&self, variable: &Bound<'_, PyAny>) -> bool {
+        let py_type = variable.get_type();
+        self.unsubscriptable
+            .iter()
+            .map_while(OnceLock::get)
+            .any(|known| known.is(&py_type))
+    }
+
+    /// Remember that `variable[part]` failed if it will always fail for
+    /// objects of the same type.
+    pub fn failed_subscript(&self, variable: &Bound<'_, PyAny>) {
+        // Classes can be subscriptable through `__class_getitem__`.
+        if variable.is_instance_of::<PyType>() {
+            return;
+        }
+        let py = variable.py();
+        let py_type = variable.get_type();
+        if py_type.hasattr(intern!(py, "__getitem__")).unwrap_or(true) {
+            return;
+        }
+        for slot in &self.unsubscriptable {
+            match slot.get() {
+                Some(known) if known.is(&py_type) => return,
+                Some(_) => continue,
+                // If another thread fills this slot first, one type is
+                // forgotten, which only costs a failed subscript later.
+                None => {
+                    let _ = slot.set(py_type.unbind());
+                    return;
+                }
+            }
+        }
+    }
+}
+
+#[derive(Clone, Debug)]
 pub struct Variable {
-    pub at: (usize, usize),
+    pub at: NodeAt,
+    // Shared by clones of the variable, because cloning a `Py` needs the
+    // GIL.
+    keys: Arc<[LookupKey]>,
 }
 
+impl PartialEq for LookupKey {
+    fn eq(&self, other: &Self) -> bool {
+        // Names are interned, so equal names are the same Python string.
+        self.at == other.at && self.name.is(&other.name) && self.index == other.index
+    }
+}
+
+impl PartialEq for Variable {
+    fn eq(&self, other: &Self) -> bool {
+        self.at == other.at && self.keys == other.keys
+    }
+}
+
+impl Eq for Variable {}
+
 impl<'t> Variable {
-    pub fn new(at: (usize, usize)) -> Self {
-        Self { at }
+    pub fn new(py: Python<'_>, template: TemplateString<'t>, at: (usize, usize)) -> Self {
+        let parts = PartsIterator {
+            variable: template.content(at),
+            start: at.0,
+        };
+        Self {
+            at: narrow(at),
+            keys: parts
+                .map(|(part, at)| LookupKey::new(py, part, at))
+                .collect(),
+        }
+    }
+
+    /// The lookup keys for each part of the variable's name, built when
+    /// parsing so rendering doesn't split the name or create Python
+    /// strings.
+    pub fn keys(&self) -> &[LookupKey] {
+        &self.keys
     }
 
     pub fn parts(
         &self,
         template: TemplateString<'t>,
     ) -> impl Iterator<Item = (&'t str, (usize, usize))> {
-        let start = self.at.0;
+        let start = self.at.0 as usize;
         let variable = template.content(self.at);
         PartsIterator { variable, start }
     }
@@ -0,0 +1,22 @@
+from datetime import date, datetime
+
+
+def test_date(assert_render):
+    assert_render('{{ d|date:"Y-m-d" }}', {"d": date(2025, 1, 2)}, "2025-01-02")
+
+
+def test_date_default_format(assert_render):
+    assert_render("{{ d|date }}", {"d": date(2025, 1, 2)}, "Jan. 2, 2025")
+
+
+def test_date_datetime(assert_render):
+    context = {"d": datetime(2025, 1, 2, 15, 4)}
+    assert_render('{{ d|date:"H:i" }}', context, "15:04")
+
+
+def test_date_invalid(assert_render):
+    assert_render('{{ d|date:"Y" }}', {"d": "not a date"}, "")
+
+
+def test_date_missing(assert_render):
+    assert_render('{{ d|date:"Y" }}', {}, "")
@@ -0,0 +1,14 @@
+def test_default_if_none(assert_render):
+    assert_render("{{ a|default_if_none:'x' }}", {"a": None}, "x")
+
+
+def test_default_if_none_empty(assert_render):
+    assert_render("{{ a|default_if_none:'x' }}", {"a": ""}, "")
+
+
+def test_default_if_none_zero(assert_render):
+    assert_render("{{ a|default_if_none:'x' }}", {"a": 0}, "0")
+
+
+def test_default_if_none_missing(assert_render):
+    assert_render("{{ a|default_if_none:'x' }}", {}, "")
@@ -1,6 +1,9 @@
+from datetime import datetime, timezone
+
 import pytest
 from django.template import engines
 from django.template.base import VariableDoesNotExist
+from django.utils.safestring import mark_safe
 
 
 def test_load_and_render_filters():
@@ -103,3 +106,37 @@ def test_filter_error_with_argument():
 
     with pytest.raises(ZeroDivisionError):
         rust_template.render({"num": 1})
+
+
+def test_filter_is_safe(assert_render):
+    template = (
+        "{% load brackets from custom_filters %}{{ a|brackets }} {{ b|brackets }}"
+    )
+    context = {"a": "a", "b": mark_safe("b")}
+
+    assert_render(template, context, "&lt;a&gt; <b>")
+
+
+def test_filter_needs_autoescape(assert_render):
+    template = "{% load bold from custom_filters %}{{ a|bold }} {{ '<i>'|bold }}"
+    context = {"a": "<i>"}
+
+    assert_render(template, context, "<b>&lt;i&gt;</b> <b><i></b>")
+
+
+def test_filter_needs_autoescape_off(assert_render):
+    template = (
+        "{% load bold from custom_filters %}"
+        "{% autoescape off %}{{ a|bold }}{% endautoescape %}"
+    )
+    context = {"a": "<i>"}
+
+    assert_render(template, context, "<b><i></b>")
+
+
+def test_filter_expects_localtime(assert_render):
+    template = "{% load hour from custom_filters %}{{ a|hour }}"
+    # The default TIME_ZONE is America/Chicago, six hours behind UTC in January.
+    context = {"a": datetime(2025, 1, 1, 12, tzinfo=timezone.utc)}
+
+    assert_render(template, context, "6")
@@ -0,0 +1,21 @@
+from django.utils.safestring import mark_safe
+
+
+def test_first(assert_render):
+    assert_render("{{ a|first }}", {"a": ["<x>", "b"]}, "&lt;x&gt;")
+
+
+def test_first_safe(assert_render):
+    assert_render("{{ a|first }}", {"a": [mark_safe("<x>")]}, "<x>")
+
+
+def test_first_empty(assert_render):
+    assert_render("{{ a|first }}", {"a": []}, "")
+
+
+def test_first_string(assert_render):
+    assert_render("{{ a|first }}", {"a": "abc"}, "a")
+
+
+def test_first_missing(assert_render):
+    assert_render("{{ a|first }}", {}, "")
@@ -0,0 +1,25 @@
+from decimal import Decimal
+
+
+def test_floatformat(assert_render):
+    assert_render("{{ x|floatformat }}", {"x": 34.23234}, "34.2")
+
+
+def test_floatformat_integer(assert_render):
+    assert_render("{{ x|floatformat }}", {"x": 34.0}, "34")
+
+
+def test_floatformat_argument(assert_render):
+    assert_render("{{ x|floatformat:3 }}", {"x": 34.23234}, "34.232")
+
+
+def test_floatformat_negative_argument(assert_render):
+    assert_render("{{ x|floatformat:-3 }}", {"x": 34.0}, "34")
+
+
+def test_floatformat_decimal(assert_render):
+    assert_render("{{ x|floatformat:2 }}", {"x": Decimal("1.005")}, "1.01")
+
+
+def test_floatformat_invalid(assert_render):
+    assert_render("{{ x|floatformat }}", {"x": "<x>"}, "")
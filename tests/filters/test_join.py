@@ -0,0 +1,41 @@
+from django.utils.safestring import mark_safe
+
+
+def test_join(assert_render):
+    template = "{{ a|join:', ' }}"
+    context = {"a": ["alpha", "beta & me"]}
+
+    assert_render(template, context, "alpha, beta &amp; me")
+
+
+def test_join_safe_items(assert_render):
+    template = "{{ a|join:', ' }}"
+    context = {"a": [mark_safe("<b>"), "<i>"]}
+
+    assert_render(template, context, "<b>, &lt;i&gt;")
+
+
+def test_join_autoescape_off(assert_render):
+    template = "{% autoescape off %}{{ a|join:', ' }}{% endautoescape %}"
+    context = {"a": ["<a>", "b"]}
+
+    assert_render(template, context, "<a>, b")
+
+
+def test_join_variable_separator(assert_render):
+    template = "{{ a|join:var }}"
+    context = {"a": ["a", "b"], "var": "<br>"}
+
+    assert_render(template, context, "a&lt;br&gt;b")
+
+
+def test_join_string(assert_render):
+    assert_render("{{ a|join:'-' }}", {"a": "abc"}, "a-b-c")
+
+
+def test_join_not_iterable(assert_render):
+    assert_render("{{ a|join:',' }}", {"a": 5}, "5")
+
+
+def test_join_missing(assert_render):
+    assert_render("{{ a|join:',' }}", {}, "")
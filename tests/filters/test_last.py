@@ -0,0 +1,33 @@
+from django.utils.safestring import mark_safe
+
+
+def test_last(assert_render):
+    assert_render("{{ a|last }}", {"a": ["a", "<x>"]}, "&lt;x&gt;")
+
+
+def test_last_safe(assert_render):
+    assert_render("{{ a|last }}", {"a": [mark_safe("<x>")]}, "<x>")
+
+
+def test_last_empty(assert_render):
+    assert_render("{{ a|last }}", {"a": []}, "")
+
+
+def test_last_string(assert_render):
+    assert_render("{{ a|last }}", {"a": "abc"}, "c")
+
+
+def test_last_missing(assert_render):
+    assert_render("{{ a|last }}", {}, "")
+
+
+def test_last_string_unsafe(assert_render):
+    assert_render("{{ a|last }}", {"a": "a<"}, "&lt;")
+
+
+def test_last_safe_string(assert_render):
+    assert_render("{{ a|last }}", {"a": mark_safe("a<")}, "<")
+
+
+def test_last_safe_filter(assert_render):
+    assert_render("{{ a|safe|last }}", {"a": "a<"}, "<")
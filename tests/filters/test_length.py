@@ -0,0 +1,18 @@
+def test_length_list(assert_render):
+    assert_render("{{ a|length }}", {"a": [1, 2, 3]}, "3")
+
+
+def test_length_string(assert_render):
+    assert_render("{{ a|length }}", {"a": "héllo"}, "5")
+
+
+def test_length_literal(assert_render):
+    assert_render("{{ 'abcd'|length }}", {}, "4")
+
+
+def test_length_missing(assert_render):
+    assert_render("{{ a|length }}", {}, "0")
+
+
+def test_length_integer(assert_render):
+    assert_render("{{ a|length }}", {"a": 5}, "0")
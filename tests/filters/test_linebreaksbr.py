@@ -0,0 +1,29 @@
+from django.utils.safestring import mark_safe
+
+
+def test_linebreaksbr(assert_render):
+    template = "{{ a|linebreaksbr }}"
+    context = {"a": "line 1\nline 2"}
+
+    assert_render(template, context, "line 1<br>line 2")
+
+
+def test_linebreaksbr_escaped(assert_render):
+    template = "{{ a|linebreaksbr }}"
+    context = {"a": "<a>\r\nb"}
+
+    assert_render(template, context, "&lt;a&gt;<br>b")
+
+
+def test_linebreaksbr_safe(assert_render):
+    template = "{{ a|linebreaksbr }}"
+    context = {"a": mark_safe("<a>\nb")}
+
+    assert_render(template, context, "<a><br>b")
+
+
+def test_linebreaksbr_autoescape_off(assert_render):
+    template = "{% autoescape off %}{{ a|linebreaksbr }}{% endautoescape %}"
+    context = {"a": "<a>\rb"}
+
+    assert_render(template, context, "<a><br>b")
@@ -0,0 +1,9 @@
+def test_striptags(assert_render):
+    template = "{{ a|striptags }}"
+    context = {"a": "some <b>html</b> & text"}
+
+    assert_render(template, context, "some html &amp; text")
+
+
+def test_striptags_no_tags(assert_render):
+    assert_render("{{ a|striptags }}", {"a": "a < b"}, "a &lt; b")
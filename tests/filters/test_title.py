@@ -0,0 +1,18 @@
+def test_title(assert_render):
+    assert_render("{{ a|title }}", {"a": "my FIRST post"}, "My First Post")
+
+
+def test_title_apostrophe(assert_render):
+    assert_render("{{ a|title }}", {"a": "they're here"}, "They&#x27;re Here")
+
+
+def test_title_digit(assert_render):
+    assert_render("{{ a|title }}", {"a": "1st place"}, "1st Place")
+
+
+def test_title_digraph(assert_render):
+    assert_render("{{ a|title }}", {"a": "ǆemal ǉubljana"}, "ǅemal ǈubljana")
+
+
+def test_title_non_ascii_apostrophe(assert_render):
+    assert_render("{{ a|title }}", {"a": "élan's ÉTÉ"}, "Élan&#x27;s Été")
@@ -0,0 +1,31 @@
+def test_truncatechars(assert_render):
+    template = "{{ a|truncatechars:7 }}"
+    context = {"a": "Testing, testing"}
+
+    assert_render(template, context, "Testin…")
+
+
+def test_truncatechars_short(assert_render):
+    assert_render("{{ a|truncatechars:7 }}", {"a": "Test"}, "Test")
+
+
+def test_truncatechars_escaped(assert_render):
+    template = "{{ a|truncatechars:4 }}"
+    context = {"a": "<b>bold</b>"}
+
+    assert_render(template, context, "&lt;b&gt;…")
+
+
+def test_truncatechars_zero(assert_render):
+    assert_render("{{ a|truncatechars:0 }}", {"a": "Test"}, "")
+
+
+def test_truncatechars_invalid_length(assert_render):
+    assert_render("{{ a|truncatechars:'x' }}", {"a": "Test"}, "Test")
+
+
+def test_truncatechars_in_loop(assert_render):
+    template = "{% for a in items %}{{ a|truncatechars:4 }};{% endfor %}"
+    context = {"items": ["Testing", "Tests", "Test"]}
+
+    assert_render(template, context, "Tes…;Tes…;Test;")
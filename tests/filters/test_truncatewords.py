@@ -0,0 +1,20 @@
+def test_truncatewords(assert_render):
+    template = "{{ a|truncatewords:2 }}"
+    context = {"a": "A sentence with a few words in it"}
+
+    assert_render(template, context, "A sentence …")
+
+
+def test_truncatewords_short(assert_render):
+    template = "{{ a|truncatewords:10 }}"
+    context = {"a": "A  sentence\nwith words"}
+
+    assert_render(template, context, "A sentence with words")
+
+
+def test_truncatewords_zero(assert_render):
+    assert_render("{{ a|truncatewords:0 }}", {"a": "Test"}, "")
+
+
+def test_truncatewords_invalid_length(assert_render):
+    assert_render("{{ a|truncatewords:'x' }}", {"a": "A  b"}, "A  b")
@@ -0,0 +1,17 @@
+def test_urlencode(assert_render):
+    template = "{{ a|urlencode }}"
+    context = {"a": '/test&"/me?/'}
+
+    assert_render(template, context, "/test%26%22/me%3F/")
+
+
+def test_urlencode_safe(assert_render):
+    assert_render("{{ a|urlencode:'' }}", {"a": "/test"}, "%2Ftest")
+
+
+def test_urlencode_unicode(assert_render):
+    assert_render("{{ a|urlencode }}", {"a": "é"}, "%C3%A9")
+
+
+def test_urlencode_integer(assert_render):
+    assert_render("{{ a|urlencode }}", {"a": 1}, "1")
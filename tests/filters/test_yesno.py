@@ -0,0 +1,21 @@
+def test_yesno(assert_render):
+    template = "{{ a|yesno }} {{ b|yesno }} {{ c|yesno }}"
+    context = {"a": True, "b": False, "c": None}
+
+    assert_render(template, context, "yes no maybe")
+
+
+def test_yesno_two_choices(assert_render):
+    assert_render("{{ a|yesno:'on,off' }}", {"a": None}, "off")
+
+
+def test_yesno_invalid_choices(assert_render):
+    assert_render("{{ a|yesno:'on' }}", {"a": True}, "True")
+
+
+def test_yesno_escaped(assert_render):
+    assert_render("{{ a|yesno:'<y>,n' }}", {"a": 1}, "&lt;y&gt;")
+
+
+def test_yesno_missing(assert_render):
+    assert_render("{{ a|yesno:'a,b,c' }}", {}, "b")
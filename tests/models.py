@@ -0,0 +1,8 @@
+from django.db import models
+
+
+class Person(models.Model):
+    name = models.CharField(max_length=100)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,118 @@
+import pytest
+
+
+def test_for(assert_render):
+    template = "{% for x in items %}{{ x }},{% endfor %}"
+    context = {"items": [1, 2, 3]}
+
+    assert_render(template, context, "1,2,3,")
+
+
+def test_for_tuple_reversed(assert_render):
+    template = "{% for x in items reversed %}{{ x }}{% endfor %}"
+    context = {"items": ("a", "b", "c")}
+
+    assert_render(template, context, "cba")
+
+
+def test_for_iterator(assert_render):
+    template = "{% for x in items %}{{ x }}{% endfor %}"
+    context = {"items": (n * 2 for n in range(3))}
+
+    assert_render(template, context, "024")
+
+
+def test_for_dict_reversed(assert_render):
+    template = "{% for key in items reversed %}{{ key }}{% endfor %}"
+    context = {"items": {"a": 1, "b": 2}}
+
+    assert_render(template, context, "ba")
+
+
+def test_for_empty(assert_render):
+    template = "{% for x in items %}{{ x }}{% empty %}None{% endfor %}"
+
+    assert_render(template, {"items": []}, "None")
+    assert_render(template, {}, "None")
+
+
+def test_for_forloop(assert_render):
+    template = (
+        "{% for x in items %}"
+        "{{ forloop.counter }}{{ forloop.counter0 }}{{ forloop.revcounter }}"
+        "{{ forloop.revcounter0 }}{{ forloop.first }}{{ forloop.last }} "
+        "{% endfor %}"
+    )
+    context = {"items": "ab"}
+
+    assert_render(template, context, "1021TrueFalse 2110FalseTrue ")
+
+
+def test_for_parentloop(assert_render):
+    template = (
+        "{% for x in outer %}{% for y in inner %}"
+        "{{ forloop.parentloop.counter }}{{ forloop.counter }} "
+        "{% endfor %}{% endfor %}"
+    )
+    context = {"outer": [1, 2], "inner": [1, 2]}
+
+    assert_render(template, context, "11 12 21 22 ")
+
+
+def test_for_unpack(assert_render):
+    template = "{% for key, value in items %}{{ key }}={{ value }};{% endfor %}"
+    context = {"items": [("a", 1), ("b", 2)]}
+
+    assert_render(template, context, "a=1;b=2;")
+
+
+def test_for_unpack_wrong_length(rusty, django_template):
+    template = "{% for key, value in items %}{{ key }}{% endfor %}"
+    context = {"items": [(1, 2, 3)]}
+    message = "Need 2 values to unpack in for loop; got 3. "
+
+    with pytest.raises(ValueError, match=message):
+        django_template(template).render(context)
+
+    with pytest.raises(ValueError, match=message):
+        rusty(template).render(context)
+
+
+def test_for_variable_scope(assert_render):
+    template = "{% for x in items %}{{ x }}{% endfor %}{{ x }}"
+    context = {"items": [1, 2], "x": "outer"}
+
+    assert_render(template, context, "12outer")
+
+
+def test_for_url_as_scope(assert_render):
+    template = (
+        "{% for x in items %}{% url 'home' as home %}{{ home }}{% endfor %}[{{ home }}]"
+    )
+    context = {"items": [1, 2]}
+
+    assert_render(template, context, "//[]")
+
+
+def test_for_filter(assert_render):
+    template = "{% for x in items|join:',' %}{{ x }}{% endfor %}"
+    context = {"items": ["a", "b"]}
+
+    assert_render(template, context, "a,b")
+
+
+def test_for_forloop_kept(rusty):
+    template = (
+        "{% load custom_filters %}"
+        "{% for x in items %}{{ forloop|keep:kept }}{% endfor %}"
+    )
+    kept = []
+
+    assert rusty(template).render({"items": "abc", "kept": kept}) == ""
+    assert [forloop["counter"] for forloop in kept] == [1, 2, 3]
+    assert [forloop["revcounter0"] for forloop in kept] == [2, 1, 0]
+    assert [forloop["last"] for forloop in kept] == [False, False, True]
+    assert kept[0]["parentloop"] == {}
+
+    with pytest.raises(KeyError):
+        kept[0]["missing"]
@@ -1289,3 +1289,17 @@ def test_not_inf_or_not_none():
 
     assert django_template.render({}) == "truthy"
     assert rust_template.render({}) == "truthy"
+
+
+def test_render_nested_if():
+    depth = 50
+    template = "{% if foo %}<{{ foo }}>" * depth + "{% endif %}" * depth
+    template = "{% autoescape off %}" + template + "{% endautoescape %}"
+    django_template = engines["django"].from_string(template)
+    rust_template = engines["rusty"].from_string(template)
+
+    expected = "<<b>>" * depth
+    assert django_template.render({"foo": "<b>"}) == expected
+    assert rust_template.render({"foo": "<b>"}) == expected
+    # Rendering again reuses the previous output size.
+    assert rust_template.render({"foo": "<b>"}) == expected
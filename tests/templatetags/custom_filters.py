@@ -1,4 +1,7 @@
 from django import template
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+from django.utils.translation import activate
 
 register = template.Library()
 
@@ -22,3 +25,34 @@ def multiply(value, by=3):
 @register.filter
 def divide_by_zero(value, zero=0):
     return value / zero
+
+
+@register.filter(is_safe=True)
+def brackets(value):
+    return f"<{value}>"
+
+
+@register.filter(needs_autoescape=True)
+def bold(value, autoescape=True):
+    if autoescape:
+        value = conditional_escape(value)
+    return mark_safe(f"<b>{value}</b>")
+
+
+@register.filter(expects_localtime=True)
+def hour(value):
+    return value.hour
+
+
+@register.filter
+def language(value, code):
+    """Activate another language part way through rendering."""
+    activate(code)
+    return value
+
+
+@register.filter
+def keep(value, kept):
+    """Keep a reference to the value for the test to check later."""
+    kept.append(value)
+    return ""
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.template import engines
+from django.template.exceptions import TemplateDoesNotExist
+
+from .models import Person
+
+
+def test_arender():
+    template = engines["rusty"].from_string("Hello {{ user }}!")
+
+    rendered = asyncio.run(template.arender({"user": "Lily"}))
+
+    assert rendered == "Hello Lily!"
+
+
+def test_arender_awaitable_context():
+    template = engines["rusty"].from_string("{{ user }}: {{ names }}")
+
+    async def get_user():
+        return "Lily"
+
+    async def get_names():
+        for name in ["Bryony", "Rose"]:
+            yield name
+
+    context = {"user": get_user(), "names": get_names()}
+    rendered = asyncio.run(template.arender(context))
+
+    assert rendered == "Lily: [&#x27;Bryony&#x27;, &#x27;Rose&#x27;]"
+
+
+# The render runs on a worker thread with its own database connection, so
+# the rows must be committed for it to see them.
+@pytest.mark.django_db(transaction=True)
+def test_arender_queryset():
+    Person.objects.create(name="Lily")
+    Person.objects.create(name="Bryony")
+    template = engines["rusty"].from_string(
+        "{% for person in people %}{{ person.name }};{% endfor %}"
+    )
+
+    # async_to_sync runs the event loop in another thread, like an ASGI
+    # server, so iterating the QuerySet on it would raise
+    # SynchronousOnlyOperation.
+    async def render():
+        return await template.arender({"people": Person.objects.order_by("name")})
+
+    rendered = async_to_sync(render)()
+
+    assert rendered == "Bryony;Lily;"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_arender_queryset_methods():
+    Person.objects.create(name="Lily")
+    Person.objects.create(name="Bryony")
+    template = engines["rusty"].from_string("{{ people.count }} {{ people.first }}")
+
+    async def render():
+        return await template.arender({"people": Person.objects.order_by("name")})
+
+    rendered = async_to_sync(render)()
+
+    assert rendered == "2 Bryony"
+
+
+def test_aget_template():
+    engine = engines["rusty"]
+
+    async def render():
+        loaded = await engine.aget_template("basic.txt")
+        cached = await engine.aget_template("basic.txt")
+        return [
+            await template.arender({"user": "Lily"}) for template in (loaded, cached)
+        ]
+
+    assert asyncio.run(render()) == ["Hello Lily!\n", "Hello Lily!\n"]
+
+
+def test_aget_template_missing():
+    engine = engines["rusty"]
+
+    with pytest.raises(TemplateDoesNotExist):
+        asyncio.run(engine.aget_template("missing.txt"))
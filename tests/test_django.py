@@ -52,3 +52,27 @@ This is an invalid filter name: {{ variable|'invalid'|title }}
    ╰────
 """
     assert str(excinfo.value) == expected
+
+
+class User:
+    def __init__(self, name):
+        self.name = name
+
+    def get_name(self):
+        return self.name
+
+    def greet(self, greeting):
+        return f"{greeting} {self.name}"
+
+    def delete(self):
+        raise AssertionError("Templates must not call methods that alter data")
+
+    delete.alters_data = True
+
+
+def test_render_callable(assert_render):
+    template = (
+        "{{ user.get_name }}|{{ user.greet }}|{{ user.delete }}|{{ get_user.name }}"
+    )
+    context = {"user": User("Lily"), "get_user": lambda: User("Bryony")}
+    assert_render(template, context, "Lily|||Bryony")
@@ -1,8 +1,11 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pytest
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.template.engine import Engine
+from django.template.exceptions import TemplateDoesNotExist
 from django.template.library import InvalidTemplateLibrary
 
 from django_rusty_templates import RustyTemplates
@@ -55,3 +58,241 @@ def test_pathlib_dirs():
 
     template = engine.get_template("basic.txt")
     assert template.render({"user": "Lily"}) == "Hello Lily!\n"
+
+
+def test_autoreload_interval(tmp_path):
+    template_path = tmp_path / "changing.txt"
+    template_path.write_text("Hello {{ user }}!")
+    engine = RustyTemplates(
+        {
+            "NAME": "rust",
+            "OPTIONS": {"autoreload_interval": 0},
+            "DIRS": [tmp_path],
+            "APP_DIRS": False,
+        }
+    )
+
+    template = engine.get_template("changing.txt")
+    assert template.render({"user": "Lily"}) == "Hello Lily!"
+
+    template_path.write_text("Goodbye {{ user }}!")
+    template = engine.get_template("changing.txt")
+    assert template.render({"user": "Lily"}) == "Goodbye Lily!"
+
+
+def test_autoreload_interval_invalid():
+    with pytest.raises(ValueError) as exc_info:
+        RustyTemplates(
+            {
+                "NAME": "rust",
+                "OPTIONS": {"autoreload_interval": -1},
+                "DIRS": [],
+                "APP_DIRS": False,
+            }
+        )
+
+    expected = "autoreload_interval must be a non-negative number of seconds."
+    assert str(exc_info.value) == expected
+
+
+def test_reset(tmp_path):
+    template_path = tmp_path / "changing.txt"
+    template_path.write_text("Hello {{ user }}!")
+    engine = RustyTemplates(
+        {"NAME": "rust", "OPTIONS": {}, "DIRS": [tmp_path], "APP_DIRS": False}
+    )
+
+    template = engine.get_template("changing.txt")
+    template_path.write_text("Goodbye {{ user }}!")
+    template = engine.get_template("changing.txt")
+    assert template.render({"user": "Lily"}) == "Hello Lily!"
+
+    engine.engine.reset()
+    template = engine.get_template("changing.txt")
+    assert template.render({"user": "Lily"}) == "Goodbye Lily!"
+
+
+def test_cache_info():
+    template_dir = Path(settings.BASE_DIR) / "templates"
+    engine = RustyTemplates(
+        {
+            "NAME": "rust",
+            "OPTIONS": {"cache_max_entries": 1, "cache_max_missing": 1},
+            "DIRS": [template_dir],
+            "APP_DIRS": False,
+        }
+    )
+
+    engine.get_template("basic.txt")
+    engine.get_template("basic.txt")
+    engine.get_template("full_example.html")
+    with pytest.raises(TemplateDoesNotExist):
+        engine.get_template("missing.txt")
+
+    assert engine.engine.cache_info() == {
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+        "entries": 1,
+        "missing": 1,
+        "bytes": len((template_dir / "full_example.html").read_bytes()),
+    }
+
+
+def test_bundle(tmp_path):
+    template_dir = tmp_path / "templates"
+    template_dir.mkdir()
+    (template_dir / "greeting.txt").write_text("Hello {{ user }}!")
+    bundle = tmp_path / "templates.bundle"
+
+    engine = RustyTemplates(
+        {"NAME": "rust", "OPTIONS": {}, "DIRS": [template_dir], "APP_DIRS": False}
+    )
+    assert engine.engine.write_bundle(bundle) == 1
+
+    (template_dir / "greeting.txt").unlink()
+    engine = RustyTemplates(
+        {
+            "NAME": "rust",
+            "OPTIONS": {"bundle": bundle},
+            "DIRS": [template_dir],
+            "APP_DIRS": False,
+        }
+    )
+    template = engine.get_template("greeting.txt")
+    assert template.render({"user": "Lily"}) == "Hello Lily!"
+
+
+def test_bundle_invalid(tmp_path):
+    bundle = tmp_path / "templates.bundle"
+    bundle.write_text("Hello {{ user }}!")
+
+    with pytest.raises(ImproperlyConfigured) as exc_info:
+        RustyTemplates(
+            {
+                "NAME": "rust",
+                "OPTIONS": {"bundle": bundle},
+                "DIRS": [],
+                "APP_DIRS": False,
+            }
+        )
+
+    expected = f"Could not load template bundle {bundle}: Not a template bundle."
+    assert str(exc_info.value) == expected
+
+
+def test_bundle_autoreload(tmp_path):
+    bundle = tmp_path / "templates.bundle"
+
+    with pytest.raises(ImproperlyConfigured) as exc_info:
+        RustyTemplates(
+            {
+                "NAME": "rust",
+                "OPTIONS": {"bundle": bundle, "autoreload_interval": 1},
+                "DIRS": [],
+                "APP_DIRS": False,
+            }
+        )
+
+    expected = "bundle must not be set when autoreload_interval is defined."
+    assert str(exc_info.value) == expected
+
+
+def test_warm(tmp_path):
+    (tmp_path / "hello.txt").write_text("Hello {{ user }}!")
+    (tmp_path / "goodbye.txt").write_text("Goodbye {{ user }}!")
+    (tmp_path / "broken.txt").write_text("This is an empty variable: {{ }}")
+    engine = RustyTemplates(
+        {"NAME": "rust", "OPTIONS": {}, "DIRS": [tmp_path], "APP_DIRS": False}
+    )
+
+    assert engine.warm() == 2
+    (tmp_path / "hello.txt").unlink()
+    template = engine.get_template("hello.txt")
+    assert template.render({"user": "Lily"}) == "Hello Lily!"
+
+    info = engine.engine.cache_info()
+    assert info["hits"] == 1
+    assert info["misses"] == 3
+    assert info["entries"] == 2
+
+
+def test_warm_names(tmp_path):
+    (tmp_path / "hello.txt").write_text("Hello {{ user }}!")
+    (tmp_path / "goodbye.txt").write_text("Goodbye {{ user }}!")
+    engine = RustyTemplates(
+        {"NAME": "rust", "OPTIONS": {}, "DIRS": [tmp_path], "APP_DIRS": False}
+    )
+
+    assert engine.warm(["hello.txt"]) == 1
+    assert engine.engine.cache_info()["entries"] == 1
+
+    with pytest.raises(TemplateDoesNotExist):
+        engine.warm(["missing.txt"])
+
+
+def test_template_index(tmp_path):
+    (tmp_path / "hello.txt").write_text("Hello {{ user }}!")
+    engine = RustyTemplates(
+        {
+            "NAME": "rust",
+            "OPTIONS": {"template_index": True},
+            "DIRS": [tmp_path],
+            "APP_DIRS": False,
+        }
+    )
+
+    template = engine.get_template("hello.txt")
+    assert template.render({"user": "Lily"}) == "Hello Lily!"
+
+    (tmp_path / "added.txt").write_text("Added")
+    with pytest.raises(TemplateDoesNotExist):
+        engine.get_template("added.txt")
+
+    engine.engine.reset()
+    assert engine.get_template("added.txt").render() == "Added"
+
+
+def test_template_index_autoreload():
+    with pytest.raises(ImproperlyConfigured) as exc_info:
+        RustyTemplates(
+            {
+                "NAME": "rust",
+                "OPTIONS": {"template_index": True, "autoreload_interval": 1},
+                "DIRS": [],
+                "APP_DIRS": False,
+            }
+        )
+
+    expected = "template_index must not be set when autoreload_interval is defined."
+    assert str(exc_info.value) == expected
+
+
+def test_render_bytes():
+    engine = RustyTemplates(
+        {"NAME": "rust", "OPTIONS": {}, "DIRS": [], "APP_DIRS": False}
+    )
+    template = engine.from_string("Grüße, {{ user }}! こんにちは")
+
+    assert template.render_bytes({"user": "Lily"}) == "Grüße, Lily! こんにちは".encode()
+    assert template.render({"user": "Lily"}) == "Grüße, Lily! こんにちは"
+
+
+def test_get_template_threads():
+    template_dir = Path(settings.BASE_DIR) / "templates"
+    engine = RustyTemplates(
+        {"NAME": "rust", "OPTIONS": {}, "DIRS": [template_dir], "APP_DIRS": False}
+    )
+
+    def render(user):
+        template = engine.get_template("basic.txt")
+        return template.render({"user": user})
+
+    users = [f"User {i}" for i in range(32)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        rendered = list(executor.map(render, users))
+
+    assert rendered == [f"Hello {user}!\n" for user in users]
+    info = engine.engine.cache_info()
+    assert info["misses"] == 1
+    assert info["hits"] == 31
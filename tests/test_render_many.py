@@ -0,0 +1,44 @@
+import pytest
+from django.template import engines
+from django.template.base import VariableDoesNotExist
+
+
+def test_render_many():
+    template = engines["rusty"].from_string("<li>{{ name }}</li>")
+    contexts = [{"name": "Lily"}, {"name": "Bryony"}, {}]
+
+    assert template.render_many(contexts) == [
+        "<li>Lily</li>",
+        "<li>Bryony</li>",
+        "<li></li>",
+    ]
+
+
+def test_render_many_separator():
+    template = engines["rusty"].from_string("<li>{{ name }}</li>")
+    contexts = ({"name": name} for name in ["Lily", "Bryony"])
+
+    assert template.render_many(contexts, separator="\n") == (
+        "<li>Lily</li>\n<li>Bryony</li>"
+    )
+
+
+def test_render_many_empty():
+    template = engines["rusty"].from_string("<li>{{ name }}</li>")
+
+    assert template.render_many([]) == []
+    assert template.render_many([], separator="") == ""
+
+
+def test_render_many_not_a_dict():
+    template = engines["rusty"].from_string("<li>{{ name }}</li>")
+
+    with pytest.raises(TypeError):
+        template.render_many([{"name": "Lily"}, ["Bryony"]])
+
+
+def test_render_many_error():
+    template = engines["rusty"].from_string("{{ foo|add:bar }}")
+
+    with pytest.raises(VariableDoesNotExist):
+        template.render_many([{"foo": 1, "bar": 2}, {"foo": 1}])
@@ -0,0 +1,114 @@
+import pytest
+from django.http import StreamingHttpResponse
+from django.template import engines
+from django.template.base import VariableDoesNotExist
+
+
+def test_stream():
+    template = "Hello {{ user }}!{% if user %} Welcome back.{% endif %}"
+    rust_template = engines["rusty"].from_string(template)
+
+    chunks = list(rust_template.stream({"user": "Lily"}))
+    assert "".join(chunks) == rust_template.render({"user": "Lily"})
+    assert chunks == ["Hello Lily! Welcome back."]
+
+
+def test_stream_chunk_size():
+    template = "Hello {{ user }}!{% if user %} Welcome back.{% endif %}"
+    rust_template = engines["rusty"].from_string(template)
+
+    chunks = list(rust_template.stream({"user": "Lily"}, chunk_size=1))
+    assert chunks == ["Hello ", "Lily", "!", " Welcome back."]
+
+
+def test_stream_inside_loop():
+    template = "<ul>{% for user in users %}<li>{{ user }}</li>{% endfor %}</ul>"
+    rust_template = engines["rusty"].from_string(template)
+
+    chunks = list(rust_template.stream({"users": ["Lily", "Bryony"]}, chunk_size=1))
+    assert chunks == [
+        "<ul>",
+        "<li>",
+        "Lily",
+        "</li>",
+        "<li>",
+        "Bryony",
+        "</li>",
+        "</ul>",
+    ]
+
+
+def test_stream_nested_blocks():
+    template = """\
+{% autoescape off %}{% for row in rows %}{{ forloop.counter }}:\
+{% for cell in row %}{% if cell %}{{ cell }}{% else %}-{% endif %}\
+{% empty %}none{% endfor %};{% endfor %}{% endautoescape %}{{ tag }}\
+{% for x in missing %}{% empty %}!{% endfor %}"""
+    rust_template = engines["rusty"].from_string(template)
+    context = {"rows": (["<b>", ""], [], iter("ab")), "tag": "<i>"}
+
+    expected = "1:<b>-;2:none;3:ab;&lt;i&gt;!"
+    assert rust_template.render(context) == expected
+    context["rows"] = (["<b>", ""], [], iter("ab"))
+    assert "".join(rust_template.stream(context, chunk_size=1)) == expected
+
+
+def test_stream_empty():
+    rust_template = engines["rusty"].from_string("{% if user %}Hello{% endif %}")
+
+    assert list(rust_template.stream({})) == []
+
+
+def test_stream_invalid_chunk_size():
+    rust_template = engines["rusty"].from_string("Hello")
+
+    with pytest.raises(ValueError) as exc_info:
+        rust_template.stream(chunk_size=0)
+
+    assert str(exc_info.value) == "chunk_size must be a positive integer."
+
+
+def test_stream_error():
+    template = "Hello {{ user }}!{{ foo|add:bar }}"
+    rust_template = engines["rusty"].from_string(template)
+
+    stream = rust_template.stream({"user": "Lily", "foo": 1}, chunk_size=1)
+    assert next(stream) == "Hello "
+    assert next(stream) == "Lily"
+    assert next(stream) == "!"
+
+    with pytest.raises(VariableDoesNotExist) as exc_info:
+        next(stream)
+
+    expected = """\
+  × Failed lookup for key [bar] in {"False": False, "None": None, "True":
+  │ True, "foo": 1, "user": 'Lily'}
+   ╭────
+ 1 │ Hello {{ user }}!{{ foo|add:bar }}
+   ·                             ─┬─
+   ·                              ╰── key
+   ╰────
+"""
+    assert str(exc_info.value) == expected
+
+    with pytest.raises(StopIteration):
+        next(stream)
+
+
+def test_stream_error_inside_loop():
+    template = "{% for x in items %}{{ x|add:bar }}{% endfor %}"
+    rust_template = engines["rusty"].from_string(template)
+
+    stream = rust_template.stream({"items": [1, 2]}, chunk_size=1)
+    with pytest.raises(VariableDoesNotExist):
+        next(stream)
+
+    with pytest.raises(StopIteration):
+        next(stream)
+
+
+def test_streaming_http_response():
+    rust_template = engines["rusty"].from_string("Hello {{ user }}!")
+
+    response = StreamingHttpResponse(rust_template.stream({"user": "Lily"}))
+    assert b"".join(response.streaming_content) == b"Hello Lily!"
@@ -1,3 +1,4 @@
+from django.template import engines
 from django.utils.translation import override
 
 from .utils import render
@@ -23,3 +24,17 @@ def test_translate_valid():
     with override("de"):
         assert render("translation.txt", {}, using="django") == expected
         assert render("translation.txt", {}, using="rusty") == expected
+
+
+def test_translate_language_change():
+    template = (
+        "{% load custom_filters %}{% for code in codes %}"
+        "{{ code|language:code }}={{ greeting|default:_('Welcome') }};"
+        "{% endfor %}"
+    )
+    context = {"codes": ["de", "en"]}
+    expected = "de=Willkommen;en=Welcome;"
+
+    with override("en"):
+        assert engines["django"].from_string(template).render(context) == expected
+        assert engines["rusty"].from_string(template).render(context) == expected